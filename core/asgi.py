@@ -0,0 +1,42 @@
+import django
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIHandler as DjangoASGIHandler
+
+
+def _encode(value, encoding):
+    return bytes(value.encode(encoding) if isinstance(value, str) else value)
+
+
+class ASGIHandler(DjangoASGIHandler):
+    """Django's ASGI handler, generating streaming responses part by part on the thread of synchronous views
+
+    Django 3.2 iterates streaming responses on the event loop, where generators reading the database, such
+    as the recipe export, fail. Here every part is produced on the thread that ran the synchronous view,
+    with its connection and server-side cursor, and sent as soon as it is ready, so memory use stays
+    bounded and the first rows leave before the last ones are read.
+    """
+
+    async def send_response(self, response, send):
+        if not response.streaming:
+            return await super().send_response(response, send)
+
+        # Encoded as in Django's own send_response
+        headers = [(_encode(header, "ascii"), _encode(value, "latin1")) for header, value in response.items()]
+        headers += [(b"Set-Cookie", _encode(c.output(header=""), "ascii").strip()) for c in response.cookies.values()]
+        await send({"type": "http.response.start", "status": response.status_code, "headers": headers})
+        parts = iter(response)
+        next_part = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_part(parts, None)
+            if part is None:
+                break
+            for chunk, _ in self.chunk_bytes(part):
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body"})
+        await sync_to_async(response.close, thread_sensitive=True)()
+
+
+def get_asgi_application():
+    """Return the project's ASGI application, like `django.core.asgi.get_asgi_application`"""
+    django.setup(set_prefix=False)
+    return ASGIHandler()
@@ -0,0 +1,104 @@
+import functools
+
+from django.http import HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from rest_framework.authentication import get_authorization_header
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.routers import DefaultRouter
+
+from core.asynchronous import database_sync_to_async
+from core.authentication import TOKEN_AUTH_CACHE, CachedTokenAuthentication, get_cached_token, token_cache
+from core.mixins import UserDataETagMixin, etag_matches, user_data_etag
+from core.timing import timed
+from core.versioning import aget_data_version
+
+
+async def _cached_token_user(view_class, request):
+    """Return the user of the request's token when the token cache holds it, without touching the database"""
+    if CachedTokenAuthentication not in view_class.authentication_classes:
+        return None
+    if not set(view_class.permission_classes) <= {IsAuthenticated}:
+        return None
+    auth = get_authorization_header(request).split()
+    if len(auth) != 2 or auth[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        return None
+    token = token_cache.get(key)
+    if token is None and TOKEN_AUTH_CACHE["CACHE_ALIAS"]:
+        # The shared cache is a network round trip, which must not block the event loop
+        token = await database_sync_to_async(get_cached_token)(key)
+    return token.user if token is not None else None
+
+
+async def _not_modified(view, request):
+    """Answer a revalidation of an unchanged list with 304, or return None to run the view
+
+    Detail routes always run the view, which checks that the object exists before answering 304.
+    """
+    actions = getattr(view, "actions", {})
+    action = actions.get("get") if request.method in ("GET", "HEAD") else None
+    if action != "list" or not issubclass(view.cls, UserDataETagMixin):
+        return None
+    if "HTTP_IF_NONE_MATCH" not in request.META:
+        return None
+    user = await _cached_token_user(view.cls, request)
+    if user is None:
+        return None
+
+    etag = user_data_etag(user.pk, await aget_data_version(user.pk), request)
+    if not etag_matches(etag, request):
+        return None
+    response = HttpResponseNotModified()
+    response["ETag"] = etag
+    patch_vary_headers(response, ("Accept",))
+    return response
+
+
+def _respond(view, request, *args, **kwargs):
+    response = view(request, *args, **kwargs)
+    # Rendered here, or Django would render it on its single thread for synchronous code
+    if callable(getattr(response, "render", None)):
+        with timed("render"):
+            response.render()
+    return response
+
+
+def async_view(view):
+    """Wrap a synchronous DRF view into an async view for ASGI servers
+
+    Revalidations that `UserDataETagMixin` would answer with 304 are answered on the event loop when the
+    token is cached, reading only the data version. Everything else runs the DRF view, including rendering,
+    on the `core.asynchronous` pool, so slow requests do not queue behind each other on one thread.
+    Streaming responses are generated after the view returns, by `core.asgi` on Django's thread for
+    synchronous code, so views streaming from the database must not be wrapped.
+    """
+
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        response = await _not_modified(view, request)
+        if response is None:
+            response = await database_sync_to_async(_respond)(view, request, *args, **kwargs)
+        return response
+
+    return wrapper
+
+
+class AsyncRouter(DefaultRouter):
+    """DefaultRouter serving its viewset routes through `async_view`
+
+    Actions a viewset lists in `streaming_actions` stay synchronous, so the cursor their response reads
+    from is opened on the thread that goes on to generate it.
+    """
+
+    def get_urls(self):
+        urls = super().get_urls()
+        for url in urls:
+            if not hasattr(url.callback, "actions"):
+                continue
+            streaming = getattr(url.callback.cls, "streaming_actions", ())
+            if not set(url.callback.actions.values()) & set(streaming):
+                url.callback = async_view(url.callback)
+        return urls
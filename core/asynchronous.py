@@ -0,0 +1,38 @@
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide pool running the synchronous part of async views"""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.ASYNC_VIEWS_THREADS, thread_name_prefix="async-views")
+    return _executor
+
+
+def database_sync_to_async(func):
+    """Wrap func to run in the async view pool, closing that thread's stale database connections around it
+
+    Django only closes connections of the thread handling the request, so pool threads have to clean up
+    after themselves. Calls run concurrently, unlike `sync_to_async` with thread_sensitive on.
+    """
+
+    @functools.wraps(func)
+    def run(*args, **kwargs):
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+
+    return sync_to_async(run, thread_sensitive=False, executor=get_executor())
@@ -0,0 +1,79 @@
+import copy
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.authentication import TokenAuthentication
+
+from core.cache import LRUCache
+from core.timing import timed
+
+
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": 10000,
+    "TIMEOUT": 60,
+    "CACHE_ALIAS": None,
+    **getattr(settings, "TOKEN_AUTH_CACHE", {}),
+}
+
+token_cache = LRUCache(max_size=TOKEN_AUTH_CACHE["MAX_SIZE"], timeout=TOKEN_AUTH_CACHE["TIMEOUT"])
+
+
+def _shared_cache():
+    alias = TOKEN_AUTH_CACHE["CACHE_ALIAS"]
+    return caches[alias] if alias else None
+
+
+def _cache_key(key):
+    return f"auth-token:{key}"
+
+
+def get_cached_token(key):
+    """Return the cached token for key from the local cache or the shared cache, if any"""
+    token = token_cache.get(key)
+    shared = _shared_cache()
+    if token is None and shared is not None:
+        token = shared.get(_cache_key(key))
+        if token is not None:
+            token_cache.set(key, token)
+    return token
+
+
+def cache_token(token):
+    token_cache.set(token.key, token)
+    shared = _shared_cache()
+    if shared is not None:
+        shared.set(_cache_key(token.key), token, TOKEN_AUTH_CACHE["TIMEOUT"])
+
+
+def invalidate_tokens(*keys):
+    """Drop the given token keys from every cache tier"""
+    for key in keys:
+        token_cache.delete(key)
+    shared = _shared_cache()
+    if shared is not None and keys:
+        shared.delete_many([_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that resolves tokens through a bounded cache instead of the database
+
+    Entries are invalidated by the signal handlers in `core.signals` whenever a token is deleted or
+    replaced, or its user is deactivated or changes password. Other processes only see the change once
+    their local entry expires, so keep `TOKEN_AUTH_CACHE["TIMEOUT"]` short.
+    """
+
+    def authenticate(self, request):
+        with timed("auth"):
+            return super().authenticate(request)
+
+    def authenticate_credentials(self, key):
+        token = get_cached_token(key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache_token(token)
+            return user, token
+
+        # Hand out copies so request-local changes never leak into the shared entry
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
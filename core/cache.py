@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded, thread-safe least recently used cache with per-entry expiry
+
+    Entries are limited to max_size and, when max_cost is set, to a total cost given by each `set`, such
+    as the size of the value in bytes.
+    """
+
+    def __init__(self, max_size=1024, timeout=None, clock=time.monotonic, max_cost=None):
+        self.max_size = max_size
+        self.max_cost = max_cost
+        self.timeout = timeout
+        self.cost = 0
+        self.hits = 0
+        self.misses = 0
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the cached value for key, or default if it is missing or expired"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is not None:
+                value, expires, cost = entry
+                if expires is None or expires > self._clock():
+                    self._data.move_to_end(key)
+                    self.hits += 1
+                    return value
+                del self._data[key]
+                self.cost -= cost
+            self.misses += 1
+            return default
+
+    def set(self, key, value, timeout=None, cost=0):
+        """Store value under key, evicting least recently used entries while the cache is over its bounds
+
+        A value costing more than max_cost on its own is not stored.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        expires = None if timeout is None else self._clock() + timeout
+        with self._lock:
+            self._pop(key)
+            if self.max_cost is not None and cost > self.max_cost:
+                return
+            self._data[key] = (value, expires, cost)
+            self.cost += cost
+            while len(self._data) > self.max_size or (self.max_cost is not None and self.cost > self.max_cost):
+                self.cost -= self._data.popitem(last=False)[1][2]
+
+    def _pop(self, key):
+        entry = self._data.pop(key, None)
+        if entry is not None:
+            self.cost -= entry[2]
+
+    def delete(self, key):
+        with self._lock:
+            self._pop(key)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.cost = 0
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
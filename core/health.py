@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+from django.db.migrations.executor import MigrationExecutor
+
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_cached = {"checked": None, "result": None}
+_migrated = set()
+
+
+def ping(alias=DEFAULT_DB_ALIAS):
+    """Open the connection of alias if needed and run a trivial query on it"""
+    with connections[alias].cursor() as cursor:
+        cursor.execute("SELECT 1")
+
+
+def pending_migrations(alias=DEFAULT_DB_ALIAS):
+    """Return the number of migrations not applied to the database of alias
+
+    Migrations only get applied while the process runs, so once none are pending the answer is remembered.
+    """
+    if alias in _migrated:
+        return 0
+    executor = MigrationExecutor(connections[alias])
+    pending = len(executor.migration_plan(executor.loader.graph.leaf_nodes()))
+    if not pending:
+        _migrated.add(alias)
+    return pending
+
+
+def check_readiness(alias=DEFAULT_DB_ALIAS):
+    """Return whether the database answers and is fully migrated, with its round trip latency in ms"""
+    start = time.perf_counter()
+    try:
+        ping(alias)
+        latency = (time.perf_counter() - start) * 1000
+        pending = pending_migrations(alias)
+    except DatabaseError:
+        # The error may name hosts and users, and the probe is public
+        logger.warning("Database %s is not available", alias, exc_info=True)
+        return {"ready": False, "database": {"available": False}}
+    return {
+        "ready": not pending,
+        "database": {"available": True, "latency_ms": round(latency, 2)},
+        "migrations": {"pending": pending},
+    }
+
+
+def readiness():
+    """Return `check_readiness`, reusing the last result for HEALTH_CHECK_CACHE_SECONDS
+
+    Probes from many load balancers then cost at most one check per interval.
+    """
+    now = time.monotonic()
+    with _lock:
+        if _cached["checked"] is not None and now - _cached["checked"] < settings.HEALTH_CHECK_CACHE_SECONDS:
+            return _cached["result"]
+        result = check_readiness()
+        _cached.update(checked=time.monotonic(), result=result)
+        return result
+
+
+def reset_readiness():
+    with _lock:
+        _cached.update(checked=None, result=None)
+        _migrated.clear()
@@ -0,0 +1,418 @@
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from io import BytesIO
+
+import factory.random
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.factories import IngredientFactory, RecipeFactory, TagFactory, UserFactory
+from core.management.commands.loadtest import percentile
+from core.management.commands.seed_data import WORDS
+from core.response_cache import reset_response_cache
+from core.versioning import bump_data_version
+from recipe.uploads import create_upload, write_chunk
+
+
+PASSWORD = "benchmark-pass"
+PERCENTILES = (("p50_ms", 0.5), ("p95_ms", 0.95), ("p99_ms", 0.99))
+
+# {name: (client method, prepare)}, where prepare(data) returns the URL and arguments of one request
+SCENARIOS = {}
+
+
+def scenario(name, method):
+    """Register prepare as the benchmark of one endpoint and method"""
+
+    def register(prepare):
+        SCENARIOS[name] = (method, prepare)
+        return prepare
+
+    return register
+
+
+def sample_image():
+    """Return the bytes of a small JPEG"""
+    buffer = BytesIO()
+    Image.new("RGB", (64, 64), "blue").save(buffer, format="JPEG")
+    return buffer.getvalue()
+
+
+class BenchmarkData:
+    """Data seeded for a benchmark run and the client making its requests
+
+    Every user gets `recipes` recipes titled with four of `WORDS`, each with `tags` tags and `ingredients`
+    ingredients drawn from the user's own pool. Requests are made as the first user, authenticated with a token.
+    """
+
+    def __init__(self, users, recipes, tags, ingredients, seed=0):
+        self.shape = {"users": users, "recipes": recipes, "tags": tags, "ingredients": ingredients}
+        self.random = random.Random(seed)
+        factory.random.reseed_random(seed)
+        self.image = sample_image()
+        self.counter = 0
+
+        for n in range(users):
+            user = UserFactory(email=f"benchmark-{n}@example.com")
+            tag_pool = TagFactory.create_batch(max(10, tags * 3), user=user)
+            ingredient_pool = IngredientFactory.create_batch(max(10, ingredients * 3), user=user)
+            for _ in range(recipes):
+                RecipeFactory(
+                    user=user,
+                    title=" ".join(self.random.sample(WORDS, 4)),
+                    image=None,
+                    tags=self.random.sample(tag_pool, tags),
+                    ingredients=self.random.sample(ingredient_pool, ingredients),
+                )
+            if n == 0:
+                self.user, self.tag_ids = user, [tag.pk for tag in tag_pool]
+                self.ingredient_ids = [ingredient.pk for ingredient in ingredient_pool]
+
+        self.user.set_password(PASSWORD)
+        self.user.save()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+
+    def invalidate_responses(self):
+        """Bump the user's data version, so the next list request misses the response cache"""
+        bump_data_version(self.user.pk)
+
+    def cached(self, url):
+        """Request url once unmeasured and return it, so the measured request hits the response cache"""
+        self.client.get(url)
+        return url
+
+    def unique(self, prefix):
+        self.counter += 1
+        return f"{prefix}-{self.counter}"
+
+    def recipe(self):
+        """Return a recipe of the user, created for the request so it can be changed or deleted freely"""
+        return RecipeFactory(user=self.user, image=None, tags=self.random.sample(self.tag_ids, 2))
+
+    def recipe_payload(self):
+        return {
+            "title": self.unique("benchmark-recipe"),
+            "time_minutes": 10,
+            "price": "5.00",
+            "tags": self.random.sample(self.tag_ids, self.shape["tags"]),
+            "ingredients": self.random.sample(self.ingredient_ids, self.shape["ingredients"]),
+        }
+
+    def upload(self, received=False):
+        upload = create_upload(self.recipe(), "benchmark.jpg", len(self.image))
+        if received:
+            upload = write_chunk(upload, f"bytes 0-{len(self.image) - 1}/{len(self.image)}", BytesIO(self.image))
+        return upload
+
+
+def upload_url(name, upload, *suffix):
+    return reverse(f"recipe:{name}", args=[upload.recipe_id, upload.pk, *suffix])
+
+
+@scenario("user-create", "post")
+def user_create(data):
+    payload = {"email": f"{data.unique('signup')}@example.com", "password": PASSWORD, "name": "Benchmark"}
+    return reverse("user:create"), {"data": payload}
+
+
+@scenario("user-token", "post")
+def user_token(data):
+    return reverse("user:token"), {"data": {"email": data.user.email, "password": PASSWORD}}
+
+
+@scenario("user-me", "get")
+def user_me(data):
+    return reverse("user:me"), {}
+
+
+@scenario("user-me-update", "patch")
+def user_me_update(data):
+    return reverse("user:me"), {"data": {"name": data.unique("name")}}
+
+
+for model in ("tag", "ingredient"):
+
+    @scenario(f"{model}-list", "get")
+    def attribute_list(data, model=model):
+        data.invalidate_responses()
+        return reverse(f"recipe:{model}-list"), {}
+
+    @scenario(f"{model}-list-cached", "get")
+    def attribute_list_cached(data, model=model):
+        return data.cached(reverse(f"recipe:{model}-list")), {}
+
+    @scenario(f"{model}-create", "post")
+    def attribute_create(data, model=model):
+        return reverse(f"recipe:{model}-list"), {"data": {"name": data.unique(model)}}
+
+    @scenario(f"{model}-import", "post")
+    def attribute_import(data, model=model):
+        body = "".join(json.dumps({"name": data.unique(model)}) + "\n" for _ in range(100))
+        return reverse(f"recipe:{model}-import"), {"data": body, "content_type": "application/x-ndjson"}
+
+
+@scenario("recipe-list", "get")
+def recipe_list(data):
+    data.invalidate_responses()
+    return reverse("recipe:recipe-list"), {}
+
+
+@scenario("recipe-list-cached", "get")
+def recipe_list_cached(data):
+    return data.cached(reverse("recipe:recipe-list")), {}
+
+
+@scenario("recipe-list-filtered", "get")
+def recipe_list_filtered(data):
+    data.invalidate_responses()
+    tags = ",".join(str(pk) for pk in data.random.sample(data.tag_ids, 2))
+    return reverse("recipe:recipe-list"), {"data": {"tags": tags, "match": "any"}}
+
+
+@scenario("recipe-list-filtered-all", "get")
+def recipe_list_filtered_all(data):
+    data.invalidate_responses()
+    tags = ",".join(str(pk) for pk in data.random.sample(data.tag_ids, 2))
+    return reverse("recipe:recipe-list"), {"data": {"tags": tags, "match": "all"}}
+
+
+@scenario("recipe-search", "get")
+def recipe_search(data):
+    data.invalidate_responses()
+    return reverse("recipe:recipe-list"), {"data": {"search": " ".join(data.random.sample(WORDS, 2))}}
+
+
+@scenario("recipe-create", "post")
+def recipe_create(data):
+    return reverse("recipe:recipe-list"), {"data": data.recipe_payload(), "format": "json"}
+
+
+@scenario("recipe-bulk", "post")
+def recipe_bulk(data):
+    return reverse("recipe:recipe-bulk"), {"data": [data.recipe_payload() for _ in range(20)], "format": "json"}
+
+
+@scenario("recipe-export", "get")
+def recipe_export(data):
+    return reverse("recipe:recipe-export"), {}
+
+
+@scenario("recipe-detail", "get")
+def recipe_detail(data):
+    return reverse("recipe:recipe-detail", args=[data.recipe().pk]), {}
+
+
+@scenario("recipe-replace", "put")
+def recipe_replace(data):
+    return reverse("recipe:recipe-detail", args=[data.recipe().pk]), {"data": data.recipe_payload(), "format": "json"}
+
+
+@scenario("recipe-update", "patch")
+def recipe_update(data):
+    url = reverse("recipe:recipe-detail", args=[data.recipe().pk])
+    return url, {"data": {"title": data.unique("renamed")}, "format": "json"}
+
+
+@scenario("recipe-delete", "delete")
+def recipe_delete(data):
+    return reverse("recipe:recipe-detail", args=[data.recipe().pk]), {}
+
+
+@scenario("recipe-upload-image", "post")
+def recipe_upload_image(data):
+    image = SimpleUploadedFile("benchmark.jpg", data.image, content_type="image/jpeg")
+    return reverse("recipe:recipe-upload-image", args=[data.recipe().pk]), {"data": {"image": image}}
+
+
+@scenario("recipe-upload-start", "post")
+def recipe_upload_start(data):
+    url = reverse("recipe:recipe-uploads", args=[data.recipe().pk])
+    return url, {"data": {"filename": "benchmark.jpg", "size": len(data.image)}}
+
+
+@scenario("recipe-upload-status", "get")
+def recipe_upload_status(data):
+    return upload_url("recipe-upload", data.upload()), {}
+
+
+@scenario("recipe-upload-chunk", "put")
+def recipe_upload_chunk(data):
+    size = len(data.image)
+    return upload_url("recipe-upload", data.upload()), {
+        "data": data.image,
+        "content_type": "application/octet-stream",
+        "HTTP_CONTENT_RANGE": f"bytes 0-{size - 1}/{size}",
+    }
+
+
+@scenario("recipe-upload-abort", "delete")
+def recipe_upload_abort(data):
+    return upload_url("recipe-upload", data.upload()), {}
+
+
+@scenario("recipe-upload-finalize", "post")
+def recipe_upload_finalize(data):
+    return upload_url("recipe-finalize-image-upload", data.upload(received=True)), {}
+
+
+class QueryCounter:
+    def __init__(self):
+        self.queries = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries += 1
+        return execute(sql, params, many, context)
+
+
+def run_scenario(data, name, iterations, warmup=0):
+    """Request endpoint name warmup + iterations times and summarize the last iterations"""
+    method, prepare = SCENARIOS[name]
+    seconds, queries, cache = [], [], []
+    for n in range(warmup + iterations):
+        url, kwargs = prepare(data)
+        counter = QueryCounter()
+        with connection.execute_wrapper(counter):
+            start = time.perf_counter()
+            response = getattr(data.client, method)(url, **kwargs)
+            if response.streaming:
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - start
+        if response.status_code >= 300:
+            raise CommandError(f"{name} answered {response.status_code}: {response.content[:200]!r}")
+        if n >= warmup:
+            seconds.append(elapsed)
+            queries.append(counter.queries)
+            cache.append(response.get("X-Cache"))
+
+    latencies = sorted(elapsed * 1000 for elapsed in seconds)
+    result = {
+        "method": method.upper(),
+        "requests": iterations,
+        **{key: round(percentile(latencies, fraction), 3) for key, fraction in PERCENTILES},
+        "throughput_rps": round(iterations / sum(seconds), 1),
+        "queries": max(queries),
+    }
+    if any(cache):
+        result["cache_hits"] = cache.count("HIT")
+    return result
+
+
+def compare(report, baseline, tolerance):
+    """Return the endpoints whose p95 latency grew by more than tolerance, or that run more queries"""
+    regressions = []
+    for name, current in report["endpoints"].items():
+        previous = baseline["endpoints"].get(name)
+        if previous is None:
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                {"endpoint": name, "metric": "p95_ms", "baseline": previous["p95_ms"], "current": current["p95_ms"]}
+            )
+        if current["queries"] > previous["queries"]:
+            regressions.append(
+                {"endpoint": name, "metric": "queries", "baseline": previous["queries"], "current": current["queries"]}
+            )
+    return regressions
+
+
+@contextmanager
+def benchmark_environment():
+    """Run in a new test database, with media files and uploads in a temporary directory
+
+    Image renditions are rendered inline, so no worker thread competes with the measured requests.
+    """
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    media_root = tempfile.mkdtemp(prefix="benchmark-")
+    try:
+        with override_settings(
+            MEDIA_ROOT=media_root, RECIPE_IMAGE_UPLOAD_DIR=os.path.join(media_root, "uploads"), RECIPE_IMAGE_WORKERS=0
+        ):
+            reset_response_cache()
+            yield
+    finally:
+        shutil.rmtree(media_root, ignore_errors=True)
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+class Command(BaseCommand):
+    """Django command to benchmark every API endpoint in-process against seeded data
+
+    Data and requests go to a new test database that is destroyed afterwards. Run it without
+    ASYNC_VIEWS, whose queries run on other threads and would not be counted. List endpoints are measured
+    both building their responses and, as `*-cached`, answering from the response cache. To compare the
+    serializer and values() read paths, run once without and once with FAST_READS=1 and pass the first
+    report as the baseline of the second.
+    """
+
+    help = "Seed a test database and report latency percentiles, throughput and queries of every endpoint as JSON."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=10, help="Number of users to seed.")
+        parser.add_argument("--recipes", type=int, default=100, help="Recipes per user.")
+        parser.add_argument("--tags", type=int, default=3, help="Tags per recipe.")
+        parser.add_argument("--ingredients", type=int, default=3, help="Ingredients per recipe.")
+        parser.add_argument("--iterations", type=int, default=50, help="Measured requests per endpoint.")
+        parser.add_argument("--warmup", type=int, default=5, help="Unmeasured requests per endpoint.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the generated data.")
+        parser.add_argument(
+            "--endpoint", action="append", choices=sorted(SCENARIOS), help="Only benchmark this endpoint, repeatable."
+        )
+        parser.add_argument("--output", help="Also write the report to this file, for use as a baseline.")
+        parser.add_argument("--baseline", help="Report to compare against, failing on regressions.")
+        parser.add_argument(
+            "--tolerance", type=float, default=0.2, help="Allowed relative p95 latency increase over the baseline."
+        )
+
+    def handle(self, *args, **options):
+        if options["users"] < 1 or options["iterations"] < 1:
+            raise CommandError("Expected at least one user and one iteration.")
+        if options["tags"] < 2 or options["ingredients"] < 1:
+            raise CommandError("Expected at least two tags and one ingredient per recipe.")
+        shape = {name: options[name] for name in ("users", "recipes", "tags", "ingredients")}
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"]) as file:
+                baseline = json.load(file)
+            # Checked before the slow part, which would be wasted
+            if baseline.get("shape") != shape:
+                raise CommandError(f"The baseline was measured with another data shape: {baseline.get('shape')}.")
+
+        with benchmark_environment():
+            data = BenchmarkData(**shape, seed=options["seed"])
+            endpoints = {
+                name: run_scenario(data, name, options["iterations"], options["warmup"])
+                for name in options["endpoint"] or SCENARIOS
+            }
+
+        report = {
+            "shape": data.shape,
+            "seed": options["seed"],
+            "fast_reads": settings.FAST_READS,
+            "iterations": options["iterations"],
+            "endpoints": endpoints,
+        }
+        if options["output"]:
+            with open(options["output"], "w") as file:
+                json.dump(report, file, indent=2)
+
+        regressions = []
+        if baseline is not None:
+            regressions = report["regressions"] = compare(report, baseline, options["tolerance"])
+        self.stdout.write(json.dumps(report, indent=2))
+        if regressions:
+            raise CommandError(f"{len(regressions)} regressions against {options['baseline']}.")
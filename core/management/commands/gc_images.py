@@ -0,0 +1,98 @@
+import os
+from contextlib import suppress
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.models import RECIPE_IMAGE_DIR, Recipe, RecipeImageUpload
+
+
+def walk(storage, directory):
+    """Yield the name of every file below directory in storage"""
+    if not storage.exists(directory):
+        return
+    directories, files = storage.listdir(directory)
+    for name in files:
+        yield os.path.join(directory, name)
+    for name in directories:
+        yield from walk(storage, os.path.join(directory, name))
+
+
+def remove_file(path):
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+
+class Command(BaseCommand):
+    """Django command to delete recipe image and rendition files no recipe refers to, and abandoned uploads
+
+    Image files are shared by every recipe with the same content, so replacing or deleting a recipe's image
+    never deletes the file: this command is the only place they are deleted.
+    """
+
+    help = "Delete recipe image and rendition files no recipe refers to, and expired chunked uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--grace",
+            type=int,
+            default=3600,
+            help="Keep files modified in the last GRACE seconds, which may belong to uncommitted uploads.",
+        )
+        parser.add_argument("--dry-run", action="store_true", help="Only report what would be deleted.")
+
+    def handle(self, *args, **options):
+        storage = Recipe._meta.get_field("image").storage
+        referenced = set()
+        rows = Recipe.objects.filter(image__gt="").values_list("image", "image_renditions").iterator(chunk_size=5000)
+        for image, renditions in rows:
+            referenced.add(image)
+            referenced.update((renditions or {}).values())
+
+        cutoff = timezone.now() - timedelta(seconds=options["grace"])
+        deleted = 0
+        for name in walk(storage, RECIPE_IMAGE_DIR):
+            if name in referenced or storage.get_modified_time(name) > cutoff:
+                continue
+            if not options["dry_run"]:
+                storage.delete(name)
+            deleted += 1
+
+        expired = self.delete_expired_uploads(options["dry_run"])
+        partial = self.delete_orphaned_partial_files(cutoff, options["dry_run"])
+
+        verb = "Would delete" if options["dry_run"] else "Deleted"
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"{verb} {deleted} unreferenced files, {expired} expired uploads and {partial} orphaned partial files."
+            )
+        )
+
+    def delete_expired_uploads(self, dry_run):
+        """Delete chunked uploads that received no chunk before they expired, with their partial files"""
+        expired = RecipeImageUpload.objects.filter(expires_at__lte=timezone.now())
+        uploads = list(expired.only("id"))
+        if not dry_run:
+            expired.filter(pk__in=[upload.pk for upload in uploads]).delete()
+            for upload in uploads:
+                remove_file(upload.path)
+        return len(uploads)
+
+    def delete_orphaned_partial_files(self, cutoff, dry_run):
+        """Delete partial files older than cutoff whose upload row is gone, e.g. after a failed discard"""
+        directory = settings.RECIPE_IMAGE_UPLOAD_DIR
+        if not os.path.isdir(directory):
+            return 0
+        known = {f"{upload_id}.part" for upload_id in RecipeImageUpload.objects.values_list("id", flat=True)}
+        deleted = 0
+        for entry in os.scandir(directory):
+            if not entry.name.endswith(".part") or entry.name in known:
+                continue
+            if entry.stat().st_mtime > cutoff.timestamp():
+                continue
+            if not dry_run:
+                remove_file(entry.path)
+            deleted += 1
+        return deleted
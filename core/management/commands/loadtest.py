@@ -0,0 +1,103 @@
+import http.client
+import math
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.core.management.base import BaseCommand, CommandError
+
+
+def percentile(ordered, fraction):
+    """Return the nearest-rank percentile of an ascending list"""
+    return ordered[max(math.ceil(fraction * len(ordered)) - 1, 0)]
+
+
+def run_client(url, headers, count, timeout, method="GET", body=None):
+    """Send count requests to url over one keep-alive connection, returning (status, seconds) pairs"""
+    parts = urlsplit(url)
+    connection_class = http.client.HTTPSConnection if parts.scheme == "https" else http.client.HTTPConnection
+    connection = connection_class(parts.netloc, timeout=timeout)
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    results = []
+    try:
+        for _ in range(count):
+            start = time.perf_counter()
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                status = None
+            results.append((status, time.perf_counter() - start))
+    finally:
+        connection.close()
+    return results
+
+
+class Command(BaseCommand):
+    """Django command to measure the throughput and latency of an endpoint under concurrent load
+
+    Compare the deployments by pointing it at each in turn, for example
+    `uvicorn main.asgi:application` (async views) and `gunicorn main.wsgi --threads 16` (WSGI). A login
+    burst, whose 503 answers show the password hashing backpressure, is
+    `loadtest <server>/api/user/token/ --method=POST --data='{"email": "...", "password": "..."}'`.
+    """
+
+    help = "Send concurrent requests to a URL and report throughput, statuses and latency percentiles."
+
+    def add_arguments(self, parser):
+        parser.add_argument("url")
+        parser.add_argument("--requests", type=int, default=1000, help="Total number of requests.")
+        parser.add_argument("--concurrency", type=int, default=50, help="Number of concurrent clients.")
+        parser.add_argument("--timeout", type=float, default=30, help="Seconds to wait for each response.")
+        parser.add_argument(
+            "-H", "--header", action="append", default=[], help='Request header as "Name: value", repeatable.'
+        )
+        parser.add_argument("-X", "--method", default="GET", choices=("GET", "POST", "PUT", "PATCH", "DELETE"))
+        parser.add_argument("-d", "--data", help="Request body, sent as JSON unless a Content-Type header is given.")
+
+    def handle(self, *args, **options):
+        if urlsplit(options["url"]).scheme not in ("http", "https"):
+            raise CommandError("Expected an http or https URL.")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("Expected at least one request and one client.")
+        try:
+            headers = dict(header.split(":", 1) for header in options["header"])
+        except ValueError:
+            raise CommandError('Expected headers as "Name: value".')
+        headers = {name.strip(): value.strip() for name, value in headers.items()}
+        body = None
+        if options["data"] is not None:
+            body = options["data"].encode()
+            if not any(name.lower() == "content-type" for name in headers):
+                headers["Content-Type"] = "application/json"
+
+        clients = min(options["concurrency"], options["requests"])
+        counts = [options["requests"] // clients + (n < options["requests"] % clients) for n in range(clients)]
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=clients) as executor:
+            batches = executor.map(
+                lambda count: run_client(
+                    options["url"], headers, count, options["timeout"], options["method"], body
+                ),
+                counts,
+            )
+            results = [result for batch in batches for result in batch]
+        elapsed = time.perf_counter() - start
+
+        statuses = Counter("error" if status is None else status for status, _ in results)
+        latencies = sorted(seconds * 1000 for _, seconds in results)
+        self.stdout.write(f"{len(results)} requests from {clients} clients in {elapsed:.2f} s")
+        self.stdout.write(f"throughput: {len(results) / elapsed:.1f} requests/s")
+        summary = ", ".join(f"{status} x{count}" for status, count in sorted(statuses.items(), key=str))
+        self.stdout.write(f"statuses: {summary}")
+        self.stdout.write(
+            "latency ms: "
+            + ", ".join(
+                f"{name} {percentile(latencies, fraction):.1f}"
+                for name, fraction in (("p50", 0.5), ("p90", 0.9), ("p99", 0.99), ("max", 1.0))
+            )
+        )
@@ -0,0 +1,267 @@
+import csv
+import io
+import json
+import random
+import time
+from contextlib import contextmanager
+from decimal import Decimal
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from PIL import Image
+
+from core.models import RECIPE_IMAGE_DIR, Ingredient, Recipe, Tag, UserDataVersion, initial_data_version
+from recipe.renditions import render, rendition_path
+
+
+WORDS = (
+    "chicken beef tofu lemon garlic curry soup salad roast spicy smoky sweet sour bread rice noodle "
+    "tomato basil pesto mushroom cheese pie tart stew grilled baked fried vegan quick"
+).split()
+
+# The row triggers of core migration 0007 that keep core_recipe_search in sync with inserts, by table
+SEARCH_TRIGGERS = {
+    "core_recipe": "core_recipe_search_recipe",
+    "core_recipe_tags": "core_recipe_search_tags",
+    "core_recipe_ingredients": "core_recipe_search_ingredients",
+}
+
+
+def batches(rows, size):
+    """Yield lists of up to size items of rows, consuming it lazily"""
+    rows = iter(rows)
+    batch = list(islice(rows, size))
+    while batch:
+        yield batch
+        batch = list(islice(rows, size))
+
+
+def copy_rows(model, columns, rows, batch_size):
+    """Insert rows, tuples of values of the columns named by attname, with PostgreSQL's COPY
+
+    Return the number of rows inserted.
+    """
+    attnames = {field.attname: field.column for field in model._meta.concrete_fields}
+    names = ", ".join(connection.ops.quote_name(attnames[column]) for column in columns)
+    sql = f"COPY {connection.ops.quote_name(model._meta.db_table)} ({names}) FROM STDIN WITH (FORMAT csv)"
+    count = 0
+    with connection.cursor() as cursor:
+        for batch in batches(rows, batch_size):
+            buffer = io.StringIO()
+            # Strings are quoted and None is not, which is how COPY tells empty strings from NULL
+            writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+            writer.writerows(tuple(json.dumps(v) if isinstance(v, dict) else v for v in row) for row in batch)
+            buffer.seek(0)
+            cursor.copy_expert(sql, buffer)
+            count += len(batch)
+    return count
+
+
+def create_rows(model, columns, rows, batch_size):
+    """Insert rows, tuples of values of the columns named by attname, with `bulk_create`
+
+    Return the number of rows inserted.
+    """
+    count = 0
+    for batch in batches(rows, batch_size):
+        model.objects.bulk_create((model(**dict(zip(columns, row))) for row in batch), batch_size=batch_size)
+        count += len(batch)
+    return count
+
+
+@contextmanager
+def deferred_search_index(first_recipe_id):
+    """Index the recipes inserted from first_recipe_id on in one statement once their links are written
+
+    On PostgreSQL the search triggers would rebuild the document of a recipe for its own row and again for
+    every tag and ingredient link. They are disabled for the load, which must run in a transaction so a
+    failure also rolls that back, and the documents of the new recipes are inserted at the end.
+
+    SQLite cannot disable triggers, so its FTS5 table is still filled row by row. The equivalent there is
+    to drop the link triggers (their SQL is in sqlite_master) for the load, recreate them, and fill the
+    tags and ingredients columns of the new rowids with a single UPDATE of core_recipe_search.
+    """
+    if connection.vendor != "postgresql":
+        yield
+        return
+
+    with connection.cursor() as cursor:
+        for table, trigger in SEARCH_TRIGGERS.items():
+            cursor.execute(f"ALTER TABLE {table} DISABLE TRIGGER {trigger}")
+    yield
+    with connection.cursor() as cursor:
+        for table, trigger in SEARCH_TRIGGERS.items():
+            cursor.execute(f"ALTER TABLE {table} ENABLE TRIGGER {trigger}")
+        cursor.execute(
+            "INSERT INTO core_recipe_search (recipe_id, document) "
+            "SELECT id, core_recipe_search_document(id) FROM core_recipe WHERE id >= %s",
+            [first_recipe_id],
+        )
+
+
+def placeholder_image(seed):
+    """Store one placeholder image and its renditions, returning the image name and renditions to share"""
+    rng = random.Random(seed)
+    source = Image.new("RGB", (800, 600), tuple(rng.randrange(256) for _ in range(3)))
+    buffer = io.BytesIO()
+    source.save(buffer, format="JPEG")
+
+    storage = Recipe._meta.get_field("image").storage
+    name = storage.save(f"{RECIPE_IMAGE_DIR}/placeholder.jpg", ContentFile(buffer.getvalue()))
+    renditions = {
+        rendition: storage.save(rendition_path(rendition, spec), ContentFile(render(source, spec)))
+        for rendition, spec in settings.RECIPE_IMAGE_RENDITIONS.items()
+    }
+    return name, renditions
+
+
+class Command(BaseCommand):
+    """Django command to fill a database with large amounts of generated data for performance testing
+
+    Rows are generated lazily and written batch by batch, with COPY on PostgreSQL and `bulk_create`
+    elsewhere, so memory use does not grow with the amount of data. Primary keys are assigned after the
+    largest existing ones, which lets relations be generated without reading anything back: do not run
+    it against a database receiving other writes. The same seed against the same database produces the
+    same data. Model signals do not run, so the data version of each user is inserted here, and on
+    PostgreSQL recipes are added to the search index once their links are written, see
+    `deferred_search_index`.
+    """
+
+    help = "Bulk insert generated users, tags, ingredients and recipes for performance environments."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1000, help="Number of users.")
+        parser.add_argument("--recipes", type=int, default=100, help="Recipes per user.")
+        parser.add_argument("--tags", type=int, default=20, help="Tags per user.")
+        parser.add_argument("--ingredients", type=int, default=50, help="Ingredients per user.")
+        parser.add_argument("--tags-per-recipe", type=int, default=3)
+        parser.add_argument("--ingredients-per-recipe", type=int, default=5)
+        parser.add_argument(
+            "--images", type=float, default=0.2, help="Share of recipes given the shared placeholder image."
+        )
+        parser.add_argument("--password", default="seed-pass", help="Password of every user.")
+        parser.add_argument("--seed", type=int, default=0, help="Seed of the generated data.")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Rows written at once.")
+
+    def handle(self, *args, **options):
+        if min(options["users"], options["batch_size"]) < 1:
+            raise CommandError("Expected at least one user and a positive batch size.")
+        if min(options["recipes"], options["tags"], options["ingredients"]) < 0:
+            raise CommandError("Expected positive numbers of recipes, tags and ingredients.")
+        if not 0 <= options["tags_per_recipe"] <= options["tags"]:
+            raise CommandError("--tags-per-recipe cannot exceed --tags.")
+        if not 0 <= options["ingredients_per_recipe"] <= options["ingredients"]:
+            raise CommandError("--ingredients-per-recipe cannot exceed --ingredients.")
+        if not 0 <= options["images"] <= 1:
+            raise CommandError("--images is a share between 0 and 1.")
+
+        self.options = options
+        self.insert = copy_rows if connection.vendor == "postgresql" else create_rows
+        User = get_user_model()
+        models = (User, Tag, Ingredient, Recipe)
+        first = {model: (model.objects.aggregate(last=Max("pk"))["last"] or 0) + 1 for model in models}
+        image = placeholder_image(options["seed"]) if options["images"] else ("", None)
+
+        with transaction.atomic():
+            self.write(
+                User,
+                ("id", "email", "name", "password", "is_active", "is_staff", "is_superuser"),
+                self.users(first[User]),
+            )
+            self.write(UserDataVersion, ("user_id", "version"), self.data_versions(first[User]))
+            self.write(Tag, ("id", "user_id", "name"), self.names(first[User], first[Tag], options["tags"], "tag"))
+            self.write(
+                Ingredient,
+                ("id", "user_id", "name"),
+                self.names(first[User], first[Ingredient], options["ingredients"], "ingredient"),
+            )
+            with deferred_search_index(first[Recipe]):
+                self.write(
+                    Recipe,
+                    ("id", "user_id", "title", "time_minutes", "price", "link", "image", "image_renditions"),
+                    self.recipes(first[User], first[Recipe], *image),
+                )
+                self.write(
+                    Recipe.tags.through,
+                    ("recipe_id", "tag_id"),
+                    self.links(first[Recipe], first[Tag], options["tags"], options["tags_per_recipe"], "tags"),
+                )
+                self.write(
+                    Recipe.ingredients.through,
+                    ("recipe_id", "ingredient_id"),
+                    self.links(
+                        first[Recipe],
+                        first[Ingredient],
+                        options["ingredients"],
+                        options["ingredients_per_recipe"],
+                        "ingredients",
+                    ),
+                )
+            with connection.cursor() as cursor:
+                # The sequences were bypassed by the explicit primary keys
+                for sql in connection.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+        self.stdout.write(self.style.SUCCESS("Seeded the database."))
+
+    def write(self, model, columns, rows):
+        start = time.perf_counter()
+        count = self.insert(model, columns, rows, self.options["batch_size"])
+        self.stdout.write(f"{model._meta.db_table}: {count} rows in {time.perf_counter() - start:.1f} s")
+
+    def random(self, table):
+        # One generator per table, so changing how one table is generated leaves the others as they were
+        return random.Random(f"{self.options['seed']}:{table}")
+
+    def users(self, first_id):
+        password = make_password(self.options["password"])
+        rng = self.random("users")
+        for user_id in range(first_id, first_id + self.options["users"]):
+            name = f"{rng.choice(WORDS).title()} {rng.choice(WORDS).title()}"
+            yield user_id, f"seed-{user_id}@example.com", name, password, True, False, False
+
+    def data_versions(self, first_user_id):
+        for user_id in range(first_user_id, first_user_id + self.options["users"]):
+            yield user_id, initial_data_version()
+
+    def names(self, first_user_id, first_id, per_user, prefix):
+        for n in range(self.options["users"] * per_user):
+            yield first_id + n, first_user_id + n // per_user, f"{prefix}-{n % per_user}"
+
+    def recipes(self, first_user_id, first_id, image, renditions):
+        rng = self.random("recipes")
+        per_user = self.options["recipes"]
+        for n in range(self.options["users"] * per_user):
+            recipe_id = first_id + n
+            title = f"{rng.choice(WORDS)} {rng.choice(WORDS)} {rng.choice(WORDS)} {n}"
+            price = Decimal(rng.randrange(100, 50000)) / 100
+            link = f"https://example.com/recipes/{recipe_id}" if rng.random() < 0.5 else ""
+            with_image = rng.random() < self.options["images"]
+            yield (
+                recipe_id,
+                first_user_id + n // per_user,
+                title,
+                rng.randrange(5, 240),
+                price,
+                link,
+                image if with_image else "",
+                renditions if with_image else None,
+            )
+
+    def links(self, first_recipe_id, first_id, per_user, per_recipe, table):
+        """Link every recipe to per_recipe distinct objects of its user, whose ids are consecutive"""
+        rng = self.random(table)
+        recipes = self.options["recipes"]
+        for n in range(self.options["users"] * recipes):
+            user_first_id = first_id + n // recipes * per_user
+            for offset in rng.sample(range(per_user), per_recipe):
+                yield first_recipe_id + n, user_first_id + offset
@@ -1,21 +1,42 @@
+import random
 import time
 
-from django.db import connections
+from django.db import DEFAULT_DB_ALIAS
 from django.db.utils import OperationalError
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+
+from core.health import ping
 
 
 class Command(BaseCommand):
     """Django command to pause execution until database is available"""
 
+    help = "Wait until the database accepts connections and answers a query, with exponential backoff."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--database", default=DEFAULT_DB_ALIAS, help="Database alias to wait for.")
+        parser.add_argument("--timeout", type=float, default=60, help="Give up after TIMEOUT seconds.")
+        parser.add_argument("--initial-delay", type=float, default=0.5, help="Seconds before the first retry.")
+        parser.add_argument("--max-delay", type=float, default=5, help="Upper bound of the delay between retries.")
+
     def handle(self, *args, **options):
         self.stdout.write("Waiting for database...")
-        db_conn = None
-        while not db_conn:
+        deadline = time.monotonic() + options["timeout"]
+        delay = options["initial_delay"]
+        attempts = 0
+        while True:
+            attempts += 1
             try:
-                db_conn = connections["default"]
-            except OperationalError:
-                self.stdout.write("Database unavailable waiting 1 second...")
-                time.sleep(1)
+                ping(options["database"])
+                break
+            except OperationalError as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise CommandError(f"Database unavailable after {attempts} attempts: {e}")
+                # Full jitter keeps containers started together from retrying in lockstep
+                pause = min(random.uniform(0, delay), remaining)
+                self.stdout.write(f"Database unavailable, retrying in {pause:.1f} seconds...")
+                time.sleep(pause)
+                delay = min(delay * 2, options["max_delay"])
 
         self.stdout.write(self.style.SUCCESS("Database available!"))
@@ -0,0 +1,185 @@
+from django.db import migrations
+
+# Recipes are indexed with their title and the names of their tags and ingredients in a side table
+# maintained entirely by triggers, so every write path (ORM, bulk operations, admin, raw SQL) keeps it in sync.
+
+SQLITE_TAG_NAMES = (
+    "(SELECT coalesce(group_concat(t.name, ' '), '') FROM core_tag t "
+    "JOIN core_recipe_tags rt ON rt.tag_id = t.id WHERE rt.recipe_id = {recipe})"
+)
+SQLITE_INGREDIENT_NAMES = (
+    "(SELECT coalesce(group_concat(i.name, ' '), '') FROM core_ingredient i "
+    "JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id WHERE ri.recipe_id = {recipe})"
+)
+
+SQLITE_FORWARD = [
+    "CREATE VIRTUAL TABLE core_recipe_search USING fts5(title, tags, ingredients, tokenize='porter unicode61')",
+    """CREATE TRIGGER core_recipe_search_recipe_insert AFTER INSERT ON core_recipe BEGIN
+        INSERT INTO core_recipe_search(rowid, title, tags, ingredients) VALUES (new.id, new.title, '', '');
+    END""",
+    """CREATE TRIGGER core_recipe_search_recipe_update AFTER UPDATE OF title ON core_recipe BEGIN
+        UPDATE core_recipe_search SET title = new.title WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER core_recipe_search_recipe_delete AFTER DELETE ON core_recipe BEGIN
+        DELETE FROM core_recipe_search WHERE rowid = old.id;
+    END""",
+    f"""CREATE TRIGGER core_recipe_search_tags_insert AFTER INSERT ON core_recipe_tags BEGIN
+        UPDATE core_recipe_search SET tags = {SQLITE_TAG_NAMES.format(recipe="new.recipe_id")}
+        WHERE rowid = new.recipe_id;
+    END""",
+    f"""CREATE TRIGGER core_recipe_search_tags_delete AFTER DELETE ON core_recipe_tags BEGIN
+        UPDATE core_recipe_search SET tags = {SQLITE_TAG_NAMES.format(recipe="old.recipe_id")}
+        WHERE rowid = old.recipe_id;
+    END""",
+    f"""CREATE TRIGGER core_recipe_search_tag_rename AFTER UPDATE OF name ON core_tag BEGIN
+        UPDATE core_recipe_search SET tags = {SQLITE_TAG_NAMES.format(recipe="core_recipe_search.rowid")}
+        WHERE rowid IN (SELECT recipe_id FROM core_recipe_tags WHERE tag_id = new.id);
+    END""",
+    f"""CREATE TRIGGER core_recipe_search_ingredients_insert AFTER INSERT ON core_recipe_ingredients BEGIN
+        UPDATE core_recipe_search SET ingredients = {SQLITE_INGREDIENT_NAMES.format(recipe="new.recipe_id")}
+        WHERE rowid = new.recipe_id;
+    END""",
+    f"""CREATE TRIGGER core_recipe_search_ingredients_delete AFTER DELETE ON core_recipe_ingredients BEGIN
+        UPDATE core_recipe_search SET ingredients = {SQLITE_INGREDIENT_NAMES.format(recipe="old.recipe_id")}
+        WHERE rowid = old.recipe_id;
+    END""",
+    f"""CREATE TRIGGER core_recipe_search_ingredient_rename AFTER UPDATE OF name ON core_ingredient BEGIN
+        UPDATE core_recipe_search
+        SET ingredients = {SQLITE_INGREDIENT_NAMES.format(recipe="core_recipe_search.rowid")}
+        WHERE rowid IN (SELECT recipe_id FROM core_recipe_ingredients WHERE ingredient_id = new.id);
+    END""",
+    f"""INSERT INTO core_recipe_search(rowid, title, tags, ingredients)
+        SELECT r.id, r.title, {SQLITE_TAG_NAMES.format(recipe="r.id")}, {SQLITE_INGREDIENT_NAMES.format(recipe="r.id")}
+        FROM core_recipe r""",
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER core_recipe_search_recipe_insert",
+    "DROP TRIGGER core_recipe_search_recipe_update",
+    "DROP TRIGGER core_recipe_search_recipe_delete",
+    "DROP TRIGGER core_recipe_search_tags_insert",
+    "DROP TRIGGER core_recipe_search_tags_delete",
+    "DROP TRIGGER core_recipe_search_tag_rename",
+    "DROP TRIGGER core_recipe_search_ingredients_insert",
+    "DROP TRIGGER core_recipe_search_ingredients_delete",
+    "DROP TRIGGER core_recipe_search_ingredient_rename",
+    "DROP TABLE core_recipe_search",
+]
+
+POSTGRESQL_FORWARD = [
+    """CREATE TABLE core_recipe_search (
+        recipe_id bigint PRIMARY KEY,
+        document tsvector NOT NULL
+    )""",
+    "CREATE INDEX core_recipe_search_document_idx ON core_recipe_search USING GIN (document)",
+    """CREATE FUNCTION core_recipe_search_document(recipe bigint) RETURNS tsvector AS $$
+        SELECT setweight(to_tsvector('english', r.title), 'A')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(t.name, ' ') FROM core_tag t
+                JOIN core_recipe_tags rt ON rt.tag_id = t.id WHERE rt.recipe_id = r.id
+            ), '')), 'B')
+            || setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(i.name, ' ') FROM core_ingredient i
+                JOIN core_recipe_ingredients ri ON ri.ingredient_id = i.id WHERE ri.recipe_id = r.id
+            ), '')), 'C')
+        FROM core_recipe r WHERE r.id = recipe
+    $$ LANGUAGE sql STABLE""",
+    """CREATE FUNCTION core_recipe_search_refresh(recipe bigint) RETURNS void AS $$
+        INSERT INTO core_recipe_search (recipe_id, document)
+        SELECT recipe, core_recipe_search_document(recipe)
+        WHERE EXISTS (SELECT 1 FROM core_recipe WHERE id = recipe)
+        ON CONFLICT (recipe_id) DO UPDATE SET document = EXCLUDED.document
+    $$ LANGUAGE sql""",
+    """CREATE FUNCTION core_recipe_search_on_recipe() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            DELETE FROM core_recipe_search WHERE recipe_id = OLD.id;
+        ELSE
+            PERFORM core_recipe_search_refresh(NEW.id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE FUNCTION core_recipe_search_on_link() RETURNS trigger AS $$
+    BEGIN
+        IF TG_OP = 'DELETE' THEN
+            PERFORM core_recipe_search_refresh(OLD.recipe_id);
+        ELSE
+            PERFORM core_recipe_search_refresh(NEW.recipe_id);
+        END IF;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE FUNCTION core_recipe_search_on_tag_rename() RETURNS trigger AS $$
+    BEGIN
+        PERFORM core_recipe_search_refresh(recipe_id) FROM core_recipe_tags WHERE tag_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE FUNCTION core_recipe_search_on_ingredient_rename() RETURNS trigger AS $$
+    BEGIN
+        PERFORM core_recipe_search_refresh(recipe_id) FROM core_recipe_ingredients WHERE ingredient_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER core_recipe_search_recipe AFTER INSERT OR DELETE OR UPDATE OF title ON core_recipe
+        FOR EACH ROW EXECUTE FUNCTION core_recipe_search_on_recipe()""",
+    """CREATE TRIGGER core_recipe_search_tags AFTER INSERT OR DELETE ON core_recipe_tags
+        FOR EACH ROW EXECUTE FUNCTION core_recipe_search_on_link()""",
+    """CREATE TRIGGER core_recipe_search_ingredients AFTER INSERT OR DELETE ON core_recipe_ingredients
+        FOR EACH ROW EXECUTE FUNCTION core_recipe_search_on_link()""",
+    """CREATE TRIGGER core_recipe_search_tag_rename AFTER UPDATE OF name ON core_tag
+        FOR EACH ROW EXECUTE FUNCTION core_recipe_search_on_tag_rename()""",
+    """CREATE TRIGGER core_recipe_search_ingredient_rename AFTER UPDATE OF name ON core_ingredient
+        FOR EACH ROW EXECUTE FUNCTION core_recipe_search_on_ingredient_rename()""",
+    """INSERT INTO core_recipe_search (recipe_id, document)
+        SELECT id, core_recipe_search_document(id) FROM core_recipe""",
+]
+
+POSTGRESQL_BACKWARD = [
+    "DROP TRIGGER core_recipe_search_recipe ON core_recipe",
+    "DROP TRIGGER core_recipe_search_tags ON core_recipe_tags",
+    "DROP TRIGGER core_recipe_search_ingredients ON core_recipe_ingredients",
+    "DROP TRIGGER core_recipe_search_tag_rename ON core_tag",
+    "DROP TRIGGER core_recipe_search_ingredient_rename ON core_ingredient",
+    "DROP FUNCTION core_recipe_search_on_recipe()",
+    "DROP FUNCTION core_recipe_search_on_link()",
+    "DROP FUNCTION core_recipe_search_on_tag_rename()",
+    "DROP FUNCTION core_recipe_search_on_ingredient_rename()",
+    "DROP FUNCTION core_recipe_search_refresh(bigint)",
+    "DROP FUNCTION core_recipe_search_document(bigint)",
+    "DROP TABLE core_recipe_search",
+]
+
+STATEMENTS = {
+    "sqlite": (SQLITE_FORWARD, SQLITE_BACKWARD),
+    "postgresql": (POSTGRESQL_FORWARD, POSTGRESQL_BACKWARD),
+}
+
+
+def _execute(schema_editor, direction):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        # Other databases fall back to unindexed title matching in recipe.search
+        return
+    for statement in statements[direction]:
+        schema_editor.execute(statement, params=None)
+
+
+def create_search_index(apps, schema_editor):
+    _execute(schema_editor, 0)
+
+
+def drop_search_index(apps, schema_editor):
+    _execute(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0006_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
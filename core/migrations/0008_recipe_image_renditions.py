@@ -0,0 +1,57 @@
+from django.db import migrations, models
+
+
+def _field(model):
+    field = models.JSONField(blank=True, editable=False, null=True)
+    field.set_attributes_from_name("image_renditions")
+    field.model = model
+    return field
+
+
+def add_column(apps, schema_editor):
+    model = apps.get_model("core", "Recipe")
+    field = _field(model)
+    if schema_editor.connection.vendor != "sqlite":
+        schema_editor.add_field(model, field)
+        return
+    # SQLite's schema editor rebuilds the whole table to add a column, which drops the search triggers
+    # from 0007. A nullable column without a default can be added in place.
+    definition, params = schema_editor.column_sql(model, field)
+    schema_editor.execute(
+        f"ALTER TABLE {schema_editor.quote_name(model._meta.db_table)} "
+        f"ADD COLUMN {schema_editor.quote_name(field.column)} {definition}",
+        params,
+    )
+
+
+def remove_column(apps, schema_editor):
+    model = apps.get_model("core", "Recipe")
+    field = _field(model)
+    if schema_editor.connection.vendor != "sqlite":
+        schema_editor.remove_field(model, field)
+        return
+    schema_editor.execute(
+        f"ALTER TABLE {schema_editor.quote_name(model._meta.db_table)} DROP COLUMN {schema_editor.quote_name(field.column)}"
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0007_recipe_search'),
+    ]
+
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AddField(
+                    model_name='recipe',
+                    name='image_renditions',
+                    field=models.JSONField(blank=True, editable=False, null=True),
+                ),
+            ],
+            database_operations=[
+                migrations.RunPython(add_column, remove_column),
+            ],
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:09
+
+import core.models
+import core.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0009_recipeimageupload'),
+    ]
+
+    operations = [
+        # Storage is not part of the schema, and altering the field would make SQLite rebuild core_recipe
+        # without the search triggers from 0007
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='recipe',
+                    name='image',
+                    field=models.ImageField(null=True, storage=core.storage.get_recipe_image_storage, upload_to=core.models.recipe_image_file_path),
+                ),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['image'], name='core_recipe_image_idx'),
+        ),
+    ]
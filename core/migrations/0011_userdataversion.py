@@ -0,0 +1,31 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:13
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_versions(apps, schema_editor):
+    User = apps.get_model("core", "User")
+    UserDataVersion = apps.get_model("core", "UserDataVersion")
+    UserDataVersion.objects.bulk_create(
+        (UserDataVersion(user_id=pk) for pk in User.objects.values_list("pk", flat=True).iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0010_content_addressed_images'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserDataVersion',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, serialize=False, to='core.user')),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(create_versions, migrations.RunPython.noop),
+    ]
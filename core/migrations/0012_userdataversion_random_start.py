@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-17 05:16
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0011_userdataversion'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='userdataversion',
+            name='version',
+            field=models.PositiveBigIntegerField(default=core.models.initial_data_version),
+        ),
+    ]
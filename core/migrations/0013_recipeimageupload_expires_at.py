@@ -0,0 +1,19 @@
+# Generated by Django 3.2.25 on 2026-10-17 06:03
+
+import core.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0012_userdataversion_random_start'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipeimageupload',
+            name='expires_at',
+            field=models.DateTimeField(db_index=True, default=core.models.upload_expiry),
+        ),
+    ]
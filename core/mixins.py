@@ -0,0 +1,209 @@
+import functools
+import hashlib
+
+from django.conf import settings
+from django.utils.http import parse_etags
+from rest_framework import status
+from rest_framework.exceptions import APIException
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+
+from core.passwords import PasswordHashingBusy, reject_when_busy
+from core.response_cache import RESPONSE_CACHE, cache_key, get_response, normalized_query, set_response
+from core.timing import timed
+from core.versioning import get_data_version
+
+
+def _opaque(etag):
+    return etag[2:] if etag.startswith("W/") else etag
+
+
+def user_data_etag(user_id, version, request):
+    """Return the ETag of a response to request for a user's data at version"""
+    key = ":".join(
+        str(part) for part in (user_id, version, request.get_full_path(), request.META.get("HTTP_ACCEPT", ""))
+    )
+    return f'"{hashlib.sha1(key.encode()).hexdigest()}"'
+
+
+def etag_matches(etag, request):
+    """Return whether request's If-None-Match matches etag"""
+    # If-None-Match uses the weak comparison, so W/ prefixes added by proxies still match
+    if_none_match = {_opaque(tag) for tag in parse_etags(request.META.get("HTTP_IF_NONE_MATCH", ""))}
+    return etag in if_none_match or "*" in if_none_match
+
+
+def _detach(data):
+    """Copy serializer output into plain dicts and lists that hold no reference to the serializer"""
+    if isinstance(data, dict):
+        return {key: _detach(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_detach(value) for value in data]
+    return data
+
+
+def _cache_rendered(key, response):
+    """Cache the data of a rendered list response under key"""
+    set_response(key, _detach(response.data), len(response.content))
+
+
+class UserDataVersionMixin:
+    @property
+    def data_version(self):
+        """The requesting user's data version, read once per request"""
+        if not hasattr(self, "_data_version"):
+            self._data_version = get_data_version(self.request.user.pk)
+        return self._data_version
+
+
+class UserDataETagMixin(UserDataVersionMixin):
+    """Tag list and retrieve responses with an ETag of the user's data version and answer a match with 304
+
+    The version lives in its own table and is bumped by `core.signals` whenever the user's recipes, tags or
+    ingredients change, so revalidating never touches those tables. The ETag also covers the request URL,
+    making it specific to the query string and, for detail routes, to the object.
+    """
+
+    def get_etag(self, request):
+        return user_data_etag(request.user.pk, self.data_version, request)
+
+    def check_exists(self):
+        """Raise Http404 unless there is something to answer a matching ETag with 304 for"""
+
+    def _conditional(self, handler, request, *args, **kwargs):
+        etag = self.get_etag(request)
+        if etag_matches(etag, request):
+            self.check_exists()
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = handler(request, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response["ETag"] = etag
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self._conditional(super().list, request, *args, **kwargs)
+
+
+class UserDataETagDetailMixin(UserDataETagMixin):
+    """`UserDataETagMixin` for viewsets that also retrieve objects
+
+    Kept apart because routers add a detail route for any viewset with a `retrieve` attribute. The ETag of a
+    detail route is the same whether or not the object exists, so a match only gets a 304 once a single
+    primary key query found the object.
+    """
+
+    def check_exists(self):
+        if self.action != "retrieve":
+            return
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).prefetch_related(None).values_list("pk")
+        get_object_or_404(queryset, **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+
+    def retrieve(self, request, *args, **kwargs):
+        return self._conditional(super().retrieve, request, *args, **kwargs)
+
+
+class CachedListMixin(UserDataVersionMixin):
+    """Serve list responses from a per-user cache keyed by the user's data version and query string
+
+    Every change to the user's recipes, tags or ingredients bumps the version, so entries of older versions
+    are never hit again and just age out of the cache. Responses carry `X-Cache: HIT` or `MISS`.
+    """
+
+    def list(self, request, *args, **kwargs):
+        if not RESPONSE_CACHE["ENABLED"]:
+            return super().list(request, *args, **kwargs)
+
+        # Pagination links are absolute, so the host and scheme are part of the key
+        key = cache_key(
+            request.user.pk,
+            self.data_version,
+            type(self).__name__,
+            request.build_absolute_uri(request.path),
+            normalized_query(request.query_params),
+        )
+        data = get_response(key)
+        if data is not None:
+            response = Response(data)
+            response["X-Cache"] = "HIT"
+            return response
+
+        response = super().list(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            # Sized by the rendered body once it exists, rather than by encoding the data a second time
+            response.add_post_render_callback(functools.partial(_cache_rendered, key))
+        response["X-Cache"] = "MISS"
+        return response
+
+
+class FastReadMixin:
+    """Answer list requests from values() rows instead of model instances when settings.FAST_READS is on
+
+    Views implement `fast_read_values(queryset)`, returning a values() queryset that includes the ordering
+    fields the paginator needs, and `fast_read_rows(rows)`, turning rows into exactly what the view's
+    serializer would render.
+    """
+
+    def fast_reads_enabled(self):
+        return settings.FAST_READS
+
+    def _fast_read_queryset(self):
+        # Prefetches only apply to model instances
+        return self.fast_read_values(self.filter_queryset(self.get_queryset()).prefetch_related(None))
+
+    def list(self, request, *args, **kwargs):
+        if not self.fast_reads_enabled():
+            return super().list(request, *args, **kwargs)
+
+        queryset = self._fast_read_queryset()
+        page = self.paginate_queryset(queryset)
+        rows = list(queryset) if page is None else page
+        with timed("serialize"):
+            data = self.fast_read_rows(rows)
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+
+
+class FastReadDetailMixin(FastReadMixin):
+    """`FastReadMixin` for viewsets that also retrieve objects, whose permissions are checked on the row"""
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.fast_reads_enabled():
+            return super().retrieve(request, *args, **kwargs)
+
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(self._fast_read_queryset(), **{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        self.check_object_permissions(request, row)
+        with timed("serialize"):
+            data = self.fast_read_rows([row])[0]
+        return Response(data)
+
+
+class SignInsBusy(APIException):
+    """Response to a login or signup rejected by `PasswordHashingBackpressureMixin`"""
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "Too many sign-ins right now, try again shortly."
+    default_code = "password_hashing_busy"
+
+    def __init__(self, wait):
+        super().__init__()
+        # Sent as Retry-After by the DRF exception handler
+        self.wait = wait
+
+
+class PasswordHashingBackpressureMixin:
+    """Answer POST with 503 and Retry-After when the password hashing pool is full, instead of queueing
+
+    Only endpoints clients retry, such as logins and signups, shed load this way. Everything else hashing
+    a password, like the admin or management commands, waits for a free slot.
+    """
+
+    def post(self, request, *args, **kwargs):
+        try:
+            with reject_when_busy():
+                return super().post(request, *args, **kwargs)
+        except PasswordHashingBusy as e:
+            raise SignInsBusy(e.retry_after) from e
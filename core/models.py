@@ -1,17 +1,29 @@
+import secrets
 import uuid
 import os
+from datetime import timedelta
+
 from django.db import models
 from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, PermissionsMixin
 from django.conf import settings
 from django.db.models.deletion import CASCADE
+from django.utils import timezone
+
+from core.passwords import hash_password, verify_password
+from core.storage import get_recipe_image_storage
+
+
+RECIPE_IMAGE_DIR = "uploads/recipe"
+# The largest primary key a BigAutoField can hold
+MAX_ID = 2**63 - 1
 
 
 def recipe_image_file_path(instance, filename):
-    """Generate filepath for new recipe image"""
+    """Generate filepath for new recipe image, whose name the content addressed storage replaces by its hash"""
     ext = filename.split(".")[-1]
     filename = f"{uuid.uuid4()}.{ext}"
 
-    return os.path.join("uploads/recipe", filename)
+    return os.path.join(RECIPE_IMAGE_DIR, filename)
 
 
 class UserManager(BaseUserManager):
@@ -47,6 +59,21 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     USERNAME_FIELD = "email"
 
+    def set_password(self, raw_password):
+        """Set the password, hashing it on the bounded password hashing pool"""
+        self.password = hash_password(raw_password)
+        self._password = raw_password
+
+    def check_password(self, raw_password):
+        """Check the password on the hashing pool, rehashing it when the hasher settings changed"""
+        correct, outdated = verify_password(raw_password, self.password)
+        if correct and outdated:
+            self.set_password(raw_password)
+            # A rehash is not a password change
+            self._password = None
+            self.save(update_fields=["password"])
+        return correct
+
 
 class Tag(models.Model):
     """Tags to be used for recipe"""
@@ -54,6 +81,9 @@ class Tag(models.Model):
     name = models.CharField(max_length=255, null=False, blank=False)
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=CASCADE)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "name", "id"], name="core_tag_user_name_idx")]
+
     def __str__(self) -> str:
         return self.name
 
@@ -64,6 +94,9 @@ class Ingredient(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=CASCADE)
     name = models.CharField(max_length=255, blank=False, null=False)
 
+    class Meta:
+        indexes = [models.Index(fields=["user", "name", "id"], name="core_ingredient_user_name_idx")]
+
     def __str__(self):
         return self.name
 
@@ -76,7 +109,53 @@ class Recipe(models.Model):
     link = models.CharField(max_length=255, blank=True)
     ingredients = models.ManyToManyField("Ingredient")
     tags = models.ManyToManyField("Tag")
-    image = models.ImageField(null=True, upload_to=recipe_image_file_path)
+    image = models.ImageField(null=True, upload_to=recipe_image_file_path, storage=get_recipe_image_storage)
+    # {rendition name: storage path}, filled in by recipe.renditions once the current image is processed
+    image_renditions = models.JSONField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "id"], name="core_recipe_user_pk_idx"),
+        ]
 
     def __str__(self):
         return self.title
+
+
+def upload_expiry():
+    """Return when an upload that receives no further chunks is abandoned"""
+    return timezone.now() + timedelta(seconds=settings.RECIPE_IMAGE_UPLOAD_EXPIRY)
+
+
+class RecipeImageUpload(models.Model):
+    """Chunked recipe image upload in progress, whose bytes are kept in a temporary file until finalized"""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    recipe = models.ForeignKey("Recipe", on_delete=CASCADE, related_name="image_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(default=upload_expiry, db_index=True)
+
+    @property
+    def path(self):
+        return os.path.join(settings.RECIPE_IMAGE_UPLOAD_DIR, f"{self.id}.part")
+
+    def __str__(self):
+        return f"{self.filename} ({self.received}/{self.size})"
+
+
+def initial_data_version():
+    """Start versions at a random value, so a user id reused after a restore never repeats a version"""
+    return secrets.randbits(62)
+
+
+class UserDataVersion(models.Model):
+    """Counter bumped whenever any of a user's recipes, tags or ingredients change"""
+
+    user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=CASCADE, primary_key=True)
+    version = models.PositiveBigIntegerField(default=initial_data_version)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.version}"
@@ -0,0 +1,155 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from collections import namedtuple
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured, ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import CursorPagination
+from rest_framework.utils.urls import replace_query_param
+
+
+KeysetCursor = namedtuple("KeysetCursor", ["reverse", "position"])
+
+
+def _reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith("-") else f"-{field}" for field in ordering)
+
+
+class KeysetPagination(CursorPagination):
+    """Opaque cursor pagination keyed on the view's ordering fields plus the primary key
+
+    Unlike `CursorPagination`, the cursor stores the full position of the last row seen, so pages are
+    fetched with a `WHERE (name, id) < (...)` style predicate and never need an offset or a `COUNT(*)`.
+    """
+
+    ordering = ("-id",)
+    page_size_query_param = "page_size"
+    max_page_size = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+
+        self.base_url = request.build_absolute_uri()
+        self.ordering = self.get_ordering(request, queryset, view)
+        self.cursor = self.decode_cursor(request)
+        reverse = bool(self.cursor and self.cursor.reverse)
+
+        ordering = _reverse_ordering(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if self.cursor is not None:
+            try:
+                position = self._position_values(queryset.model, ordering, self.cursor.position)
+                queryset = queryset.filter(self._after_position(ordering, position))
+            except (TypeError, ValueError, ValidationError):
+                # A tampered cursor holding values the ordering fields cannot take
+                raise NotFound(self.invalid_cursor_message)
+
+        results = list(queryset[: self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[: self.page_size]
+        if reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.cursor is not None
+
+        if not self.page:
+            self.has_next = self.has_previous = False
+
+        return self.page
+
+    def get_ordering(self, request, queryset, view):
+        """Return the view's ordering, made unique by a trailing primary key"""
+        if hasattr(view, "get_ordering"):
+            ordering = view.get_ordering()
+        else:
+            ordering = getattr(view, "ordering", None) or self.ordering
+        if isinstance(ordering, str):
+            ordering = (ordering,)
+        ordering = tuple(ordering)
+        if any("__" in field for field in ordering):
+            raise ImproperlyConfigured("Keyset pagination needs direct field orderings")
+
+        if ordering[-1].lstrip("-") not in ("id", "pk"):
+            ordering += ("-id" if ordering[-1].startswith("-") else "id",)
+        return ordering
+
+    def _position_values(self, model, ordering, position):
+        """Convert the values of a decoded position to the types of the fields they order by"""
+        if len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        values = []
+        for field, value in zip(ordering, position):
+            if isinstance(value, (list, dict)):
+                raise TypeError(f"Unexpected {type(value).__name__} in cursor")
+            name = field.lstrip("-")
+            try:
+                model_field = model._meta.pk if name == "pk" else model._meta.get_field(name)
+            except FieldDoesNotExist:
+                # Annotations, such as the search rank, are numbers
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    raise TypeError(f"Expected a number for {name} in cursor")
+                values.append(value)
+            else:
+                values.append(model_field.to_python(value))
+        return values
+
+    def _after_position(self, ordering, position):
+        """Build the predicate selecting rows strictly after `position` in `ordering`"""
+        clauses = []
+        for index, field in enumerate(ordering):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            equal = {ordering[i].lstrip("-"): position[i] for i in range(index)}
+            clauses.append(Q(**equal, **{f"{name}__{lookup}": position[index]}))
+        return reduce(or_, clauses)
+
+    def _get_position_from_instance(self, instance, ordering):
+        names = [field.lstrip("-") for field in ordering]
+        if isinstance(instance, dict):
+            return [instance[name] for name in names]
+        return [getattr(instance, name) for name in names]
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        position = self._get_position_from_instance(self.page[-1], self.ordering)
+        return self.encode_cursor(KeysetCursor(reverse=False, position=position))
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+
+        position = self._get_position_from_instance(self.page[0], self.ordering)
+        return self.encode_cursor(KeysetCursor(reverse=True, position=position))
+
+    def decode_cursor(self, request):
+        """Given a request with a cursor, return a `KeysetCursor` instance"""
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode("ascii")))
+            cursor = KeysetCursor(reverse=bool(payload.get("r")), position=list(payload["p"]))
+        except (TypeError, ValueError, KeyError, AttributeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        return cursor
+
+    def encode_cursor(self, cursor):
+        """Given a `KeysetCursor` instance, return an url with encoded cursor"""
+        payload = {"p": cursor.position}
+        if cursor.reverse:
+            payload["r"] = 1
+
+        encoded = urlsafe_b64encode(json.dumps(payload, separators=(",", ":")).encode("ascii")).decode("ascii")
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
@@ -0,0 +1,92 @@
+import contextvars
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, is_password_usable, make_password
+
+
+class PasswordHashingBusy(Exception):
+    """Too many passwords are being hashed to take on another one; retry after `retry_after` seconds"""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Password hashing is busy, retry after {retry_after} seconds.")
+        self.retry_after = retry_after
+
+
+_reject_when_busy = contextvars.ContextVar("reject_when_busy", default=False)
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """Return the process wide (executor, semaphore of free slots) hashing passwords"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            options = settings.PASSWORD_HASHING
+            executor = ThreadPoolExecutor(max_workers=options["WORKERS"], thread_name_prefix="password-hashing")
+            _pool = (executor, threading.BoundedSemaphore(options["MAX_PENDING"]))
+    return _pool
+
+
+def reset_pool():
+    """Shut the hashing pool down, so the next hash builds one from the current settings"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool[0].shutdown(wait=True)
+
+
+@contextmanager
+def reject_when_busy():
+    """Make hashing in the block raise `PasswordHashingBusy` instead of waiting while the pool is full"""
+    token = _reject_when_busy.set(True)
+    try:
+        yield
+    finally:
+        _reject_when_busy.reset(token)
+
+
+def run_hashing(func, *args):
+    """Run func(*args) on the hashing pool and return its result
+
+    At most PASSWORD_HASHING["WORKERS"] hashes run at once, so a burst of logins cannot take every CPU
+    from other requests. When MAX_PENDING calls are already running or queued, wait for one to finish,
+    or within `reject_when_busy` raise `PasswordHashingBusy` at once. PBKDF2 releases the GIL while it
+    hashes, so threads run in parallel.
+    """
+    executor, slots = get_pool()
+    if _reject_when_busy.get():
+        if not slots.acquire(blocking=False):
+            raise PasswordHashingBusy(settings.PASSWORD_HASHING["RETRY_AFTER"])
+    else:
+        slots.acquire()
+    try:
+        future = executor.submit(func, *args)
+    except BaseException:
+        slots.release()
+        raise
+    future.add_done_callback(lambda future: slots.release())
+    return future.result()
+
+
+def hash_password(password):
+    """`make_password` on the hashing pool"""
+    if password is None:
+        return make_password(None)
+    return run_hashing(make_password, password)
+
+
+def verify_password(password, encoded):
+    """Return whether password matches encoded, and whether encoded should be rehashed with the current settings
+
+    Only the hashing runs on the pool, so rehashing and saving stays with the caller and its connection.
+    """
+    if password is None or not is_password_usable(encoded):
+        return False, False
+    outdated = []
+    correct = run_hashing(check_password, password, encoded, outdated.append)
+    return correct, bool(outdated)
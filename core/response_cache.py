@@ -0,0 +1,84 @@
+import hashlib
+import threading
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+
+from core.cache import LRUCache
+
+
+RESPONSE_CACHE = {
+    "ENABLED": True,
+    "MAX_SIZE": 5000,
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "MAX_ENTRY_BYTES": 1024 * 1024,
+    "TIMEOUT": 300,
+    "CACHE_ALIAS": None,
+    **getattr(settings, "RESPONSE_CACHE", {}),
+}
+
+response_cache = LRUCache(
+    max_size=RESPONSE_CACHE["MAX_SIZE"], timeout=RESPONSE_CACHE["TIMEOUT"], max_cost=RESPONSE_CACHE["MAX_BYTES"]
+)
+
+_stats_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0, "skipped": 0}
+
+
+def _backend():
+    alias = RESPONSE_CACHE["CACHE_ALIAS"]
+    return caches[alias] if alias else response_cache
+
+
+def _record(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def normalized_query(query_params):
+    """Return the query string with its parameters sorted, so equivalent URLs share an entry"""
+    return urlencode(sorted((key, value) for key, values in query_params.lists() for value in values))
+
+
+def cache_key(user_id, version, *parts):
+    """Return the key of a response of a user's data at version, identified by parts"""
+    digest = hashlib.sha1(":".join(str(part) for part in parts).encode()).hexdigest()
+    return f"response:{user_id}:{version}:{digest}"
+
+
+def get_response(key):
+    """Return the cached response data for key, or None"""
+    entry = _backend().get(key)
+    _record("misses" if entry is None else "hits")
+    return entry
+
+
+def set_response(key, entry, size):
+    """Cache the response data entry under key, unless its rendered size is larger than MAX_ENTRY_BYTES"""
+    if size > RESPONSE_CACHE["MAX_ENTRY_BYTES"]:
+        _record("skipped")
+        return
+    backend = _backend()
+    if backend is response_cache:
+        response_cache.set(key, entry, RESPONSE_CACHE["TIMEOUT"], cost=size)
+    else:
+        backend.set(key, entry, RESPONSE_CACHE["TIMEOUT"])
+
+
+def response_cache_stats():
+    """Return this process's hit, miss and skipped counts and, for the local LRU, its size in entries and bytes"""
+    with _stats_lock:
+        stats = dict(_stats)
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = stats["hits"] / lookups if lookups else None
+    if not RESPONSE_CACHE["CACHE_ALIAS"]:
+        stats["size"] = len(response_cache)
+        stats["bytes"] = response_cache.cost
+    return stats
+
+
+def reset_response_cache():
+    response_cache.clear()
+    with _stats_lock:
+        _stats.update(hits=0, misses=0, skipped=0)
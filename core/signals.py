@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from core.authentication import invalidate_tokens
+from core.models import Ingredient, Recipe, Tag, UserDataVersion
+from core.timing import record_queries
+from core.versioning import bump_data_version
+
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def invalidate_token(sender, instance, **kwargs):
+    """Drop a deleted or rotated token from the authentication cache"""
+    invalidate_tokens(instance.key)
+
+
+@receiver(post_save, sender=get_user_model())
+def invalidate_user_tokens(sender, instance, created, update_fields=None, **kwargs):
+    """Drop a user's cached tokens when the user may have been deactivated or changed password"""
+    if created or (update_fields is not None and not {"is_active", "password"} & set(update_fields)):
+        return
+
+    invalidate_tokens(*Token.objects.filter(user=instance).values_list("key", flat=True))
+
+
+@receiver(post_save, sender=get_user_model())
+def create_data_version(sender, instance, created, raw=False, **kwargs):
+    """Give every new user the counter their data changes are recorded in"""
+    if created and not raw:
+        UserDataVersion.objects.get_or_create(user=instance)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_owner_data_version(sender, instance, **kwargs):
+    """Invalidate the ETags of the owner of a changed recipe, tag or ingredient"""
+    bump_data_version(instance.user_id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+@receiver(m2m_changed, sender=Recipe.ingredients.through)
+def bump_linked_data_version(sender, instance, action, **kwargs):
+    """Invalidate the ETags of the owner of a recipe whose tags or ingredients changed"""
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_data_version(instance.user_id)
+
+
+connection_created.connect(record_queries)
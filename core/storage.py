@@ -0,0 +1,61 @@
+import hashlib
+import os
+import re
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+
+
+# <first two hex digits>/<SHA-256 hex digest>.<extension>, as named by ContentAddressedStorage
+CONTENT_ADDRESSED_NAME = re.compile(r"(?:^|/)([0-9a-f]{2})/(\1[0-9a-f]{62})\.\w+$")
+
+
+def content_digest(name):
+    """Return the SHA-256 digest a content addressed file name carries, or None for other names"""
+    match = CONTENT_ADDRESSED_NAME.search(name)
+    return match.group(2) if match else None
+
+
+class ContentAddressedStorage(FileSystemStorage):
+    """File system storage naming every file by the SHA-256 of its content, so identical files are stored once
+
+    Only the directory and the extension of the requested name are kept: `uploads/recipe/x.jpg` is saved
+    as `uploads/recipe/<first two hex digits>/<hex digest>.jpg`. Saving content that is already stored
+    returns the existing name, only refreshing its modification time so `gc_images` keeps the file through
+    its grace period while the recipe referring to it is committed. Files are never deleted here.
+    """
+
+    def content_name(self, name, content):
+        """Return the name content is stored under, hashing it chunk by chunk"""
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        content.seek(0)
+        directory, filename = os.path.split(name)
+        hexdigest = digest.hexdigest()
+        return os.path.join(directory, hexdigest[:2], f"{hexdigest}{os.path.splitext(filename)[1].lower()}")
+
+    def save(self, name, content, max_length=None):
+        if name is None:
+            name = content.name
+        if not hasattr(content, "chunks"):
+            content = File(content, name)
+
+        name = self.content_name(name, content)
+        try:
+            os.utime(self.path(name))
+            return name
+        except FileNotFoundError:
+            pass
+        saved = super().save(name, content, max_length=max_length)
+        if saved != name:
+            # Another process stored the same content first, so keep its file
+            self.delete(saved)
+        return name
+
+
+recipe_image_storage = ContentAddressedStorage()
+
+
+def get_recipe_image_storage():
+    return recipe_image_storage
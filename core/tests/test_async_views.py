@@ -0,0 +1,233 @@
+import asyncio
+import importlib
+import json
+import os
+import threading
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth import get_user_model
+from django.http import HttpResponse
+from django.test import RequestFactory, TransactionTestCase, override_settings
+from django.urls import clear_url_caches
+from rest_framework.authtoken.models import Token
+
+from core.async_views import AsyncRouter, async_view
+from core.authentication import TOKEN_AUTH_CACHE, token_cache
+from core.factories import RecipeFactory
+from core.timing import RequestTiming, _current
+from recipe.views import RecipeViewSet, TagViewSet
+from user.views import ManageUserView
+
+
+class AsyncViewTests(TransactionTestCase):
+    """Test serving DRF views through async views"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.token = Token.objects.create(user=self.user)
+        self.recipe = RecipeFactory.create(user=self.user, image=None)
+        self.factory = RequestFactory()
+        self.list_view = RecipeViewSet.as_view({"get": "list"})
+
+    def _get(self, path="/api/recipe/recipes/", **extra):
+        return self.factory.get(path, HTTP_AUTHORIZATION=f"Token {self.token.key}", **extra)
+
+    async def test_same_response_as_sync_view(self):
+        """Test the async view returns what the synchronous view returns"""
+        expected = await sync_to_async(lambda: self.list_view(self._get()).render())()
+
+        response = await async_view(self.list_view)(self._get())
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response["ETag"], expected["ETag"])
+
+    async def test_measured_in_worker_thread(self):
+        """Test queries and rendering in the pool thread count towards the measured request"""
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            await async_view(self.list_view)(self._get())
+        finally:
+            _current.reset(token)
+
+        self.assertGreater(timing.queries, 0)
+        self.assertIn("render", timing.durations)
+
+    async def test_not_modified_on_event_loop(self):
+        """Test a revalidation with a cached token is answered without running the DRF view"""
+        view = async_view(self.list_view)
+        etag = (await view(self._get()))["ETag"]
+
+        with patch("core.async_views._respond", side_effect=AssertionError):
+            response = await view(self._get(HTTP_IF_NONE_MATCH=etag))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], etag)
+
+    async def test_shared_token_cache_read_off_event_loop(self):
+        """Test a token missing from the local cache is looked up in the shared cache on a pool thread"""
+        view = async_view(self.list_view)
+        etag = (await view(self._get()))["ETag"]
+        token_cache.clear()
+        threads = []
+
+        def get_cached_token(key):
+            threads.append(threading.current_thread())
+            return self.token
+
+        with patch.dict(TOKEN_AUTH_CACHE, CACHE_ALIAS="default"), patch(
+            "core.async_views.get_cached_token", get_cached_token
+        ), patch("core.async_views._respond", side_effect=AssertionError):
+            response = await view(self._get(HTTP_IF_NONE_MATCH=etag))
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(threads), 1)
+        self.assertIsNot(threads[0], threading.main_thread())
+
+    async def test_changed_data_runs_view(self):
+        """Test a stale ETag falls through to the view"""
+        view = async_view(self.list_view)
+        etag = (await view(self._get()))["ETag"]
+        await sync_to_async(RecipeFactory.create)(user=self.user, image=None)
+
+        response = await view(self._get(HTTP_IF_NONE_MATCH=etag))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+
+    async def test_missing_object_not_modified(self):
+        """Test a wildcard revalidation of a missing recipe runs the view and gets a 404"""
+        detail_view = async_view(RecipeViewSet.as_view({"get": "retrieve"}))
+        missing = self.recipe.id + 1000
+
+        response = await detail_view(self._get(f"/api/recipe/recipes/{missing}/", HTTP_IF_NONE_MATCH="*"), pk=missing)
+
+        self.assertEqual(response.status_code, 404)
+
+    async def test_detail_and_user_views(self):
+        """Test detail routes and the user view work through async views"""
+        detail_view = async_view(RecipeViewSet.as_view({"get": "retrieve"}))
+        response = await detail_view(self._get(f"/api/recipe/recipes/{self.recipe.id}/"), pk=self.recipe.id)
+        self.assertEqual(response.data["id"], self.recipe.id)
+
+        response = await async_view(ManageUserView.as_view())(self._get("/api/user/me/"))
+        self.assertEqual(response.data["email"], "user1@test.com")
+
+    async def test_requests_run_concurrently(self):
+        """Test the synchronous parts of two requests run at the same time"""
+        barrier = threading.Barrier(2, timeout=5)
+
+        def blocking_view(request):
+            barrier.wait()
+            return HttpResponse("ok")
+
+        view = async_view(blocking_view)
+        responses = await asyncio.gather(view(self.factory.get("/")), view(self.factory.get("/")))
+
+        self.assertEqual([response.content for response in responses], [b"ok", b"ok"])
+
+
+class AsyncRouterTests(TransactionTestCase):
+    """Test the async router"""
+
+    def test_wraps_viewset_routes(self):
+        """Test viewset routes become async views that keep their DRF attributes, and the API root does not"""
+        router = AsyncRouter()
+        router.register("tags", TagViewSet)
+
+        callbacks = {url.name: url.callback for url in router.urls}
+
+        self.assertTrue(asyncio.iscoroutinefunction(callbacks["tag-list"]))
+        self.assertIs(callbacks["tag-list"].cls, TagViewSet)
+        self.assertTrue(callbacks["tag-list"].csrf_exempt)
+        self.assertFalse(asyncio.iscoroutinefunction(callbacks["api-root"]))
+
+    def test_streaming_actions_stay_synchronous(self):
+        """Test actions streaming from the database are not wrapped, while the other routes are"""
+        router = AsyncRouter()
+        router.register("recipes", RecipeViewSet)
+
+        callbacks = {url.name: url.callback for url in router.urls}
+
+        self.assertFalse(asyncio.iscoroutinefunction(callbacks["recipe-export"]))
+        self.assertTrue(asyncio.iscoroutinefunction(callbacks["recipe-list"]))
+
+
+def reload_urlconfs():
+    """Rebuild the URL configuration, which picks sync or async views when it is imported"""
+    for name in ("recipe.urls", "user.urls", "main.urls"):
+        importlib.reload(importlib.import_module(name))
+    clear_url_caches()
+
+
+class AsgiApplicationTests(TransactionTestCase):
+    """Test the API served end to end by main.asgi, which turns async views on"""
+
+    def setUp(self):
+        with patch.dict(os.environ):
+            from main.asgi import application
+        self.application = application
+        with override_settings(ASYNC_VIEWS=True):
+            reload_urlconfs()
+        self.addCleanup(reload_urlconfs)
+
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.token = Token.objects.create(user=self.user)
+        self.recipes = RecipeFactory.create_batch(3, user=self.user, image=None)
+
+    async def _get(self, path):
+        """Send a GET through the ASGI application, returning the status, headers and whole body"""
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": b"",
+            "headers": [(b"host", b"testserver"), (b"authorization", f"Token {self.token.key}".encode())],
+            "server": ("testserver", 80),
+            "client": ("127.0.0.1", 50000),
+        }
+        communicator = ApplicationCommunicator(self.application, scope)
+        await communicator.send_input({"type": "http.request", "body": b""})
+        start = await communicator.receive_output(timeout=5)
+        body = b""
+        while True:
+            message = await communicator.receive_output(timeout=5)
+            body += message.get("body", b"")
+            if not message.get("more_body"):
+                break
+        await communicator.wait(timeout=5)
+        return start["status"], dict(start["headers"]), body
+
+    async def test_list(self):
+        """Test a list is served through the async view"""
+        status, headers, body = await self._get("/api/recipe/recipes/")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(len(json.loads(body)["results"]), 3)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    async def test_timed_in_async_middleware_chain(self):
+        """Test the middleware chain stays asynchronous and still counts the queries of the worker threads"""
+        status, headers, body = await self._get("/api/recipe/recipes/")
+
+        self.assertEqual(status, 200)
+        self.assertTrue(asyncio.iscoroutinefunction(self.application._middleware_chain))
+        self.assertRegex(headers[b"Server-Timing"].decode(), r'db;dur=[0-9.]+;desc="[1-9][0-9]* queries"')
+
+    async def test_streaming_export(self):
+        """Test the export, whose rows are read while it is streamed, never queries from the event loop"""
+        status, headers, body = await self._get("/api/recipe/recipes/export/")
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"Content-Type"], b"application/x-ndjson")
+        exported = [json.loads(line)["id"] for line in body.decode().splitlines()]
+        self.assertEqual(exported, sorted(recipe.id for recipe in self.recipes))
+        # Streamed as it is generated rather than buffered first
+        self.assertNotIn(b"Content-Length", headers)
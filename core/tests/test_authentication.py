@@ -0,0 +1,116 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.authentication import token_cache
+from core.cache import LRUCache
+
+
+ME_URL = reverse("user:me")
+
+
+class LRUCacheTests(TestCase):
+    def test_evicts_least_recently_used(self):
+        """Test the oldest untouched entry is evicted when the cache is full"""
+        cache = LRUCache(max_size=2)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        self.assertEqual(cache.get("a"), 1)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), 3)
+
+    def test_entries_expire(self):
+        """Test entries are not returned after their timeout"""
+        now = [0]
+        cache = LRUCache(max_size=2, timeout=10, clock=lambda: now[0])
+        cache.set("a", 1)
+
+        now[0] = 9
+        self.assertEqual(cache.get("a"), 1)
+        now[0] = 10
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_bounded_by_cost(self):
+        """Test least recently used entries are evicted while the total cost is over the bound"""
+        cache = LRUCache(max_size=10, max_cost=10)
+        cache.set("a", 1, cost=4)
+        cache.set("b", 2, cost=4)
+        cache.set("c", 3, cost=4)
+
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.get("b"), 2)
+        self.assertEqual(cache.cost, 8)
+
+        cache.set("b", 4, cost=1)
+        self.assertEqual(cache.cost, 5)
+
+    def test_value_over_cost_bound_is_not_stored(self):
+        """Test a value costing more than the whole cache is skipped without evicting anything"""
+        cache = LRUCache(max_size=10, max_cost=10)
+        cache.set("a", 1, cost=4)
+        cache.set("b", 2, cost=11)
+
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), 1)
+        self.assertEqual(cache.cost, 4)
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass1234")
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token.key}")
+
+    def test_token_resolved_from_cache(self):
+        """Test that a known token does not hit the database again"""
+        self.client.get(ME_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["email"], self.user.email)
+
+    def test_deleted_token_invalidated(self):
+        """Test that a deleted token stops authenticating"""
+        self.client.get(ME_URL)
+        self.token.delete()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_invalidated(self):
+        """Test that deactivating a user invalidates their cached tokens"""
+        self.client.get(ME_URL)
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(ME_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_invalidates_cache(self):
+        """Test that changing password evicts the user's cached tokens"""
+        self.client.get(ME_URL)
+        self.user.set_password("newpass1234")
+        self.user.save(update_fields=["password"])
+
+        self.assertIsNone(token_cache.get(self.token.key))
+
+    def test_unrelated_update_keeps_cache(self):
+        """Test that saving unrelated user fields keeps the cached token"""
+        self.client.get(ME_URL)
+        self.user.name = "Renamed"
+        self.user.save(update_fields=["name"])
+
+        self.assertIsNotNone(token_cache.get(self.token.key))
@@ -1,22 +1,386 @@
+import json
+import os
+import shutil
+import tempfile
+from contextlib import nullcontext
+from datetime import timedelta
+from io import StringIO
 from unittest.mock import patch
 
-from django.core.management import call_command
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.management import CommandError, call_command
+from django.db import connection
 from django.db.utils import OperationalError
-from django.test import TestCase
+from django.test import LiveServerTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import resolve, reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.factories import RecipeFactory, UserFactory
+from core.management.commands.benchmark import SCENARIOS, BenchmarkData, compare
+from core.management.commands.loadtest import percentile
+from core.management.commands.seed_data import batches
+from core.models import Recipe, RecipeImageUpload, Tag, UserDataVersion
 
 
 class CommandTests(TestCase):
     def test_wait_for_db_ready(self):
         """Test waiting for db when db is available"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.return_value = True
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 1)
+        with patch("core.management.commands.wait_for_db.ping") as ping:
+            call_command("wait_for_db", stdout=StringIO())
+            self.assertEqual(ping.call_count, 1)
+
+    def test_wait_for_db_queries_database(self):
+        """Test the database is actually queried, not just looked up"""
+        with CaptureQueriesContext(connection) as queries:
+            call_command("wait_for_db", stdout=StringIO())
+
+        self.assertEqual([query["sql"] for query in queries], ["SELECT 1"])
 
     @patch("time.sleep", return_value=True)
     def test_wait_for_db(self, ts):
         """Test waiting for db when it's not available"""
-        with patch("django.db.utils.ConnectionHandler.__getitem__") as gi:
-            gi.side_effect = [OperationalError] * 5 + [True]
-            call_command("wait_for_db")
-            self.assertEqual(gi.call_count, 6)
+        with patch("core.management.commands.wait_for_db.ping") as ping:
+            ping.side_effect = [OperationalError] * 5 + [None]
+            call_command("wait_for_db", stdout=StringIO())
+            self.assertEqual(ping.call_count, 6)
+
+    @patch("random.uniform", side_effect=lambda low, high: high)
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_backs_off(self, ts, uniform):
+        """Test the delay between attempts doubles up to the maximum"""
+        with patch("core.management.commands.wait_for_db.ping") as ping:
+            ping.side_effect = [OperationalError] * 5 + [None]
+            call_command("wait_for_db", "--initial-delay=1", "--max-delay=5", stdout=StringIO())
+
+        self.assertEqual([c.args[0] for c in ts.call_args_list], [1, 2, 4, 5, 5])
+
+    @patch("time.sleep", return_value=True)
+    def test_wait_for_db_deadline(self, ts):
+        """Test the command fails once the deadline has passed"""
+        clock = iter(range(0, 1000, 10))
+        with patch("core.management.commands.wait_for_db.ping", side_effect=OperationalError("refused")), patch(
+            "time.monotonic", side_effect=lambda: next(clock)
+        ):
+            with self.assertRaisesMessage(CommandError, "Database unavailable after 3 attempts"):
+                call_command("wait_for_db", "--timeout=25", stdout=StringIO())
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT, RECIPE_IMAGE_UPLOAD_DIR=f"{settings.TEST_MEDIA_ROOT}/partial")
+class GarbageCollectImagesTests(TestCase):
+    def setUp(self):
+        self.storage = Recipe._meta.get_field("image").storage
+        self.used = self.storage.save("uploads/recipe/used.jpg", ContentFile(b"used"))
+        self.rendition = self.storage.save("uploads/recipe/renditions/thumbnail.jpg", ContentFile(b"thumb"))
+        self.orphan = self.storage.save("uploads/recipe/orphan.jpg", ContentFile(b"orphan"))
+        RecipeFactory.create(
+            user=UserFactory.create(), image=self.used, image_renditions={"thumbnail": self.rendition}
+        )
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def test_gc_images_deletes_unreferenced_files(self):
+        """Test only files no recipe refers to are deleted"""
+        call_command("gc_images", grace=0, stdout=StringIO())
+
+        self.assertTrue(self.storage.exists(self.used))
+        self.assertTrue(self.storage.exists(self.rendition))
+        self.assertFalse(self.storage.exists(self.orphan))
+
+    def test_gc_images_keeps_recent_files(self):
+        """Test files modified within the grace period are kept"""
+        call_command("gc_images", stdout=StringIO())
+
+        self.assertTrue(self.storage.exists(self.orphan))
+
+    def test_gc_images_dry_run(self):
+        """Test a dry run only reports the files it would delete"""
+        out = StringIO()
+        call_command("gc_images", grace=0, dry_run=True, stdout=out)
+
+        self.assertTrue(self.storage.exists(self.orphan))
+        self.assertIn("Would delete 1", out.getvalue())
+
+    def _upload(self, recipe, **fields):
+        upload = RecipeImageUpload.objects.create(recipe=recipe, filename="photo.png", size=10, **fields)
+        os.makedirs(settings.RECIPE_IMAGE_UPLOAD_DIR, exist_ok=True)
+        open(upload.path, "wb").close()
+        return upload
+
+    def test_gc_images_deletes_expired_uploads(self):
+        """Test uploads past their expiry are deleted with their partial files, and others are kept"""
+        recipe = Recipe.objects.get()
+        expired = self._upload(recipe, expires_at=timezone.now() - timedelta(seconds=1))
+        active = self._upload(recipe)
+
+        call_command("gc_images", stdout=StringIO())
+
+        self.assertEqual(list(RecipeImageUpload.objects.all()), [active])
+        self.assertFalse(os.path.exists(expired.path))
+        self.assertTrue(os.path.exists(active.path))
+
+    def test_gc_images_deletes_old_orphaned_partial_files(self):
+        """Test partial files without an upload are deleted once older than the grace period"""
+        upload = self._upload(Recipe.objects.get())
+        orphan = os.path.join(settings.RECIPE_IMAGE_UPLOAD_DIR, "orphan.part")
+        open(orphan, "wb").close()
+
+        call_command("gc_images", stdout=StringIO())
+        self.assertTrue(os.path.exists(orphan))
+
+        call_command("gc_images", grace=0, stdout=StringIO())
+        self.assertFalse(os.path.exists(orphan))
+        self.assertTrue(os.path.exists(upload.path))
+
+
+@override_settings(
+    MEDIA_ROOT=settings.TEST_MEDIA_ROOT,
+    RECIPE_IMAGE_UPLOAD_DIR=f"{settings.TEST_MEDIA_ROOT}/partial",
+    RECIPE_IMAGE_WORKERS=0,
+)
+@patch("core.management.commands.benchmark.benchmark_environment", nullcontext)
+class BenchmarkCommandTests(TestCase):
+    options = ("--users=2", "--recipes=3", "--iterations=2", "--warmup=0")
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def _benchmark(self, *args):
+        out = StringIO()
+        call_command("benchmark", *self.options, *args, stdout=out)
+        return json.loads(out.getvalue())
+
+    def test_covers_every_endpoint(self):
+        """Test every route of the recipe and user APIs has a benchmark"""
+        from recipe.urls import router
+        from user.urls import urlpatterns
+
+        routes = {f"recipe:{url.name}" for url in router.urls if url.name != "api-root"}
+        routes |= {f"user:{url.name}" for url in urlpatterns}
+        data = BenchmarkData(users=1, recipes=1, tags=2, ingredients=1)
+
+        covered = {resolve(prepare(data)[0].split("?")[0]).view_name for _, prepare in SCENARIOS.values()}
+
+        self.assertEqual(covered, routes)
+
+    def test_report(self):
+        """Test the report holds the shape and latency, throughput and queries of every endpoint"""
+        report = self._benchmark()
+
+        self.assertEqual(report["shape"], {"users": 2, "recipes": 3, "tags": 3, "ingredients": 3})
+        self.assertEqual(set(report["endpoints"]), set(SCENARIOS))
+        for result in report["endpoints"].values():
+            self.assertEqual(result["requests"], 2)
+            self.assertLessEqual(result["p50_ms"], result["p95_ms"])
+            self.assertLessEqual(result["p95_ms"], result["p99_ms"])
+            self.assertGreater(result["throughput_rps"], 0)
+            self.assertGreaterEqual(result["queries"], 0)
+
+    def test_list_cache_hits_and_misses_are_separate(self):
+        """Test list endpoints are measured building their response, and separately answered from the cache"""
+        report = self._benchmark("--endpoint=tag-list", "--endpoint=tag-list-cached", "--endpoint=recipe-list")
+        endpoints = report["endpoints"]
+
+        self.assertEqual(endpoints["tag-list"]["cache_hits"], 0)
+        self.assertEqual(endpoints["recipe-list"]["cache_hits"], 0)
+        self.assertEqual(endpoints["tag-list-cached"]["cache_hits"], 2)
+        self.assertLess(endpoints["tag-list-cached"]["queries"], endpoints["tag-list"]["queries"])
+
+    def test_report_records_read_path(self):
+        """Test the report says which read path was measured, so runs with and without FAST_READS compare"""
+        with override_settings(FAST_READS=True):
+            report = self._benchmark("--endpoint=recipe-list", "--endpoint=recipe-search")
+
+        self.assertTrue(report["fast_reads"])
+
+    def test_baseline_regressions(self):
+        """Test a run slower than its baseline fails and lists the regressions"""
+        report = {
+            "shape": {"users": 2, "recipes": 3, "tags": 3, "ingredients": 3},
+            "endpoints": {"recipe-list": {"p95_ms": 0.0001, "queries": 0}},
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            baseline = os.path.join(directory, "baseline.json")
+            with open(baseline, "w") as file:
+                json.dump(report, file)
+
+            out = StringIO()
+            with self.assertRaisesMessage(CommandError, "2 regressions"):
+                call_command("benchmark", *self.options, "--endpoint=recipe-list", "--baseline", baseline, stdout=out)
+
+        metrics = [regression["metric"] for regression in json.loads(out.getvalue())["regressions"]]
+        self.assertEqual(metrics, ["p95_ms", "queries"])
+
+    def test_compare_tolerance(self):
+        """Test latency within the tolerance and fewer queries are not regressions"""
+        baseline = {"endpoints": {"recipe-list": {"p95_ms": 10.0, "queries": 3}}}
+        report = {
+            "endpoints": {"recipe-list": {"p95_ms": 11.9, "queries": 2}, "tag-list": {"p95_ms": 5, "queries": 9}}
+        }
+
+        self.assertEqual(compare(report, baseline, 0.2), [])
+        self.assertEqual(len(compare(report, baseline, 0.1)), 1)
+
+    def test_baseline_with_other_shape(self):
+        """Test comparing against a baseline of another data shape fails before seeding anything"""
+        with tempfile.NamedTemporaryFile("w", suffix=".json") as baseline, patch(
+            "core.management.commands.benchmark.benchmark_environment", side_effect=AssertionError
+        ):
+            json.dump({"shape": {"users": 1}, "endpoints": {}}, baseline)
+            baseline.flush()
+
+            with self.assertRaisesMessage(CommandError, "another data shape"):
+                call_command(
+                    "benchmark", *self.options, "--endpoint=tag-list", f"--baseline={baseline.name}", stdout=StringIO()
+                )
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT)
+class SeedDataCommandTests(TestCase):
+    options = (
+        "--users=3",
+        "--recipes=4",
+        "--tags=5",
+        "--ingredients=6",
+        "--tags-per-recipe=2",
+        "--ingredients-per-recipe=3",
+        "--images=0.5",
+        "--batch-size=7",
+    )
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def _seed(self, *args):
+        call_command("seed_data", *self.options, *args, stdout=StringIO())
+
+    def _snapshot(self, recipes):
+        return [
+            (recipe.title, recipe.price, recipe.image.name, sorted(tag.name for tag in recipe.tags.all()))
+            for recipe in recipes.order_by("id").prefetch_related("tags")
+        ]
+
+    def test_seed_data(self):
+        """Test the requested shape is inserted, with relations within each user's data"""
+        self._seed()
+
+        User = get_user_model()
+        self.assertEqual(User.objects.count(), 3)
+        self.assertEqual(UserDataVersion.objects.count(), 3)
+        self.assertEqual(Tag.objects.count(), 15)
+        self.assertEqual(Recipe.objects.count(), 12)
+        self.assertEqual(Recipe.tags.through.objects.count(), 24)
+        self.assertEqual(Recipe.ingredients.through.objects.count(), 36)
+        for recipe in Recipe.objects.prefetch_related("tags", "ingredients"):
+            self.assertEqual({tag.user_id for tag in recipe.tags.all()}, {recipe.user_id})
+            self.assertEqual({ingredient.user_id for ingredient in recipe.ingredients.all()}, {recipe.user_id})
+        self.assertTrue(User.objects.first().check_password("seed-pass"))
+
+    def test_images_are_shared(self):
+        """Test recipes with an image share one stored placeholder and its renditions"""
+        self._seed()
+
+        with_image = Recipe.objects.exclude(image="")
+        self.assertEqual(with_image.values("image", "image_renditions").distinct().count(), 1)
+        self.assertTrue(with_image.first().image.storage.exists(with_image.first().image.name))
+        self.assertEqual(set(with_image.first().image_renditions), set(settings.RECIPE_IMAGE_RENDITIONS))
+
+    def test_deterministic(self):
+        """Test the same seed generates the same data after existing rows"""
+        self._seed()
+        first_ids = list(Recipe.objects.values_list("id", flat=True))
+        self._seed()
+
+        first = self._snapshot(Recipe.objects.filter(id__in=first_ids))
+        second = self._snapshot(Recipe.objects.exclude(id__in=first_ids))
+        self.assertEqual(first, second)
+        self.assertEqual(get_user_model().objects.count(), 6)
+
+    def test_seeded_data_is_served(self):
+        """Test the API serves the seeded recipes"""
+        self._seed()
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.first())
+
+        res = client.get(reverse("recipe:recipe-list"))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.data["results"]), 4)
+
+    def test_seeded_recipes_are_searchable(self):
+        """Test the seeded recipes are in the search index with their tags"""
+        self._seed()
+        recipe = Recipe.objects.prefetch_related("tags").order_by("id").first()
+        client = APIClient()
+        client.force_authenticate(recipe.user)
+        terms = f"{recipe.title.split()[0]} {recipe.tags.first().name}"
+
+        res = client.get(reverse("recipe:recipe-list"), {"search": terms})
+
+        self.assertIn(recipe.id, [result["id"] for result in res.data["results"]])
+
+    def test_invalid_shape(self):
+        """Test more links per recipe than objects per user is rejected"""
+        with self.assertRaisesMessage(CommandError, "--tags-per-recipe cannot exceed --tags"):
+            self._seed("--tags-per-recipe=6")
+
+    def test_batches_are_lazy(self):
+        """Test rows are consumed one batch at a time"""
+        consumed = []
+        rows = (consumed.append(n) or n for n in range(5))
+
+        chunks = batches(rows, 2)
+
+        self.assertEqual(next(chunks), [0, 1])
+        self.assertEqual(consumed, [0, 1])
+        self.assertEqual(list(chunks), [[2, 3], [4]])
+
+
+class LoadTestCommandTests(LiveServerTestCase):
+    def test_percentile(self):
+        """Test nearest-rank percentiles"""
+        values = list(range(1, 101))
+
+        self.assertEqual([percentile(values, f) for f in (0.5, 0.99, 1.0)], [50, 99, 100])
+        self.assertEqual(percentile([7], 0.99), 7)
+
+    def test_loadtest_reports_latency(self):
+        """Test every request is sent with the headers and summarized"""
+        user = UserFactory.create()
+        token = Token.objects.create(user=user)
+        out = StringIO()
+
+        call_command(
+            "loadtest",
+            f"{self.live_server_url}/api/recipe/tags/",
+            "--requests=10",
+            "--concurrency=3",
+            f"--header=Authorization: Token {token.key}",
+            stdout=out,
+        )
+
+        self.assertIn("10 requests from 3 clients", out.getvalue())
+        self.assertIn("statuses: 200 x10", out.getvalue())
+        self.assertIn("p99", out.getvalue())
+
+    def test_loadtest_login_burst(self):
+        """Test requests can be sent with another method and a JSON body, such as a burst of logins"""
+        get_user_model().objects.create_user("burst@test.com", "burst-pass")
+        out = StringIO()
+
+        call_command(
+            "loadtest",
+            f"{self.live_server_url}/api/user/token/",
+            "--requests=6",
+            "--concurrency=3",
+            "--method=POST",
+            '--data={"email": "burst@test.com", "password": "burst-pass"}',
+            stdout=out,
+        )
+
+        self.assertIn("statuses: 200 x6", out.getvalue())
@@ -0,0 +1,108 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.passwords import (
+    PasswordHashingBusy,
+    hash_password,
+    reject_when_busy,
+    reset_pool,
+    run_hashing,
+    verify_password,
+)
+
+
+@override_settings(PASSWORD_HASHING={"WORKERS": 2, "MAX_PENDING": 3, "RETRY_AFTER": 2})
+class PasswordHashingPoolTests(SimpleTestCase):
+    def setUp(self):
+        reset_pool()
+        self.addCleanup(reset_pool)
+
+    def test_runs_on_pool(self):
+        """Test hashing runs on the password hashing threads"""
+        name = run_hashing(lambda: threading.current_thread().name)
+
+        self.assertTrue(name.startswith("password-hashing"))
+
+    def test_rejects_beyond_max_pending(self):
+        """Test calls beyond MAX_PENDING running or queued ones fail at once when asked to"""
+        release = threading.Event()
+        running = threading.Semaphore(0)
+
+        def hold():
+            running.release()
+            release.wait(5)
+
+        threads = [threading.Thread(target=run_hashing, args=(hold,)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        # Two run, the third waits in the queue
+        running.acquire(timeout=5)
+        running.acquire(timeout=5)
+        try:
+            with self.assertRaises(PasswordHashingBusy) as cm, reject_when_busy():
+                run_hashing(hold)
+        finally:
+            release.set()
+            for thread in threads:
+                thread.join()
+
+        self.assertEqual(cm.exception.retry_after, 2)
+        self.assertEqual(run_hashing(lambda: "free again"), "free again")
+
+    def test_waits_beyond_max_pending_by_default(self):
+        """Test calls beyond MAX_PENDING wait for a free slot outside `reject_when_busy`"""
+        release = threading.Event()
+        threads = [threading.Thread(target=run_hashing, args=(lambda: release.wait(5),)) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        waiting = threading.Thread(target=run_hashing, args=(lambda: "done",))
+        waiting.start()
+
+        waiting.join(0.2)
+        self.assertTrue(waiting.is_alive())
+        release.set()
+        waiting.join(5)
+        for thread in threads:
+            thread.join()
+        self.assertFalse(waiting.is_alive())
+
+    def test_errors_release_slots(self):
+        """Test a failing call frees its slot"""
+        for _ in range(4):
+            with self.assertRaises(ZeroDivisionError):
+                run_hashing(lambda: 1 / 0)
+
+        self.assertEqual(run_hashing(lambda: 1), 1)
+
+    def test_verify_password(self):
+        """Test verifying reports whether the hash is outdated"""
+        encoded = hash_password("secret-pass")
+
+        self.assertEqual(verify_password("secret-pass", encoded), (True, False))
+        self.assertEqual(verify_password("wrong", encoded), (False, False))
+        hasher = PBKDF2PasswordHasher()
+        outdated = hasher.encode("secret-pass", hasher.salt(), iterations=1000)
+        self.assertEqual(verify_password("secret-pass", outdated), (True, True))
+
+    def test_unusable_password(self):
+        """Test unusable passwords are not sent to the pool"""
+        with self.settings(PASSWORD_HASHING={"WORKERS": 1, "MAX_PENDING": 0, "RETRY_AFTER": 1}):
+            reset_pool()
+            with reject_when_busy():
+                encoded = hash_password(None)
+
+                self.assertEqual(verify_password("anything", encoded), (False, False))
+
+
+class UserPasswordTests(TestCase):
+    def test_set_password_uses_pool(self):
+        """Test user passwords are hashed on the pool"""
+        user = get_user_model()(email="user@test.com")
+        with override_settings(PASSWORD_HASHING={"WORKERS": 1, "MAX_PENDING": 0, "RETRY_AFTER": 1}):
+            reset_pool()
+            self.addCleanup(reset_pool)
+            with self.assertRaises(PasswordHashingBusy), reject_when_busy():
+                user.set_password("secret-pass")
@@ -0,0 +1,52 @@
+import hashlib
+import os
+import shutil
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.test import TestCase, override_settings
+
+from core.storage import ContentAddressedStorage
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT)
+class ContentAddressedStorageTests(TestCase):
+    def setUp(self):
+        self.storage = ContentAddressedStorage()
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def test_name_is_content_hash(self):
+        """Test a file is named by the SHA-256 of its content below the requested directory"""
+        digest = hashlib.sha256(b"photo").hexdigest()
+
+        name = self.storage.save("uploads/recipe/random-name.JPG", ContentFile(b"photo"))
+
+        self.assertEqual(name, f"uploads/recipe/{digest[:2]}/{digest}.jpg")
+        with self.storage.open(name) as file:
+            self.assertEqual(file.read(), b"photo")
+
+    def test_identical_content_is_stored_once(self):
+        """Test saving the same content twice returns the existing file"""
+        name1 = self.storage.save("uploads/recipe/a.jpg", ContentFile(b"photo"))
+        name2 = self.storage.save("uploads/recipe/b.jpg", ContentFile(b"photo"))
+
+        self.assertEqual(name1, name2)
+        self.assertEqual(len(self.storage.listdir(name1.rsplit("/", 1)[0])[1]), 1)
+
+    def test_different_content_is_stored_separately(self):
+        """Test different content gets different names"""
+        name1 = self.storage.save("uploads/recipe/a.jpg", ContentFile(b"photo"))
+        name2 = self.storage.save("uploads/recipe/a.jpg", ContentFile(b"other photo"))
+
+        self.assertNotEqual(name1, name2)
+
+    def test_saving_stored_content_refreshes_modification_time(self):
+        """Test saving content that is already stored marks the file as recently used"""
+        name = self.storage.save("uploads/recipe/a.jpg", ContentFile(b"photo"))
+        os.utime(self.storage.path(name), (0, 0))
+
+        self.storage.save("uploads/recipe/b.jpg", ContentFile(b"photo"))
+
+        self.assertGreater(os.path.getmtime(self.storage.path(name)), 0)
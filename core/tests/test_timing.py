@@ -0,0 +1,172 @@
+import asyncio
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from core.factories import RecipeFactory
+from core.timing import METRICS, RequestTiming, ServerTimingMiddleware, TimedSerializerMixin, _current, timed
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TOKEN_URL = reverse("user:token")
+
+
+def server_timing(response):
+    """Return the metrics of a Server-Timing header as {name: (milliseconds, description)}"""
+    metrics = {}
+    for metric in response["Server-Timing"].split(", "):
+        name, *params = metric.split(";")
+        params = dict(param.split("=", 1) for param in params)
+        metrics[name] = (float(params["dur"]), params.get("desc", "").strip('"'))
+    return metrics
+
+
+class TimedTests(TestCase):
+    def test_outside_measured_request(self):
+        """Test blocks are not measured outside a sampled request"""
+        with timed("serialize"):
+            pass
+
+        self.assertIsNone(_current.get())
+
+    def test_nested_blocks_count_once(self):
+        """Test a block nested in one of the same name is not counted again"""
+        timing = RequestTiming()
+        token = _current.set(timing)
+        try:
+            with patch("time.perf_counter", side_effect=[1.0, 2.0, 3.0, 5.0]):
+                with timed("serialize"):
+                    with timed("serialize"):
+                        pass
+                    with timed("render"):
+                        pass
+        finally:
+            _current.reset(token)
+
+        self.assertEqual(timing.durations, {"serialize": 4.0, "render": 1.0})
+
+    def test_header(self):
+        """Test the header lists metrics in order with durations in milliseconds"""
+        timing = RequestTiming()
+        timing.add("total", 0.012)
+        timing.add("auth", 0.0005)
+        timing.queries = 2
+
+        self.assertEqual(timing.header(), 'auth;dur=0.50, db;dur=0.00;desc="2 queries", total;dur=12.00')
+
+    def test_serializers_are_timed(self):
+        """Test every serializer of the API records its time"""
+        from recipe import serializers as recipe_serializers
+        from user import serializers as user_serializers
+
+        for module in (recipe_serializers, user_serializers):
+            for name in dir(module):
+                if name.endswith("Serializer") and getattr(module, name).__module__ == module.__name__:
+                    self.assertTrue(issubclass(getattr(module, name), TimedSerializerMixin), name)
+
+
+class ServerTimingMiddlewareTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user@test.com", "testpass123")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {Token.objects.create(user=self.user).key}")
+        RecipeFactory.create_batch(3, user=self.user, image=None)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=0)
+    def test_unsampled_request(self):
+        """Test requests outside the sample get no header and no log line"""
+        with self.assertNoLogs("core.timing"):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("Server-Timing", res)
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_sampled_request(self):
+        """Test a sampled request reports every metric and the queries it ran"""
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(RECIPES_URL)
+
+        metrics = server_timing(res)
+        self.assertEqual(list(metrics), list(METRICS))
+        self.assertEqual(metrics["db"][1], f"{len(queries)} queries")
+        for name in METRICS:
+            self.assertLessEqual(metrics[name][0], metrics["total"][0])
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_structured_log(self):
+        """Test a sampled request logs its timings as one JSON object"""
+        with self.assertLogs("core.timing", "INFO") as logs:
+            res = self.client.get(RECIPES_URL)
+
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record["method"], "GET")
+        self.assertEqual(record["path"], RECIPES_URL)
+        self.assertEqual(record["view"], "recipe:recipe-list")
+        self.assertEqual(record["status"], 200)
+        self.assertEqual(f'{record["queries"]} queries', server_timing(res)["db"][1])
+        self.assertEqual(set(record) - {"method", "path", "view", "status", "queries"}, {f"{m}_ms" for m in METRICS})
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1, FAST_READS=True)
+    def test_fast_reads_are_timed(self):
+        """Test the values() read path records its time as serializing"""
+        res = self.client.get(RECIPES_URL)
+
+        self.assertIn("serialize", server_timing(res))
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    def test_login_times_password_check(self):
+        """Test checking credentials on login is recorded as authentication"""
+        client = APIClient()
+        res = client.post(TOKEN_URL, {"email": "user@test.com", "password": "testpass123"})
+
+        metrics = server_timing(res)
+        self.assertIn("auth", metrics)
+        self.assertGreaterEqual(metrics["serialize"][0], metrics["auth"][0])
+
+
+class AsyncServerTimingMiddlewareTests(SimpleTestCase):
+    """Test the middleware in an async middleware chain, as under ASGI"""
+
+    @override_settings(SERVER_TIMING_SAMPLE_RATE=1)
+    async def test_requests_run_concurrently(self):
+        """Test sampled requests overlap on the event loop and each reports its own timings"""
+        waiting = []
+        both_started = asyncio.Event()
+
+        async def get_response(request):
+            waiting.append(request)
+            if len(waiting) == 2:
+                both_started.set()
+            await asyncio.wait_for(both_started.wait(), timeout=5)
+            with timed(request.GET["metric"]):
+                pass
+            return HttpResponse()
+
+        middleware = ServerTimingMiddleware(get_response)
+        factory = RequestFactory()
+
+        responses = await asyncio.gather(
+            middleware(factory.get("/", {"metric": "auth"})), middleware(factory.get("/", {"metric": "render"}))
+        )
+
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual(
+            [set(server_timing(response)) for response in responses],
+            [{"auth", "db", "total"}, {"db", "render", "total"}],
+        )
+        self.assertIsNone(_current.get())
+
+    def test_sync_chain(self):
+        """Test the middleware stays synchronous in front of a synchronous chain"""
+        middleware = ServerTimingMiddleware(lambda request: HttpResponse())
+
+        self.assertFalse(asyncio.iscoroutinefunction(middleware))
+        self.assertEqual(middleware(RequestFactory().get("/")).status_code, 200)
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from core.models import UserDataVersion
+from core.versioning import batched_data_version_bumps, bump_data_version, get_data_version
+
+
+class DataVersionTests(TestCase):
+    """Test the per-user data version counter"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+
+    def test_new_user_has_version(self):
+        """Test users get their version row when they are created"""
+        self.assertTrue(UserDataVersion.objects.filter(user=self.user).exists())
+
+    def test_batched_bumps_are_coalesced(self):
+        """Test a batch bumps each user once"""
+        version = get_data_version(self.user.pk)
+
+        with self.assertNumQueries(1), batched_data_version_bumps():
+            for _ in range(10):
+                bump_data_version(self.user.pk)
+
+        self.assertEqual(get_data_version(self.user.pk), version + 1)
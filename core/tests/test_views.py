@@ -0,0 +1,230 @@
+import hashlib
+import os
+import shutil
+from unittest.mock import patch
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.factories import UserFactory
+from core.health import reset_readiness
+
+
+CONTENT = bytes(range(256)) * 4
+DIGEST = hashlib.sha256(CONTENT).hexdigest()
+HASHED_NAME = f"uploads/recipe/{DIGEST[:2]}/{DIGEST}.jpg"
+PLAIN_NAME = "uploads/recipe/photo.jpg"
+
+
+def media_url(name):
+    return reverse("media", args=[name])
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT, MEDIA_X_SENDFILE=None)
+class ServeMediaTests(TestCase):
+    def setUp(self):
+        for name in (HASHED_NAME, PLAIN_NAME):
+            path = os.path.join(settings.TEST_MEDIA_ROOT, name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "wb") as file:
+                file.write(CONTENT)
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def test_serve_whole_file(self):
+        """Test a file is served with its type, validators and range support"""
+        res = self.client.get(media_url(PLAIN_NAME))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+        self.assertEqual(res["Content-Type"], "image/jpeg")
+        self.assertEqual(res["Accept-Ranges"], "bytes")
+        self.assertIn("ETag", res)
+        self.assertIn("Last-Modified", res)
+
+    def test_content_addressed_file_is_immutable(self):
+        """Test content addressed files are cached forever under their digest"""
+        res = self.client.get(media_url(HASHED_NAME))
+
+        self.assertEqual(res["ETag"], f'"{DIGEST}"')
+        self.assertIn("immutable", res["Cache-Control"])
+        self.assertIn(f"max-age={settings.MEDIA_IMMUTABLE_MAX_AGE}", res["Cache-Control"])
+
+    def test_other_files_are_revalidated(self):
+        """Test files whose name is not their digest get a short max-age"""
+        res = self.client.get(media_url(PLAIN_NAME))
+
+        self.assertNotIn("immutable", res["Cache-Control"])
+        self.assertIn(f"max-age={settings.MEDIA_MAX_AGE}", res["Cache-Control"])
+
+    def test_if_none_match_not_modified(self):
+        """Test a matching ETag is answered with 304 and no body"""
+        etag = self.client.get(media_url(HASHED_NAME))["ETag"]
+
+        res = self.client.get(media_url(HASHED_NAME), HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.content, b"")
+
+    def test_if_modified_since_not_modified(self):
+        """Test an unchanged file is answered with 304 for If-Modified-Since"""
+        last_modified = self.client.get(media_url(PLAIN_NAME))["Last-Modified"]
+
+        res = self.client.get(media_url(PLAIN_NAME), HTTP_IF_MODIFIED_SINCE=last_modified)
+
+        self.assertEqual(res.status_code, 304)
+
+    def test_range_request(self):
+        """Test a byte range is answered with 206 and only those bytes"""
+        res = self.client.get(media_url(PLAIN_NAME), HTTP_RANGE="bytes=10-19")
+
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT[10:20])
+        self.assertEqual(res["Content-Range"], f"bytes 10-19/{len(CONTENT)}")
+        self.assertEqual(res["Content-Length"], "10")
+
+    def test_open_and_suffix_ranges(self):
+        """Test ranges without an end or without a start"""
+        res = self.client.get(media_url(PLAIN_NAME), HTTP_RANGE="bytes=1000-")
+        self.assertEqual(b"".join(res.streaming_content), CONTENT[1000:])
+
+        res = self.client.get(media_url(PLAIN_NAME), HTTP_RANGE="bytes=-24")
+        self.assertEqual(b"".join(res.streaming_content), CONTENT[-24:])
+
+    def test_unsatisfiable_range(self):
+        """Test a range starting past the end of the file is answered with 416"""
+        res = self.client.get(media_url(PLAIN_NAME), HTTP_RANGE=f"bytes={len(CONTENT)}-")
+
+        self.assertEqual(res.status_code, 416)
+        self.assertEqual(res["Content-Range"], f"bytes */{len(CONTENT)}")
+
+    def test_stale_if_range_sends_whole_file(self):
+        """Test a range is ignored when If-Range names another version of the file"""
+        res = self.client.get(media_url(PLAIN_NAME), HTTP_RANGE="bytes=0-9", HTTP_IF_RANGE='"stale"')
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(b"".join(res.streaming_content), CONTENT)
+
+    @override_settings(MEDIA_X_SENDFILE="X-Accel-Redirect")
+    def test_x_accel_redirect(self):
+        """Test sending the file can be left to nginx"""
+        res = self.client.get(media_url(HASHED_NAME))
+
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res["X-Accel-Redirect"], f"{settings.MEDIA_X_ACCEL_REDIRECT_PREFIX}{HASHED_NAME}")
+        self.assertEqual(res.content, b"")
+
+    @override_settings(MEDIA_X_SENDFILE="X-Sendfile")
+    def test_x_sendfile(self):
+        """Test sending the file can be left to a proxy understanding X-Sendfile"""
+        res = self.client.get(media_url(PLAIN_NAME))
+
+        self.assertEqual(res["X-Sendfile"], os.path.join(settings.TEST_MEDIA_ROOT, PLAIN_NAME))
+
+    def test_missing_file_or_directory(self):
+        """Test missing files and directories are not found"""
+        for name in ("uploads/recipe/missing.jpg", "uploads/recipe"):
+            res = self.client.get(media_url(name))
+            self.assertEqual(res.status_code, 404, msg=name)
+
+    def test_path_outside_media_root(self):
+        """Test paths escaping MEDIA_ROOT are refused"""
+        res = self.client.get(f"{settings.MEDIA_URL}../settings.py")
+
+        self.assertEqual(res.status_code, 400)
+
+    def test_only_safe_methods(self):
+        """Test files cannot be posted to"""
+        res = self.client.post(media_url(PLAIN_NAME))
+
+        self.assertEqual(res.status_code, 405)
+
+
+class DatabaseStatsApiTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_requires_staff(self):
+        """Test regular users cannot read database statistics"""
+        self.client.force_authenticate(UserFactory.create())
+
+        res = self.client.get(reverse("database-stats"))
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_reads_stats(self):
+        """Test staff users see the connection settings of every database"""
+        self.client.force_authenticate(get_user_model().objects.create_superuser("admin@test.com", "testpass123"))
+
+        res = self.client.get(reverse("database-stats"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        default = res.data["connections"]["default"]
+        self.assertEqual(default["conn_max_age"], settings.DATABASES["default"]["CONN_MAX_AGE"])
+
+
+class HealthProbeTests(TestCase):
+    def setUp(self):
+        reset_readiness()
+        self.addCleanup(reset_readiness)
+
+    def test_liveness_skips_database(self):
+        """Test the liveness probe answers without querying the database"""
+        with self.assertNumQueries(0):
+            res = self.client.get(reverse("healthz"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.json(), {"status": "ok"})
+        self.assertIn("no-cache", res["Cache-Control"])
+
+    def test_readiness_reports_database(self):
+        """Test the readiness probe reports latency and pending migrations"""
+        res = self.client.get(reverse("readyz"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        body = res.json()
+        self.assertEqual(body["status"], "ok")
+        self.assertTrue(body["database"]["available"])
+        self.assertGreaterEqual(body["database"]["latency_ms"], 0)
+        self.assertEqual(body["migrations"], {"pending": 0})
+
+    def test_readiness_pending_migrations(self):
+        """Test the readiness probe fails while migrations are pending"""
+        with patch("core.health.pending_migrations", return_value=2):
+            res = self.client.get(reverse("readyz"))
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.json()["migrations"], {"pending": 2})
+
+    def test_readiness_database_unavailable(self):
+        """Test the readiness probe fails when the database does not answer, logging the error without exposing it"""
+        with patch("core.health.ping", side_effect=OperationalError("refused by db.internal")), self.assertLogs(
+            "core.health", "WARNING"
+        ) as logs:
+            res = self.client.get(reverse("readyz"))
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res.json()["database"], {"available": False})
+        self.assertNotIn(b"db.internal", res.content)
+        self.assertIn("refused by db.internal", logs.output[0])
+
+    @override_settings(HEALTH_CHECK_CACHE_SECONDS=60)
+    def test_readiness_is_cached(self):
+        """Test the readiness check runs once per cache interval"""
+        with patch("core.health.ping") as ping:
+            self.client.get(reverse("readyz"))
+            self.client.get(reverse("readyz"))
+
+        self.assertEqual(ping.call_count, 1)
+
+    def test_readiness_only_safe_methods(self):
+        """Test the probes reject unsafe methods"""
+        res = self.client.post(reverse("readyz"))
+
+        self.assertEqual(res.status_code, status.HTTP_405_METHOD_NOT_ALLOWED)
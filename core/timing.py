@@ -0,0 +1,174 @@
+import asyncio
+import contextvars
+import json
+import logging
+import random
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+
+
+logger = logging.getLogger(__name__)
+
+# Order of the metrics in the Server-Timing header
+METRICS = ("auth", "db", "serialize", "render", "total")
+
+_current = contextvars.ContextVar("request_timing", default=None)
+
+
+class RequestTiming:
+    """Seconds spent per metric and number of database queries while serving one request"""
+
+    def __init__(self):
+        self.durations = {}
+        self.queries = 0
+        self.active = set()
+
+    def add(self, name, seconds):
+        self.durations[name] = self.durations.get(name, 0.0) + seconds
+
+    def header(self):
+        """Return the value of the Server-Timing header, with durations in milliseconds"""
+        metrics = []
+        for name in METRICS:
+            if name == "db":
+                metrics.append(f'db;dur={self.durations.get("db", 0.0) * 1000:.2f};desc="{self.queries} queries"')
+            elif name in self.durations:
+                metrics.append(f"{name};dur={self.durations[name] * 1000:.2f}")
+        return ", ".join(metrics)
+
+
+def current_timing():
+    """Return the `RequestTiming` of the request being measured, or None when it is not sampled"""
+    return _current.get()
+
+
+@contextmanager
+def timed(name):
+    """Add the time spent in the block to metric name of the request being measured
+
+    A block nested in one of the same name is not counted again.
+    """
+    timing = _current.get()
+    if timing is None or name in timing.active:
+        yield
+        return
+    timing.active.add(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timing.add(name, time.perf_counter() - start)
+        timing.active.discard(name)
+
+
+def _record_query(execute, sql, params, many, context):
+    timing = _current.get()
+    if timing is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timing.add("db", time.perf_counter() - start)
+        timing.queries += 1
+
+
+def record_queries(sender, connection, **kwargs):
+    """Count the queries of a new connection towards the request being measured, whichever thread runs them
+
+    Connected to `connection_created`. The wrapper goes first, since `execute_wrapper` blocks pop the last one.
+    """
+    if _record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, _record_query)
+
+
+class TimedSerializerMixin:
+    """Serializer mixin recording validation and representation under the "serialize" metric"""
+
+    def is_valid(self, *args, **kwargs):
+        with timed("serialize"):
+            return super().is_valid(*args, **kwargs)
+
+    def to_representation(self, instance):
+        if _current.get() is None:
+            return super().to_representation(instance)
+        with timed("serialize"):
+            return super().to_representation(instance)
+
+
+class ServerTimingMiddleware:
+    """Measure a sample of requests and report where their time went
+
+    A share of SERVER_TIMING_SAMPLE_RATE requests gets a Server-Timing header with the time spent
+    authenticating, querying the database, serializing and rendering, besides the total, and the same
+    figures are logged as one JSON object per request to the "core.timing" logger. Requests left out of
+    the sample only pay for drawing a random number, and a context variable lookup per query. Put it first
+    in MIDDLEWARE so the total covers the other middleware and rendering is timed last.
+
+    It is async capable, so an ASGI server does not run every request through one thread for it.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Mark the instance as a coroutine function, as Django's MiddlewareMixin does
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self):
+            return self.__acall__(request)
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return self.get_response(request)
+
+        timing = RequestTiming()
+        token = _current.set(timing)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, timing, start)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.SERVER_TIMING_SAMPLE_RATE:
+            return await self.get_response(request)
+
+        timing = RequestTiming()
+        # Set in this task's context, which sync_to_async copies to the threads running the view
+        token = _current.set(timing)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _current.reset(token)
+        return self.report(request, response, timing, start)
+
+    def report(self, request, response, timing, start):
+        timing.add("total", time.perf_counter() - start)
+        response["Server-Timing"] = timing.header()
+        logger.info(json.dumps(self.log_record(request, response, timing)))
+        return response
+
+    def process_template_response(self, request, response):
+        timing = _current.get()
+        # Responses of async views are rendered by the view, see core.async_views
+        if timing is not None and not response.is_rendered:
+            start = time.perf_counter()
+            response.add_post_render_callback(lambda response: timing.add("render", time.perf_counter() - start))
+        return response
+
+    def log_record(self, request, response, timing):
+        match = request.resolver_match
+        return {
+            "method": request.method,
+            "path": request.path,
+            "view": match.view_name if match else None,
+            "status": response.status_code,
+            "queries": timing.queries,
+            **{f"{name}_ms": round(timing.durations.get(name, 0.0) * 1000, 2) for name in METRICS},
+        }
@@ -0,0 +1,58 @@
+import threading
+from contextlib import contextmanager
+
+from django.db.models import F, QuerySet
+
+from core.asynchronous import database_sync_to_async
+from core.models import UserDataVersion
+
+
+_batch = threading.local()
+
+
+def get_data_version(user_id):
+    """Return the current version of a user's recipes, tags and ingredients"""
+    version = UserDataVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first()
+    if version is None:
+        version = UserDataVersion.objects.get_or_create(user_id=user_id)[0].version
+    return version
+
+
+async def aget_data_version(user_id):
+    """Async `get_data_version`, reading the version through the async ORM where Django has one"""
+    if hasattr(QuerySet, "afirst"):
+        queryset = UserDataVersion.objects.filter(user_id=user_id).values_list("version", flat=True)
+        version = await queryset.afirst()
+        if version is not None:
+            return version
+    return await database_sync_to_async(get_data_version)(user_id)
+
+
+def bump_data_version(user_id):
+    """Mark a user's data as changed, within the transaction changing it
+
+    Rows are created with their user, so this is a single UPDATE that never inserts; a user deleted in
+    the same transaction is simply not updated. Inside `batched_data_version_bumps` each user is bumped
+    once when the block exits.
+    """
+    pending = getattr(_batch, "user_ids", None)
+    if pending is not None:
+        pending.add(user_id)
+        return
+    UserDataVersion.objects.filter(user_id=user_id).update(version=F("version") + 1)
+
+
+@contextmanager
+def batched_data_version_bumps():
+    """Coalesce the version bumps of a bulk write into one UPDATE per user"""
+    if getattr(_batch, "user_ids", None) is not None:
+        yield
+        return
+    _batch.user_ids = set()
+    try:
+        yield
+        user_ids = _batch.user_ids
+    finally:
+        _batch.user_ids = None
+    if user_ids:
+        UserDataVersion.objects.filter(user_id__in=user_ids).update(version=F("version") + 1)
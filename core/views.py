@@ -1,3 +1,178 @@
-# from django.shortcuts import render
+import mimetypes
+import os
+import posixpath
+import re
 
-# Create your views here.
+from django.conf import settings
+from django.db import connections
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_safe
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+
+from core.authentication import CachedTokenAuthentication, token_cache
+from core.health import readiness
+from core.response_cache import response_cache_stats
+from core.storage import content_digest
+
+
+RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+COPY_BUFFER_SIZE = 64 * 1024
+
+
+def parse_range(header, size):
+    """Return the (start, end) byte positions of a single range Range header, or None to send everything
+
+    Raises ValueError when the range cannot be satisfied.
+    """
+    match = RANGE.match(header or "")
+    if not match or match.groups() == ("", ""):
+        # Multiple ranges and malformed headers are answered with the whole file
+        return None
+    first, last = match.groups()
+    if not first:
+        start, end = max(size - int(last), 0), size - 1
+    else:
+        start, end = int(first), min(int(last), size - 1) if last else size - 1
+    if start > end or start >= size:
+        raise ValueError(header)
+    return start, end
+
+
+def _if_range_matches(request, etag, last_modified):
+    if_range = request.META.get("HTTP_IF_RANGE")
+    if not if_range:
+        return True
+    if if_range.startswith(('"', "W/")):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == int(last_modified)
+
+
+def _read_range(file, start, length):
+    with file:
+        file.seek(start)
+        while length > 0:
+            data = file.read(min(COPY_BUFFER_SIZE, length))
+            if not data:
+                return
+            length -= len(data)
+            yield data
+
+
+@require_safe
+def serve_media(request, path):
+    """Serve a file below MEDIA_ROOT with validators, byte ranges and caching headers
+
+    Content addressed files never change, so they are cacheable forever. With MEDIA_X_SENDFILE set the
+    body is left to the front proxy, which then also answers range requests.
+    """
+    path = posixpath.normpath(path).lstrip("/")
+    try:
+        fullpath = safe_join(settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (OSError, ValueError):
+        raise Http404("File not found.")
+    if not os.path.isfile(fullpath):
+        raise Http404("File not found.")
+
+    digest = content_digest(path)
+    etag = f'"{digest}"' if digest else f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        response = _file_response(request, path, fullpath, stat.st_size, etag, stat.st_mtime)
+
+    response["ETag"] = etag
+    response["Last-Modified"] = http_date(stat.st_mtime)
+    if digest:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_IMMUTABLE_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, public=True, max_age=settings.MEDIA_MAX_AGE)
+    return response
+
+
+def _file_response(request, path, fullpath, size, etag, last_modified):
+    content_type = mimetypes.guess_type(fullpath)[0] or "application/octet-stream"
+
+    if settings.MEDIA_X_SENDFILE == "X-Accel-Redirect":
+        response = HttpResponse(content_type=content_type)
+        response["X-Accel-Redirect"] = posixpath.join(settings.MEDIA_X_ACCEL_REDIRECT_PREFIX, path)
+        return response
+    if settings.MEDIA_X_SENDFILE == "X-Sendfile":
+        response = HttpResponse(content_type=content_type)
+        response["X-Sendfile"] = fullpath
+        return response
+
+    byte_range = None
+    if _if_range_matches(request, etag, last_modified):
+        try:
+            byte_range = parse_range(request.META.get("HTTP_RANGE"), size)
+        except ValueError:
+            response = HttpResponse(status=416)
+            response["Content-Range"] = f"bytes */{size}"
+            return response
+
+    if byte_range is None:
+        response = FileResponse(open(fullpath, "rb"), content_type=content_type)
+    else:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            _read_range(open(fullpath, "rb"), start, end - start + 1), status=206, content_type=content_type
+        )
+        response["Content-Range"] = f"bytes {start}-{end}/{size}"
+        response["Content-Length"] = end - start + 1
+    response["Accept-Ranges"] = "bytes"
+    return response
+
+
+@api_view(["GET"])
+@authentication_classes((CachedTokenAuthentication,))
+@permission_classes((IsAdminUser,))
+def cache_stats(request):
+    """Report this process's response and token cache statistics to staff users"""
+    return Response(
+        {
+            "responses": response_cache_stats(),
+            "tokens": {"hits": token_cache.hits, "misses": token_cache.misses, "size": len(token_cache)},
+        }
+    )
+
+
+@api_view(["GET"])
+@authentication_classes((CachedTokenAuthentication,))
+@permission_classes((IsAdminUser,))
+def database_stats(request):
+    """Report this process's connection settings to staff users"""
+    return Response(
+        {
+            "connections": {
+                connection.alias: {
+                    "vendor": connection.vendor,
+                    "conn_max_age": connection.settings_dict["CONN_MAX_AGE"],
+                }
+                for connection in connections.all()
+            },
+        }
+    )
+
+
+@never_cache
+@require_safe
+def liveness(request):
+    """Answer as long as the process serves requests, without touching the database"""
+    return JsonResponse({"status": "ok"})
+
+
+@never_cache
+@require_safe
+def readiness_probe(request):
+    """Answer 200 once the database answers and has no pending migrations, and 503 until then"""
+    result = readiness()
+    details = {key: value for key, value in result.items() if key != "ready"}
+    if result["ready"]:
+        return JsonResponse({"status": "ok", **details})
+    return JsonResponse({"status": "unavailable", **details}, status=503)
@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/3.2/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +48,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -80,6 +82,8 @@ WSGI_APPLICATION = "main.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/3.2/ref/settings/#databases
 
+# Django 3.2 does not check a kept connection before reusing it, so connections are only kept when
+# DB_CONN_MAX_AGE is set; a connection the server dropped would otherwise fail the next request.
 DATABASES = {
     "default": {
         "ENGINE": os.environ.get("DB_ENGINE"),
@@ -88,6 +92,7 @@ DATABASES = {
         "PASSWORD": os.environ.get("DB_PASSWORD"),
         "HOST": os.environ.get("DB_HOST"),
         "PORT": os.environ.get("DB_PORT"),
+        "CONN_MAX_AGE": int(os.environ.get("DB_CONN_MAX_AGE", 0)),
     }
 }
 
@@ -135,8 +140,87 @@ MEDIA_ROOT = str(BASE_DIR / "media")
 STATIC_ROOT = str(BASE_DIR / "static")
 TEST_MEDIA_ROOT = f"{MEDIA_ROOT}/tests"
 
+# Media files are served by core.views.serve_media. Content addressed files are cached for
+# MEDIA_IMMUTABLE_MAX_AGE seconds, any other file for MEDIA_MAX_AGE.
+MEDIA_MAX_AGE = 3600
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# "X-Accel-Redirect" (nginx) or "X-Sendfile" (Apache, lighttpd) leaves sending the file to the front proxy.
+# With nginx, MEDIA_X_ACCEL_REDIRECT_PREFIX must be an internal location aliased to MEDIA_ROOT.
+MEDIA_X_SENDFILE = os.environ.get("MEDIA_X_SENDFILE")
+MEDIA_X_ACCEL_REDIRECT_PREFIX = "/protected-media/"
+
+# Sizes are bounding boxes, images are shrunk to fit them and never enlarged
+RECIPE_IMAGE_RENDITIONS = {
+    "thumbnail": {"size": (200, 200), "format": "JPEG", "quality": 80},
+    "thumbnail_webp": {"size": (200, 200), "format": "WEBP", "quality": 75},
+    "medium": {"size": (800, 800), "format": "JPEG", "quality": 85},
+    "medium_webp": {"size": (800, 800), "format": "WEBP", "quality": 80},
+}
+# Threads rendering them in the background; 0 renders them inline when the upload is committed
+RECIPE_IMAGE_WORKERS = int(os.environ.get("RECIPE_IMAGE_WORKERS", 2))
+# Chunked image uploads are assembled here until they are finalized; it must be shared by all app servers
+RECIPE_IMAGE_UPLOAD_DIR = os.environ.get(
+    "RECIPE_IMAGE_UPLOAD_DIR", os.path.join(tempfile.gettempdir(), "recipe-image-uploads")
+)
+RECIPE_IMAGE_UPLOAD_MAX_SIZE = 25 * 1024 * 1024
+# Seconds after its last chunk that an upload is abandoned and left to `gc_images`
+RECIPE_IMAGE_UPLOAD_EXPIRY = int(os.environ.get("RECIPE_IMAGE_UPLOAD_EXPIRY", 24 * 3600))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 AUTH_USER_MODEL = "core.User"
+
+# Django REST framework
+# https://www.django-rest-framework.org/api-guide/settings/
+
+REST_FRAMEWORK = {
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.KeysetPagination",
+    "PAGE_SIZE": 100,
+}
+
+# Share of requests core.timing.ServerTimingMiddleware measures, adding a Server-Timing header and logging
+# their timings to the "core.timing" logger
+SERVER_TIMING_SAMPLE_RATE = float(os.environ.get("SERVER_TIMING_SAMPLE_RATE", "0.01"))
+
+# Passwords are hashed by core.passwords on WORKERS threads, leaving the other cores to other requests.
+# Logins and signups beyond MAX_PENDING running or queued hashes get a 503 with Retry-After: RETRY_AFTER;
+# other callers, such as the admin and management commands, wait for a free slot.
+PASSWORD_HASHING = {
+    "WORKERS": int(os.environ.get("PASSWORD_HASHING_WORKERS", max(1, (os.cpu_count() or 2) // 2))),
+    "MAX_PENDING": int(os.environ.get("PASSWORD_HASHING_MAX_PENDING", 64)),
+    "RETRY_AFTER": 1,
+}
+
+# Tokens resolved by core.authentication.CachedTokenAuthentication are kept in a per-process LRU for
+# TIMEOUT seconds. Set CACHE_ALIAS to one of CACHES to also share them between processes.
+TOKEN_AUTH_CACHE = {
+    "MAX_SIZE": 10000,
+    "TIMEOUT": 60,
+    "CACHE_ALIAS": None,
+}
+
+# Readiness probes (/readyz/) reuse the result of the last database and migration check for this long
+HEALTH_CHECK_CACHE_SECONDS = 5
+
+# Serve the recipe and user API through async views (core.async_views); main/asgi.py turns this on. The
+# synchronous DRF code then runs on a pool of ASYNC_VIEWS_THREADS threads, each with its own connection.
+ASYNC_VIEWS = os.environ.get("ASYNC_VIEWS", "0") == "1"
+ASYNC_VIEWS_THREADS = int(os.environ.get("ASYNC_VIEWS_THREADS", 16))
+
+# Build list and detail responses of the recipe API from values() rows instead of model instances and
+# serializers. The JSON is identical; run the benchmark command with and without it to compare their speed.
+FAST_READS = os.environ.get("FAST_READS", "0") == "1"
+
+# List responses of the recipe API are cached per user and invalidated by the user's data version. The
+# per-process LRU holds up to MAX_SIZE entries and MAX_BYTES of JSON; set CACHE_ALIAS to one of CACHES to
+# share entries instead. Responses over MAX_ENTRY_BYTES of JSON are never cached.
+RESPONSE_CACHE = {
+    "ENABLED": True,
+    "MAX_SIZE": 5000,
+    "MAX_BYTES": 64 * 1024 * 1024,
+    "MAX_ENTRY_BYTES": 1024 * 1024,
+    "TIMEOUT": 300,
+    "CACHE_ALIAS": None,
+}
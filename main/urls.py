@@ -14,13 +14,14 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
-from django.urls import path, include
-from django.conf.urls.static import static
+from django.urls import path, include, re_path
 from django.conf import settings
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg.views import get_schema_view
 from drf_yasg import openapi
 
+from core.views import cache_stats, database_stats, liveness, readiness_probe, serve_media
+
 
 schema_view = get_schema_view(
     openapi.Info(
@@ -39,5 +40,10 @@ urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/user/", include("user.urls")),
     path("api/recipe/", include("recipe.urls")),
+    path("healthz/", liveness, name="healthz"),
+    path("readyz/", readiness_probe, name="readyz"),
+    path("api/stats/cache/", cache_stats, name="cache-stats"),
+    path("api/stats/db/", database_stats, name="database-stats"),
     path("api/swagger/", schema_view.with_ui("swagger", cache_timeout=0), name="schema-swagger-ui"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    re_path(rf"^{settings.MEDIA_URL.lstrip('/')}(?P<path>.*)$", serve_media, name="media"),
+]
@@ -0,0 +1,131 @@
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from core.models import MAX_ID, Ingredient, Recipe, Tag
+from core.versioning import batched_data_version_bumps, bump_data_version
+
+
+BULK_MAX_ITEMS = 5000
+REQUIRED_ON_CREATE = ("title", "time_minutes", "price")
+
+
+class RecipeBulkItemSerializer(serializers.ModelSerializer):
+    """Validate one item of a bulk recipe payload without touching the database"""
+
+    id = serializers.IntegerField(min_value=1, max_value=MAX_ID, required=False)
+    ingredients = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=MAX_ID), required=False)
+    tags = serializers.ListField(child=serializers.IntegerField(min_value=1, max_value=MAX_ID), required=False)
+
+    class Meta:
+        model = Recipe
+        fields = ("id", "title", "ingredients", "tags", "time_minutes", "price", "link")
+
+
+def _validate_items(items):
+    """Run field validation for every item, returning validated data and per-item errors"""
+    creating = RecipeBulkItemSerializer()
+    updating = RecipeBulkItemSerializer(partial=True)
+    validated, errors, seen_ids = [], [], set()
+    for item in items:
+        is_update = isinstance(item, dict) and "id" in item
+        try:
+            data = (updating if is_update else creating).run_validation(item)
+        except serializers.ValidationError as exc:
+            validated.append(None)
+            errors.append(exc.detail)
+            continue
+        validated.append(data)
+        if "id" in data and data["id"] in seen_ids:
+            # A second update of the same recipe in one batch would silently overwrite the first
+            errors.append({"id": [f'Recipe "{data["id"]}" appears more than once.']})
+            continue
+        if "id" in data:
+            seen_ids.add(data["id"])
+        errors.append({})
+    return validated, errors
+
+
+def _check_references(user, validated, errors):
+    """Check every referenced recipe, tag and ingredient belongs to user with one query per model"""
+    recipe_ids, tag_ids, ingredient_ids = set(), set(), set()
+    for data in filter(None, validated):
+        if "id" in data:
+            recipe_ids.add(data["id"])
+        tag_ids.update(data.get("tags", ()))
+        ingredient_ids.update(data.get("ingredients", ()))
+
+    recipes = Recipe.objects.filter(user=user).in_bulk(recipe_ids) if recipe_ids else {}
+    owned_tags = set(Tag.objects.filter(user=user, id__in=tag_ids).values_list("id", flat=True))
+    owned_ingredients = set(Ingredient.objects.filter(user=user, id__in=ingredient_ids).values_list("id", flat=True))
+
+    for data, error in zip(validated, errors):
+        if data is None:
+            continue
+        if "id" in data and data["id"] not in recipes:
+            error["id"] = [f'Invalid pk "{data["id"]}" - object does not exist.']
+        for field, owned in (("tags", owned_tags), ("ingredients", owned_ingredients)):
+            missing = [pk for pk in data.get(field, ()) if pk not in owned]
+            if missing:
+                error[field] = [f'Invalid pk "{pk}" - object does not exist.' for pk in missing]
+    return recipes
+
+
+def _replace_links(through, column, links):
+    """Replace the through table rows of the recipes in links ({recipe id: related ids})"""
+    if not links:
+        return
+    through.objects.filter(recipe_id__in=links.keys()).delete()
+    through.objects.bulk_create(
+        [through(recipe_id=recipe_id, **{column: pk}) for recipe_id, pks in links.items() for pk in set(pks)]
+    )
+
+
+def bulk_save_recipes(user, items):
+    """Create or update user's recipes from a list of payload items in a single transaction
+
+    Items with an `id` update that recipe, all others create one. Returns `(recipes, errors)`, where
+    errors has one entry per item and nothing is saved unless every entry is empty.
+    """
+    validated, errors = _validate_items(items)
+    for data, error in zip(validated, errors):
+        if data is not None and "id" not in data:
+            for field in REQUIRED_ON_CREATE:
+                if field not in data:
+                    error[field] = ["This field is required."]
+    existing = _check_references(user, validated, errors)
+    if any(errors):
+        return [], errors
+
+    recipes, new, updated_fields = [], [], set()
+    for data in validated:
+        fields = {k: v for k, v in data.items() if k not in ("id", "tags", "ingredients")}
+        if "id" in data:
+            recipe = existing[data["id"]]
+            for name, value in fields.items():
+                setattr(recipe, name, value)
+            updated_fields.update(fields)
+        else:
+            recipe = Recipe(user=user, **fields)
+            new.append(recipe)
+        recipes.append(recipe)
+
+    with transaction.atomic(), batched_data_version_bumps():
+        # bulk_create, bulk_update and the link rewrites below send no signals
+        bump_data_version(user.id)
+        if connection.features.can_return_rows_from_bulk_insert:
+            Recipe.objects.bulk_create(new)
+        else:
+            # Without INSERT ... RETURNING the new primary keys are unknown, so insert row by row
+            for recipe in new:
+                recipe.save(force_insert=True)
+        if updated_fields:
+            Recipe.objects.bulk_update(existing.values(), updated_fields)
+
+        for field, through, column in (
+            ("tags", Recipe.tags.through, "tag_id"),
+            ("ingredients", Recipe.ingredients.through, "ingredient_id"),
+        ):
+            links = {recipe.pk: data[field] for recipe, data in zip(recipes, validated) if field in data}
+            _replace_links(through, column, links)
+
+    return recipes, errors
@@ -0,0 +1,92 @@
+import csv
+import json
+from itertools import islice
+
+from django.core.serializers.json import DjangoJSONEncoder
+from rest_framework.renderers import BaseRenderer
+
+from core.models import Recipe
+from recipe.readers import related_by_recipe
+
+
+EXPORT_CHUNK_SIZE = 2000
+CSV_COLUMNS = ("id", "title", "time_minutes", "price", "link", "image", "tags", "ingredients")
+
+
+class Echo:
+    """File-like object whose write returns the value, so csv.writer can feed a generator"""
+
+    def write(self, value):
+        return value
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Render data as newline delimited JSON; the export itself is streamed, this renders errors"""
+
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, cls=DjangoJSONEncoder).encode(self.charset) + b"\n"
+
+
+class CSVRenderer(BaseRenderer):
+    """Render a dict as a header row and a value row; the export itself is streamed, this renders errors"""
+
+    media_type = "text/csv"
+    format = "csv"
+    charset = "utf-8"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        data = data if isinstance(data, dict) else {"detail": data}
+        writer = csv.writer(Echo())
+        return (writer.writerow(data.keys()) + writer.writerow(data.values())).encode(self.charset)
+
+
+def iter_recipe_export(queryset, image_url, chunk_size=None):
+    """Yield recipe dicts with embedded tags, ingredients and image URL in id order
+
+    Recipes are read through a server-side cursor and their relations are fetched one chunk at a time,
+    so memory use depends on chunk_size and not on the size of the library.
+    """
+    chunk_size = chunk_size or EXPORT_CHUNK_SIZE
+    rows = (
+        queryset.order_by("id")
+        .values("id", "title", "time_minutes", "price", "link", "image")
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        ids = [row["id"] for row in chunk]
+        tags = related_by_recipe(Recipe.tags.through, "tag", ids)
+        ingredients = related_by_recipe(Recipe.ingredients.through, "ingredient", ids)
+        for row in chunk:
+            row["price"] = str(row["price"])
+            row["image"] = image_url(row["image"]) if row["image"] else None
+            row["tags"] = tags[row["id"]]
+            row["ingredients"] = ingredients[row["id"]]
+            yield row
+
+
+def stream_ndjson(recipes):
+    for recipe in recipes:
+        yield json.dumps(recipe, cls=DjangoJSONEncoder) + "\n"
+
+
+def stream_csv(recipes):
+    """Yield CSV lines, joining tag and ingredient names with semicolons"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(CSV_COLUMNS)
+    for recipe in recipes:
+        recipe["tags"] = ";".join(tag["name"] for tag in recipe["tags"])
+        recipe["ingredients"] = ";".join(ingredient["name"] for ingredient in recipe["ingredients"])
+        yield writer.writerow(recipe[column] for column in CSV_COLUMNS)
+
+
+STREAMERS = {
+    NDJSONRenderer.format: stream_ndjson,
+    CSVRenderer.format: stream_csv,
+}
@@ -0,0 +1,94 @@
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+from rest_framework.exceptions import ValidationError
+
+from core.versioning import bump_data_version
+
+
+IMPORT_BATCH_SIZE = 1000
+NAME_MAX_LENGTH = 255
+
+
+def _decoded(lines):
+    for number, line in enumerate(lines, start=1):
+        try:
+            yield number, line.decode("utf-8")
+        except UnicodeDecodeError:
+            raise ValidationError({"detail": f"Line {number}: not valid UTF-8."})
+
+
+def parse_ndjson(lines):
+    """Yield (line number, name) from lines holding a JSON object with a name, or a JSON string"""
+    for number, line in _decoded(lines):
+        if not line.strip():
+            continue
+        try:
+            item = json.loads(line)
+        except ValueError:
+            raise ValidationError({"detail": f"Line {number}: invalid JSON."})
+        yield number, item.get("name") if isinstance(item, dict) else item
+
+
+def parse_csv(lines):
+    """Yield (row number, name) from CSV lines with a `name` header column"""
+    numbered = _decoded(lines)
+    reader = csv.DictReader(line for _, line in numbered)
+    if not reader.fieldnames or "name" not in reader.fieldnames:
+        raise ValidationError({"detail": 'CSV input needs a "name" header column.'})
+    for row in reader:
+        yield reader.line_num, row["name"]
+
+
+PARSERS = {
+    "application/x-ndjson": parse_ndjson,
+    "application/jsonl": parse_ndjson,
+    "text/csv": parse_csv,
+}
+
+
+def _valid_names(rows):
+    for number, name in rows:
+        if not isinstance(name, str) or not name.strip() or len(name.strip()) > NAME_MAX_LENGTH:
+            raise ValidationError({"detail": f"Line {number}: expected a name of 1 to {NAME_MAX_LENGTH} characters."})
+        yield name.strip()
+
+
+def _import_batch(model, user, names, existing):
+    """Create the names whose case-folded form is not in existing, adding them to it, and return how many"""
+    new = []
+    for name in names:
+        key = name.casefold()
+        if key not in existing:
+            existing.add(key)
+            new.append(model(user=user, name=name))
+    model.objects.bulk_create(new, ignore_conflicts=True)
+    return len(new)
+
+
+def import_names(model, user, rows, batch_size=None):
+    """Upsert the names yielded by rows as user's objects of model, batch by batch, in one transaction
+
+    Names are compared case-insensitively with `str.casefold`, in Python because SQLite's LOWER() only
+    folds ASCII letters. Only one batch of the input is held in memory at a time, next to the folded names
+    of the user's objects. Returns a dict with the number of created objects and the number of rows
+    matching an object that already existed or appeared earlier in the input.
+    """
+    batch_size = batch_size or IMPORT_BATCH_SIZE
+    created = total = 0
+    names = _valid_names(rows)
+    with transaction.atomic():
+        existing = {name.casefold() for name in model.objects.filter(user=user).values_list("name", flat=True)}
+        while True:
+            batch = list(islice(names, batch_size))
+            if not batch:
+                break
+            total += len(batch)
+            created += _import_batch(model, user, batch, existing)
+        if created:
+            # bulk_create sends no post_save signals
+            bump_data_version(user.id)
+
+    return {"created": created, "existing": total - created}
@@ -0,0 +1,109 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connections
+from django.db.models import OuterRef, Subquery
+
+from core.models import Recipe
+from recipe.renditions import rendition_urls
+from recipe.serializers import RecipeSerializer
+
+
+RECIPE_OUTPUT_FIELDS = RecipeSerializer.Meta.fields
+# The output fields stored in recipe columns
+RECIPE_FIELDS = ("id", "title", "time_minutes", "price", "link", "image_renditions")
+PRICE_QUANTUM = Decimal(1).scaleb(-Recipe._meta.get_field("price").decimal_places)
+# The recipe's many-to-many fields and their related model names, in serializer field order
+RECIPE_RELATIONS = (("ingredients", "ingredient"), ("tags", "tag"))
+RELATION_FIELDS = tuple(relation for relation, _ in RECIPE_RELATIONS)
+
+
+def format_price(value):
+    """Format a price like DRF's DecimalField does, as a string with the field's decimal places"""
+    return "{:f}".format(value.quantize(PRICE_QUANTUM))
+
+
+def related_by_recipe(through, related, recipe_ids):
+    """Return {recipe id: [{id, name}, ...]} for one model related to the given recipes, in one query"""
+    by_recipe = defaultdict(list)
+    rows = (
+        through.objects.filter(recipe_id__in=recipe_ids)
+        .order_by(f"{related}_id")
+        .values_list("recipe_id", f"{related}_id", f"{related}__name")
+    )
+    for recipe_id, pk, name in rows:
+        by_recipe[recipe_id].append({"id": pk, "name": name})
+    return by_recipe
+
+
+def related_ids_by_recipe(through, related, recipe_ids):
+    """Return {recipe id: [related id, ...]} for one relation of the given recipes, in one query"""
+    by_recipe = defaultdict(list)
+    column = f"{related}_id"
+    rows = through.objects.filter(recipe_id__in=recipe_ids).order_by(column).values_list("recipe_id", column)
+    for recipe_id, pk in rows:
+        by_recipe[recipe_id].append(pk)
+    return by_recipe
+
+
+def _related_ids_array(through, related):
+    # Imported here, django.contrib.postgres needs psycopg2
+    from django.contrib.postgres.aggregates import ArrayAgg
+
+    column = f"{related}_id"
+    links = through.objects.filter(recipe_id=OuterRef("pk")).order_by().values("recipe_id")
+    return Subquery(links.annotate(ids=ArrayAgg(column, ordering=column)).values("ids"))
+
+
+def recipe_values(queryset, *extra_fields, fields=RECIPE_OUTPUT_FIELDS, related_ids=()):
+    """Return queryset as values() rows of the id, the columns among fields and extra_fields
+
+    On PostgreSQL the ids of the relations in related_ids are aggregated into arrays by the same query.
+    """
+    columns = [field for field in RECIPE_FIELDS if field == "id" or field in fields]
+    queryset = queryset.values(*columns, *extra_fields)
+    if related_ids and connections[queryset.db].vendor == "postgresql":
+        queryset = queryset.annotate(
+            **{
+                f"{relation}_ids": _related_ids_array(getattr(Recipe, relation).through, related)
+                for relation, related in RECIPE_RELATIONS
+                if relation in related_ids
+            }
+        )
+    return queryset
+
+
+def recipe_rows(rows, request=None, fields=RECIPE_OUTPUT_FIELDS, expand=()):
+    """Turn `recipe_values` rows into what RecipeSerializer renders with the same fields and expand
+
+    Related ids not aggregated by the database, and the objects of expanded relations, take one query per
+    relation.
+    """
+    ids = [row["id"] for row in rows]
+    related = {}
+    for relation, model_name in RECIPE_RELATIONS:
+        if relation not in fields:
+            continue
+        through = getattr(Recipe, relation).through
+        if relation in expand:
+            related[relation] = related_by_recipe(through, model_name, ids)
+        elif rows and f"{relation}_ids" not in rows[0]:
+            related[relation] = related_ids_by_recipe(through, model_name, ids)
+
+    recipes = []
+    for row in rows:
+        recipe = {}
+        for field in fields:
+            if field in related:
+                recipe[field] = related[field][row["id"]]
+            elif field in RELATION_FIELDS:
+                recipe[field] = row[f"{field}_ids"] or []
+            elif field == "price":
+                recipe[field] = format_price(row["price"])
+            elif field == "image_renditions":
+                renditions = row["image_renditions"]
+                recipe[field] = None if renditions is None else rendition_urls(renditions, request)
+            else:
+                recipe[field] = row[field]
+        recipes.append(recipe)
+    return recipes
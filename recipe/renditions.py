@@ -0,0 +1,107 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+from core.models import RECIPE_IMAGE_DIR, Recipe
+from core.versioning import bump_data_version
+
+
+logger = logging.getLogger(__name__)
+
+EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "WEBP": "webp"}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    """Return the process wide rendition worker pool, or None when renditions are rendered inline"""
+    global _executor
+    if not settings.RECIPE_IMAGE_WORKERS:
+        return None
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.RECIPE_IMAGE_WORKERS, thread_name_prefix="recipe-renditions"
+            )
+    return _executor
+
+
+def rendition_path(name, spec):
+    """Return the name to store a rendition under, which the content addressed storage turns into its hash"""
+    return os.path.join(RECIPE_IMAGE_DIR, "renditions", f"{name}.{EXTENSIONS[spec['format']]}")
+
+
+def rendition_urls(renditions, request=None):
+    """Return {rendition name: URL} for {rendition name: storage path}, absolute when request is given"""
+    storage = Recipe._meta.get_field("image").storage
+    urls = {name: storage.url(path) for name, path in renditions.items()}
+    if request is not None:
+        urls = {name: request.build_absolute_uri(url) for name, url in urls.items()}
+    return urls
+
+
+def render(source, spec):
+    """Return the encoded bytes of source shrunk to fit spec's size, keeping its aspect ratio"""
+    image = source.copy()
+    image.thumbnail(spec["size"], Image.LANCZOS)
+    if spec["format"] == "JPEG" and image.mode != "RGB":
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, format=spec["format"], quality=spec.get("quality", 85), optimize=True)
+    return buffer.getvalue()
+
+
+def generate_renditions(recipe_id, image_name):
+    """Render and store every configured rendition of image_name, then record them on the recipe
+
+    The recipe is only updated if image_name is still its image, so a job for a replaced upload never
+    overwrites the renditions of the newer image. Its files are left to the `gc_images` command.
+    """
+    storage = Recipe._meta.get_field("image").storage
+    with storage.open(image_name) as file:
+        source = ImageOps.exif_transpose(Image.open(file))
+        source.load()
+
+    renditions = {}
+    for name, spec in settings.RECIPE_IMAGE_RENDITIONS.items():
+        renditions[name] = storage.save(rendition_path(name, spec), ContentFile(render(source, spec)))
+
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(image_renditions=renditions)
+    if not updated:
+        return None
+    bump_data_version(Recipe.objects.values_list("user_id", flat=True).get(pk=recipe_id))
+    return renditions
+
+
+def _run(recipe_id, image_name):
+    try:
+        generate_renditions(recipe_id, image_name)
+    except Exception:
+        logger.exception("Could not render image %s of recipe %s", image_name, recipe_id)
+    finally:
+        # Worker threads hold their own database connections, which are not closed by the request cycle
+        connections.close_all()
+
+
+def schedule_renditions(recipe):
+    """Render the renditions of recipe's image off the request thread once the transaction commits"""
+    recipe_id, image_name = recipe.pk, recipe.image.name
+    if not image_name:
+        return
+
+    def submit():
+        executor = get_executor()
+        if executor is None:
+            generate_renditions(recipe_id, image_name)
+        else:
+            executor.submit(_run, recipe_id, image_name)
+
+    transaction.on_commit(submit)
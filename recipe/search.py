@@ -0,0 +1,57 @@
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Value
+from django.db.models.expressions import RawSQL
+
+from core.models import Recipe
+
+
+SEARCH_TABLE = "core_recipe_search"
+# Column weights of the SQLite index: title, tag names, ingredient names
+SQLITE_BM25_WEIGHTS = (10.0, 5.0, 2.0)
+
+
+def fts5_query(terms):
+    """Quote each word of terms so user input is matched literally, with every word required"""
+    words = re.findall(r"\w+", terms)
+    return " ".join(f'"{word}"' for word in words)
+
+
+def search_recipes(queryset, terms):
+    """Restrict queryset to recipes matching terms, annotated with a `search_rank` where higher is better
+
+    Uses the trigger-maintained index created by `core.migrations.0007_recipe_search`: a weighted
+    tsvector with a GIN index on PostgreSQL, or an FTS5 table ranked by bm25 on SQLite. The index is
+    only read through subqueries, so the result composes with further filters, `values()` and counts.
+    """
+    vendor = connections[queryset.db].vendor
+    recipe_table = Recipe._meta.db_table
+
+    if vendor == "postgresql":
+        tsquery = "websearch_to_tsquery('english', %s)"
+        matches = RawSQL(f"SELECT recipe_id FROM {SEARCH_TABLE} WHERE document @@ {tsquery}", [terms])
+        rank = RawSQL(
+            f"SELECT ts_rank(document, {tsquery})::float8 FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE}.recipe_id = {recipe_table}.id",
+            [terms],
+            FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+    if vendor == "sqlite":
+        match = fts5_query(terms)
+        if not match:
+            return queryset.annotate(search_rank=Value(0.0, FloatField())).none()
+        weights = ", ".join(str(weight) for weight in SQLITE_BM25_WEIGHTS)
+        matches = RawSQL(f"SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s", [match])
+        # bm25 is only available within a full-text query, so the rank repeats the match for the one row
+        rank = RawSQL(
+            f"SELECT -bm25({SEARCH_TABLE}, {weights}) FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH %s AND {SEARCH_TABLE}.rowid = {recipe_table}.id",
+            [match],
+            FloatField(),
+        )
+        return queryset.filter(id__in=matches).annotate(search_rank=rank)
+
+    return queryset.filter(title__icontains=terms).annotate(search_rank=Value(0.0, FloatField()))
@@ -1,9 +1,15 @@
+from django.conf import settings
 from rest_framework import serializers
 
-from core.models import Ingredient, Recipe, Tag
+from core.models import Ingredient, Recipe, RecipeImageUpload, Tag
+from core.timing import TimedSerializerMixin
+from recipe.renditions import rendition_urls
 
 
-class TagSerializer(serializers.ModelSerializer):
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".gif", ".webp")
+
+
+class TagSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for tag objects"""
 
     class Meta:
@@ -12,7 +18,16 @@ class TagSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class TagCountSerializer(TagSerializer):
+    """Serializer for tag objects with the number of recipes using them"""
+
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(TagSerializer.Meta):
+        fields = TagSerializer.Meta.fields + ("recipe_count",)
+
+
+class IngredientSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for ingredient objects"""
 
     class Meta:
@@ -21,17 +36,54 @@ class IngredientSerializer(serializers.ModelSerializer):
         read_only_fields = ("id",)
 
 
-class RecipeSerializer(serializers.ModelSerializer):
-    """Serialize a recipe"""
+class IngredientCountSerializer(IngredientSerializer):
+    """Serializer for ingredient objects with the number of recipes using them"""
+
+    recipe_count = serializers.IntegerField(read_only=True)
+
+    class Meta(IngredientSerializer.Meta):
+        fields = IngredientSerializer.Meta.fields + ("recipe_count",)
+
+
+class ImageRenditionsField(serializers.Field):
+    """Read only {rendition name: URL} of a recipe's image, null until the renditions are ready"""
+
+    def __init__(self, **kwargs):
+        kwargs["read_only"] = True
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        return rendition_urls(value, self.context.get("request"))
+
+
+# Nested serializers of the recipe relations that ?expand= can inline
+EXPANDED_SERIALIZERS = {"ingredients": IngredientSerializer, "tags": TagSerializer}
+
+
+class RecipeSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serialize a recipe
+
+    `fields` limits the output to those fields, and the relations in `expand` are rendered as nested
+    objects instead of ids.
+    """
 
     ingredients = serializers.PrimaryKeyRelatedField(many=True, queryset=Ingredient.objects.all())
     tags = serializers.PrimaryKeyRelatedField(many=True, queryset=Tag.objects.all())
+    image_renditions = ImageRenditionsField()
 
     class Meta:
         model = Recipe
-        fields = ("id", "title", "ingredients", "tags", "time_minutes", "price", "link")
+        fields = ("id", "title", "ingredients", "tags", "time_minutes", "price", "link", "image_renditions")
         read_only_fields = ("id",)
 
+    def __init__(self, *args, fields=None, expand=(), **kwargs):
+        super().__init__(*args, **kwargs)
+        for name in expand:
+            self.fields[name] = EXPANDED_SERIALIZERS[name](many=True, read_only=True)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
 
 class RecipeDetailSerializer(RecipeSerializer):
     """Serializer a recipe detail"""
@@ -40,10 +92,35 @@ class RecipeDetailSerializer(RecipeSerializer):
     tags = TagSerializer(many=True, read_only=True)
 
 
-class RecipeImageSerializer(serializers.ModelSerializer):
+class RecipeImageSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     """Serializer for uploading images to recipe"""
 
+    image_renditions = ImageRenditionsField()
+
     class Meta:
         model = Recipe
-        fields = ("id", "image")
+        fields = ("id", "image", "image_renditions")
         read_only_fields = ("id",)
+        # The model allows recipes without an image, an upload does not
+        extra_kwargs = {"image": {"required": True, "allow_null": False}}
+
+
+class RecipeImageUploadSerializer(TimedSerializerMixin, serializers.ModelSerializer):
+    """Serializer for chunked recipe image uploads"""
+
+    offset = serializers.IntegerField(source="received", read_only=True)
+
+    class Meta:
+        model = RecipeImageUpload
+        fields = ("id", "filename", "size", "offset")
+        read_only_fields = ("id",)
+
+    def validate_filename(self, value):
+        if not value.lower().endswith(IMAGE_EXTENSIONS):
+            raise serializers.ValidationError(f"Expected one of the extensions {', '.join(IMAGE_EXTENSIONS)}.")
+        return value
+
+    def validate_size(self, value):
+        if not 0 < value <= settings.RECIPE_IMAGE_UPLOAD_MAX_SIZE:
+            raise serializers.ValidationError(f"Expected 1 to {settings.RECIPE_IMAGE_UPLOAD_MAX_SIZE} bytes.")
+        return value
@@ -0,0 +1,117 @@
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.factories import IngredientFactory, RecipeFactory, TagFactory
+from core.mixins import user_data_etag
+from core.versioning import get_data_version
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+TAGS_IMPORT_URL = reverse("recipe:tag-import")
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class ConditionalGetTests(TestCase):
+    """Test ETags and 304 responses of the recipe, tag and ingredient endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tag = TagFactory.create(user=self.user)
+        self.recipe = RecipeFactory.create(user=self.user, image=None, tags=[self.tag])
+
+    def _etag(self, url, params=None):
+        return self.client.get(url, params)["ETag"]
+
+    def test_matching_etag_is_not_modified(self):
+        """Test every list and the detail view answer their own ETag with an empty 304"""
+        for url in (RECIPES_URL, TAGS_URL, INGREDIENTS_URL, detail_url(self.recipe.id)):
+            etag = self._etag(url)
+
+            res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED, msg=url)
+            self.assertEqual(res.content, b"")
+            self.assertEqual(res["ETag"], etag)
+
+    def test_missing_object_is_not_found(self):
+        """Test a matching ETag or a wildcard for a recipe that does not exist gets a 404 instead of a 304"""
+        missing_url = detail_url(self.recipe.id + 1000)
+        replayed = user_data_etag(self.user.pk, get_data_version(self.user.pk), RequestFactory().get(missing_url))
+        for if_none_match in ("*", replayed):
+            res = self.client.get(missing_url, HTTP_IF_NONE_MATCH=if_none_match)
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND, msg=if_none_match)
+
+    def test_other_users_object_is_not_found(self):
+        """Test a wildcard revalidation of another user's recipe gets a 404"""
+        other = get_user_model().objects.create_user("other@test.com", "testpass123")
+        recipe = RecipeFactory.create(user=other, image=None)
+
+        res = self.client.get(detail_url(recipe.id), HTTP_IF_NONE_MATCH="*")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_weak_etag_matches(self):
+        """Test an ETag weakened by a proxy still revalidates"""
+        etag = self._etag(RECIPES_URL)
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=f"W/{etag}")
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_etag_depends_on_query_and_object(self):
+        """Test different query strings and different recipes get different ETags"""
+        other = RecipeFactory.create(user=self.user, image=None)
+
+        self.assertNotEqual(self._etag(RECIPES_URL), self._etag(RECIPES_URL, {"tags": self.tag.id}))
+        self.assertNotEqual(self._etag(detail_url(self.recipe.id)), self._etag(detail_url(other.id)))
+
+    def test_changes_invalidate_etag(self):
+        """Test saving, deleting and relinking the user's objects changes the ETag"""
+        changes = (
+            lambda: RecipeFactory.create(user=self.user, image=None),
+            lambda: TagFactory.create(user=self.user),
+            lambda: IngredientFactory.create(user=self.user),
+            lambda: self.recipe.tags.remove(self.tag),
+            lambda: self.recipe.ingredients.add(IngredientFactory.create(user=self.user)),
+            lambda: self.tag.delete(),
+        )
+        for change in changes:
+            etag = self._etag(RECIPES_URL)
+            change()
+            res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_other_users_changes_keep_etag(self):
+        """Test another user's writes do not invalidate the user's ETags"""
+        etag = self._etag(RECIPES_URL)
+        other = get_user_model().objects.create_user("other@test.com", "testpass123")
+        RecipeFactory.create(user=other, image=None, tags=[TagFactory.create(user=other)])
+
+        res = self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag)
+
+        self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_bulk_writes_invalidate_etag(self):
+        """Test bulk saves and imports, which send no model signals, change the ETag"""
+        etag = self._etag(RECIPES_URL)
+        payload = [{"id": self.recipe.id, "title": "Renamed"}]
+        self.client.post(BULK_URL, payload, format="json")
+        self.assertEqual(self.client.get(RECIPES_URL, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
+
+        etag = self._etag(TAGS_URL)
+        self.client.generic("POST", TAGS_IMPORT_URL, b'{"name": "Vegan"}\n', content_type="application/x-ndjson")
+        self.assertEqual(self.client.get(TAGS_URL, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_200_OK)
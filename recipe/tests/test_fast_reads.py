@@ -0,0 +1,111 @@
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.factories import IngredientFactory, RecipeFactory, TagFactory
+from core.response_cache import RESPONSE_CACHE
+from recipe.serializers import RecipeSerializer
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+@patch.dict(RESPONSE_CACHE, ENABLED=False)
+class FastReadTests(TestCase):
+    """Test the values() read path renders exactly what the serializers render"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tags = TagFactory.create_batch(3, user=self.user)
+        self.ingredients = IngredientFactory.create_batch(3, user=self.user)
+        self.recipes = [
+            RecipeFactory.create(
+                user=self.user,
+                image=None,
+                title=f"Spicy soup {n}",
+                price=Decimal("5.5"),
+                tags=self.tags[: n % 4],
+                ingredients=self.ingredients[1:] if n % 2 else self.ingredients,
+            )
+            for n in range(6)
+        ]
+        self.recipes[0].image_renditions = {"thumbnail": "uploads/recipe/renditions/ab.jpg"}
+        self.recipes[0].save()
+        RecipeFactory.create(user=get_user_model().objects.create_user("other@test.com", "testpass123"), image=None)
+
+    def _get_both(self, url, params=None):
+        with override_settings(FAST_READS=False):
+            slow = self.client.get(url, params)
+        with override_settings(FAST_READS=True):
+            fast = self.client.get(url, params)
+        self.assertEqual(fast.status_code, slow.status_code, msg=url)
+        self.assertEqual(fast.content, slow.content, msg=(url, params))
+        return fast
+
+    def test_lists_are_identical(self):
+        """Test every list variant renders byte-identical JSON"""
+        requests = (
+            (RECIPES_URL, None),
+            (RECIPES_URL, {"page_size": 2}),
+            (RECIPES_URL, {"tags": f"{self.tags[0].id},{self.tags[1].id}", "match": "all"}),
+            (RECIPES_URL, {"ingredients": self.ingredients[0].id}),
+            (RECIPES_URL, {"search": "spicy", "page_size": 4}),
+            (RECIPES_URL, {"fields": "title,tags,price,image_renditions"}),
+            (RECIPES_URL, {"expand": "tags,ingredients", "fields": "id,tags,ingredients,link"}),
+            (RECIPES_URL, {"expand": "ingredients", "search": "soup"}),
+            (TAGS_URL, None),
+            (TAGS_URL, {"with_counts": 1, "assigned_only": 1}),
+            (INGREDIENTS_URL, {"page_size": 1}),
+            (INGREDIENTS_URL, {"with_counts": 1}),
+        )
+        for url, params in requests:
+            res = self._get_both(url, params)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_next_pages_are_identical(self):
+        """Test following the cursor of a fast page gives the same page as the serializers"""
+        with override_settings(FAST_READS=True):
+            next_url = self.client.get(RECIPES_URL, {"page_size": 4}).json()["next"]
+
+        res = self._get_both(next_url)
+
+        self.assertEqual(len(res.json()["results"]), 2)
+
+    def test_detail_is_identical(self):
+        """Test the detail view renders byte-identical JSON, including renditions and nested objects"""
+        res = self._get_both(detail_url(self.recipes[0].id))
+
+        self.assertEqual(res.json()["image_renditions"]["thumbnail"][:7], "http://")
+        self._get_both(detail_url(self.recipes[3].id))
+        self._get_both(detail_url(self.recipes[3].id), {"fields": "tags,title"})
+
+    def test_detail_of_other_user_not_found(self):
+        """Test the fast detail view only finds the user's own recipes"""
+        other_recipe = RecipeFactory.create(user=get_user_model().objects.get(email="other@test.com"), image=None)
+
+        res = self._get_both(detail_url(other_recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    @override_settings(FAST_READS=True)
+    def test_fast_list_skips_serializers(self):
+        """Test the fast recipe list renders no serializer and stays within the list's query budget"""
+        with patch.object(RecipeSerializer, "to_representation", side_effect=AssertionError), self.assertNumQueries(4):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(len(res.json()["results"]), 6)
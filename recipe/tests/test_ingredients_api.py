@@ -1,4 +1,6 @@
 import shutil
+from unittest.mock import patch
+
 from core.factories import IngredientFactory, RecipeFactory
 from django.contrib.auth import get_user_model
 from django.conf import settings
@@ -14,6 +16,7 @@ from recipe.serializers import IngredientSerializer
 
 
 INGREDIENT_URL = reverse("recipe:ingredient-list")
+INGREDIENT_IMPORT_URL = reverse("recipe:ingredient-import")
 
 
 class PublicIngredientApiTest(TestCase):
@@ -40,17 +43,25 @@ class PrivateIngredientApiTest(TestCase):
         IngredientFactory.reset_sequence()
 
     def tearDown(self):
-        shutil.rmtree(settings.TEST_MEDIA_ROOT)
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
 
     def test_retrieving_ingredient_list(self):
         """Test retrieving a list of ingredients"""
         IngredientFactory.create_batch(2, user=self.user)
 
         res = self.client.get(INGREDIENT_URL)
-        ingredients = Ingredient.objects.all().order_by("-name")
+        ingredients = Ingredient.objects.all().order_by("-name", "-id")
         serializer = IngredientSerializer(ingredients, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data["results"])
+
+    def test_no_ingredient_detail_route(self):
+        """Test ingredients are only listed and created, never retrieved one by one"""
+        ingredient = IngredientFactory.create(user=self.user)
+
+        res = self.client.get(f"{INGREDIENT_URL}{ingredient.id}/")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_ingredients_limited_to_user(self):
         """Test only ingredients for the authenticated user are returned"""
@@ -60,8 +71,8 @@ class PrivateIngredientApiTest(TestCase):
 
         res = self.client.get(INGREDIENT_URL)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], ingredient.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], ingredient.name)
 
     def test_create_ingredient_successful(self):
         """Test create a new ingredient"""
@@ -89,5 +100,45 @@ class PrivateIngredientApiTest(TestCase):
 
         serializer1 = IngredientSerializer(ingredient1)
         serializer2 = IngredientSerializer(ingredient2)
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
+
+    def test_retrieve_ingredients_assigned_unique(self):
+        """Test filtering ingredients by assigned returns unique items"""
+        ingredient = IngredientFactory.create(user=self.user)
+        IngredientFactory.create(user=self.user)
+        RecipeFactory.create(user=self.user, image=None, ingredients=[ingredient])
+        RecipeFactory.create(user=self.user, image=None, ingredients=[ingredient])
+
+        res = self.client.get(INGREDIENT_URL, {"assigned_only": 1})
+
+        self.assertEqual([i["id"] for i in res.data["results"]], [ingredient.id])
+
+    def test_retrieve_assigned_ingredients_with_counts(self):
+        """Test assigned ingredients can be listed with their recipe counts"""
+        ingredient = IngredientFactory.create(user=self.user)
+        IngredientFactory.create(user=self.user)
+        RecipeFactory.create(user=self.user, image=None, ingredients=[ingredient])
+        RecipeFactory.create(user=self.user, image=None, ingredients=[ingredient])
+
+        res = self.client.get(INGREDIENT_URL, {"assigned_only": 1, "with_counts": 1})
+
+        self.assertEqual(res.data["results"], [{"id": ingredient.id, "name": ingredient.name, "recipe_count": 2}])
+
+    def test_import_ingredients_csv(self):
+        """Test importing ingredients from CSV in several batches"""
+        IngredientFactory.create(user=self.user, name="Salt")
+        rows = ["name"] + [f"Spice {n}" for n in range(5)] + ["salt", "spice 0"]
+
+        with patch("recipe.importers.IMPORT_BATCH_SIZE", 2):
+            res = self.client.post(INGREDIENT_IMPORT_URL, "\n".join(rows), content_type="text/csv")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"created": 5, "existing": 2})
+        self.assertEqual(Ingredient.objects.filter(user=self.user).count(), 6)
+
+    def test_import_ingredients_csv_requires_name_column(self):
+        """Test CSV input without a name column is rejected"""
+        res = self.client.post(INGREDIENT_IMPORT_URL, "title\nSalt\n", content_type="text/csv")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,113 @@
+import json
+from base64 import urlsafe_b64encode
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.factories import RecipeFactory, TagFactory
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+
+
+def cursor(payload):
+    return urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+
+class KeysetPaginationTests(TestCase):
+    """Test cursor pagination of the recipe API list endpoints"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass1234")
+        self.client.force_authenticate(self.user)
+
+    def _collect_pages(self, url, params):
+        """Follow `next` links and return the pages of ids"""
+        pages = []
+        res = self.client.get(url, params)
+        while True:
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            pages.append([item["id"] for item in res.data["results"]])
+            if not res.data["next"]:
+                return pages
+            res = self.client.get(res.data["next"])
+
+    def test_recipe_pages_cover_all_recipes_once(self):
+        """Test paging through recipes returns each recipe exactly once, newest first"""
+        recipes = [RecipeFactory.create(user=self.user, image=None) for _ in range(5)]
+
+        pages = self._collect_pages(RECIPES_URL, {"page_size": 2})
+
+        self.assertEqual([len(page) for page in pages], [2, 2, 1])
+        self.assertEqual(sum(pages, []), sorted((r.id for r in recipes), reverse=True))
+
+    def test_tag_pages_stable_with_duplicate_names(self):
+        """Test tags sharing a name are neither skipped nor repeated across pages"""
+        tags = [TagFactory.create(user=self.user, name=name) for name in ("b", "a", "b", "b", "a", "c")]
+
+        pages = self._collect_pages(TAGS_URL, {"page_size": 2})
+
+        expected = [t.id for t in sorted(tags, key=lambda t: (t.name, t.id), reverse=True)]
+        self.assertEqual(sum(pages, []), expected)
+
+    def test_previous_link_returns_previous_page(self):
+        """Test following the previous link returns the earlier page"""
+        for _ in range(5):
+            RecipeFactory.create(user=self.user, image=None)
+        first = self.client.get(RECIPES_URL, {"page_size": 2})
+        second = self.client.get(first.data["next"])
+
+        res = self.client.get(second.data["previous"])
+
+        self.assertEqual(res.data["results"], first.data["results"])
+        self.assertIsNone(first.data["previous"])
+
+    def test_no_count_query(self):
+        """Test that fetching a page does not count the whole table"""
+        for _ in range(3):
+            RecipeFactory.create(user=self.user, image=None)
+
+        with CaptureQueriesContext(connection) as ctx:
+            self.client.get(RECIPES_URL, {"page_size": 1})
+
+        self.assertFalse(any("COUNT(" in q["sql"].upper() for q in ctx.captured_queries))
+
+    def test_invalid_cursor(self):
+        """Test that a malformed cursor is rejected"""
+        res = self.client.get(RECIPES_URL, {"cursor": "not-a-cursor"})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_tampered_cursor_values(self):
+        """Test cursors whose position values do not fit the ordering fields are rejected"""
+        RecipeFactory.create(user=self.user, image=None)
+        TagFactory.create(user=self.user)
+
+        for url, position in (
+            (RECIPES_URL, ["zz"]),
+            (RECIPES_URL, [{"a": 1}]),
+            (RECIPES_URL, [None]),
+            (TAGS_URL, ["name", "zz"]),
+            (TAGS_URL, [["name"], 1]),
+        ):
+            with self.subTest(url=url, position=position):
+                res = self.client.get(url, {"cursor": cursor({"p": position})})
+
+                self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+                self.assertEqual(res.data["detail"], "Invalid cursor")
+
+    def test_tampered_search_cursor(self):
+        """Test a search cursor needs a number for the rank"""
+        RecipeFactory.create(user=self.user, image=None, title="Lemon tart")
+
+        res = self.client.get(RECIPES_URL, {"search": "lemon", "cursor": cursor({"p": ["high", 1]})})
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,106 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.factories import IngredientFactory, RecipeFactory, TagFactory
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+ME_URL = reverse("user:me")
+
+# Maximum number of queries each endpoint may issue, independent of how much data the user owns. Every
+# conditional read first looks up the user's data version for its ETag.
+QUERY_BUDGETS = {
+    "recipe-list": 4,
+    "recipe-detail": 4,
+    "tag-list": 2,
+    "ingredient-list": 2,
+    "user-me": 0,
+    "not-modified": 1,
+}
+
+
+def detail_url(recipe_id):
+    """Return recipe detail url"""
+    return reverse("recipe:recipe-detail", args=[recipe_id])
+
+
+class QueryBudgetTests(TestCase):
+    """Test that read endpoints stay within their query budgets"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass1234")
+        self.client.force_authenticate(self.user)
+
+    def _create_recipes(self, count):
+        tags = TagFactory.create_batch(3, user=self.user)
+        ingredients = IngredientFactory.create_batch(3, user=self.user)
+        return [
+            RecipeFactory.create(user=self.user, image=None, tags=tags, ingredients=ingredients) for _ in range(count)
+        ]
+
+    def test_recipe_list_within_budget(self):
+        """Test listing recipes does not issue a query per recipe"""
+        self._create_recipes(10)
+
+        with self.assertNumQueries(QUERY_BUDGETS["recipe-list"]):
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_recipe_list_budget_independent_of_size(self):
+        """Test the recipe list query count is the same for one or many recipes"""
+        self._create_recipes(1)
+        with self.assertNumQueries(QUERY_BUDGETS["recipe-list"]):
+            self.client.get(RECIPES_URL)
+
+        self._create_recipes(20)
+        with self.assertNumQueries(QUERY_BUDGETS["recipe-list"]):
+            self.client.get(RECIPES_URL)
+
+    def test_recipe_detail_within_budget(self):
+        """Test retrieving a recipe prefetches its nested tags and ingredients"""
+        recipe = self._create_recipes(1)[0]
+
+        with self.assertNumQueries(QUERY_BUDGETS["recipe-detail"]):
+            res = self.client.get(detail_url(recipe.id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(res.data["tags"]), 3)
+        self.assertEqual(len(res.data["ingredients"]), 3)
+
+    def test_tag_list_within_budget(self):
+        """Test listing tags within budget"""
+        self._create_recipes(5)
+
+        with self.assertNumQueries(QUERY_BUDGETS["tag-list"]):
+            self.client.get(TAGS_URL)
+
+    def test_ingredient_list_within_budget(self):
+        """Test listing ingredients within budget"""
+        self._create_recipes(5)
+
+        with self.assertNumQueries(QUERY_BUDGETS["ingredient-list"]):
+            self.client.get(INGREDIENTS_URL)
+
+    def test_user_me_within_budget(self):
+        """Test retrieving the authenticated user within budget"""
+        with self.assertNumQueries(QUERY_BUDGETS["user-me"]):
+            self.client.get(ME_URL)
+
+    def test_not_modified_within_budget(self):
+        """Test revalidating an unchanged list only reads the data version"""
+        self._create_recipes(5)
+        for url in (RECIPES_URL, TAGS_URL, INGREDIENTS_URL):
+            etag = self.client.get(url)["ETag"]
+
+            with self.assertNumQueries(QUERY_BUDGETS["not-modified"]):
+                res = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+            self.assertEqual(res.status_code, status.HTTP_304_NOT_MODIFIED)
@@ -0,0 +1,115 @@
+import re
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.factories import IngredientFactory, RecipeFactory, TagFactory
+from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
+
+
+def explain(queryset):
+    """Return the query plan of queryset, steering PostgreSQL away from sequential scans on tiny tables"""
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+    return queryset.explain()
+
+
+def view_queryset(viewset, url, params=None, action="list", user=None):
+    """Return the queryset a viewset action would evaluate, ordered the way its paginator orders it"""
+    request = APIRequestFactory().get(url, params or {})
+    force_authenticate(request, user=user)
+    view = viewset(action_map={"get": action})
+    view.setup(request)
+    view.request = view.initialize_request(request)
+    view.action = action
+    view.format_kwarg = None
+    queryset = view.get_queryset()
+    paginator = view.paginator
+    return queryset.order_by(*paginator.get_ordering(view.request, queryset, view))
+
+
+@skipUnless(connection.vendor in ("sqlite", "postgresql"), "Query plans are only asserted on SQLite and PostgreSQL")
+class QueryPlanTests(TestCase):
+    """Test that the per-user access paths are served by the composite indexes"""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("test@test.com", "testpass1234")
+        tags = TagFactory.create_batch(3, user=self.user)
+        ingredients = IngredientFactory.create_batch(3, user=self.user)
+        RecipeFactory.create(user=self.user, image=None, tags=tags, ingredients=ingredients)
+        self.tag = tags[0]
+        self.ingredient = ingredients[0]
+
+    def assertUsesIndex(self, queryset, index_name):
+        plan = explain(queryset)
+        self.assertIn(index_name, plan, msg=f"Expected {index_name} in query plan:\n{plan}")
+
+    def assertNoFullScan(self, queryset, table):
+        plan = explain(queryset)
+        full_scan = rf"(\bSCAN (TABLE )?{table}\b|Seq Scan on {table}\b)"
+        self.assertIsNone(re.search(full_scan, plan), msg=f"Unexpected full scan of {table}:\n{plan}")
+
+    def test_tag_list_uses_user_name_index(self):
+        """Test the tag list is read in order from the (user, name) index"""
+        queryset = view_queryset(TagViewSet, reverse("recipe:tag-list"), user=self.user)
+
+        self.assertUsesIndex(queryset, "core_tag_user_name_idx")
+
+    def test_ingredient_list_uses_user_name_index(self):
+        """Test the ingredient list is read in order from the (user, name) index"""
+        queryset = view_queryset(IngredientViewSet, reverse("recipe:ingredient-list"), user=self.user)
+
+        self.assertUsesIndex(queryset, "core_ingredient_user_name_idx")
+
+    def test_recipe_list_uses_user_id_index(self):
+        """Test the recipe list is read in order from the (user, id) index"""
+        queryset = view_queryset(RecipeViewSet, reverse("recipe:recipe-list"), user=self.user)
+
+        self.assertUsesIndex(queryset, "core_recipe_user_pk_idx")
+
+    def test_recipe_tag_filter_probes_through_index(self):
+        """Test filtering recipes by tag never scans the recipe/tag through table"""
+        queryset = view_queryset(
+            RecipeViewSet, reverse("recipe:recipe-list"), params={"tags": self.tag.id}, user=self.user
+        )
+
+        self.assertNoFullScan(queryset, "core_recipe_tags")
+
+    def test_recipe_ingredient_filter_probes_through_index(self):
+        """Test filtering recipes by ingredient never scans the recipe/ingredient through table"""
+        queryset = view_queryset(
+            RecipeViewSet, reverse("recipe:recipe-list"), params={"ingredients": self.ingredient.id}, user=self.user
+        )
+
+        self.assertNoFullScan(queryset, "core_recipe_ingredients")
+
+    def test_recipe_match_all_uses_reverse_through_index(self):
+        """Test match=all groups the through table rows read from the (tag, recipe) index"""
+        queryset = view_queryset(
+            RecipeViewSet,
+            reverse("recipe:recipe-list"),
+            params={"tags": self.tag.id, "match": "all"},
+            user=self.user,
+        )
+
+        self.assertUsesIndex(queryset, "core_recipe_tags_tag_recipe_idx")
+
+    def test_assigned_tags_probe_through_index(self):
+        """Test assigned_only checks tag usage with an index lookup per tag"""
+        queryset = view_queryset(TagViewSet, reverse("recipe:tag-list"), params={"assigned_only": 1}, user=self.user)
+
+        self.assertNoFullScan(queryset, "core_recipe_tags")
+
+    def test_assigned_ingredients_probe_through_index(self):
+        """Test assigned_only checks ingredient usage with an index lookup per ingredient"""
+        queryset = view_queryset(
+            IngredientViewSet, reverse("recipe:ingredient-list"), params={"assigned_only": 1}, user=self.user
+        )
+
+        self.assertNoFullScan(queryset, "core_recipe_ingredients")
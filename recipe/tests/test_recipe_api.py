@@ -1,21 +1,35 @@
+import csv
+import json
 import tempfile
 import os
 import shutil
+from datetime import timedelta
+from io import BytesIO, StringIO
+from unittest.mock import patch
 from PIL import Image
 
 from django.contrib.auth import get_user_model
 from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from django.utils import timezone
 
 from rest_framework import status
 from rest_framework.test import APIClient
 
-from core.models import Recipe
+from core.models import Recipe, RecipeImageUpload
 from core.factories import IngredientFactory, RecipeFactory, TagFactory
+from recipe.renditions import generate_renditions
+from recipe.search import search_recipes
+from recipe.uploads import write_chunk
 from recipe.serializers import RecipeDetailSerializer, RecipeSerializer
 
 RECIPES_URL = reverse("recipe:recipe-list")
+BULK_URL = reverse("recipe:recipe-bulk")
+EXPORT_URL = reverse("recipe:recipe-export")
 
 
 def image_upload_url(recipe_id):
@@ -23,6 +37,21 @@ def image_upload_url(recipe_id):
     return reverse("recipe:recipe-upload-image", args=[recipe_id])
 
 
+def image_uploads_url(recipe_id):
+    """Return url for starting a chunked recipe image upload"""
+    return reverse("recipe:recipe-uploads", args=[recipe_id])
+
+
+def chunked_upload_url(recipe_id, upload_id):
+    """Return url for a chunked recipe image upload"""
+    return reverse("recipe:recipe-upload", args=[recipe_id, upload_id])
+
+
+def finalize_upload_url(recipe_id, upload_id):
+    """Return url for finalizing a chunked recipe image upload"""
+    return reverse("recipe:recipe-finalize-image-upload", args=[recipe_id, upload_id])
+
+
 def detail_url(recipe_id):
     """Return recipe detail url"""
     return reverse("recipe:recipe-detail", args=[recipe_id])
@@ -54,7 +83,7 @@ class PrivateRecipeApiTests(TestCase):
         RecipeFactory.reset_sequence()
 
     def tearDown(self):
-        shutil.rmtree(settings.TEST_MEDIA_ROOT)
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
 
     def test_retrieve_recipes(self):
         """Test retrieving a list of recipes"""
@@ -63,10 +92,10 @@ class PrivateRecipeApiTests(TestCase):
 
         res = self.client.get(RECIPES_URL)
 
-        recipes = Recipe.objects.all()
+        recipes = Recipe.objects.order_by("-id")
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(serializer.data, res.data)
+        self.assertEqual(serializer.data, res.data["results"])
 
     def test_recipe_limited_to_user(self):
         """Test retrieving recipes for user"""
@@ -79,8 +108,8 @@ class PrivateRecipeApiTests(TestCase):
         recipes = Recipe.objects.filter(user=self.user)
         serializer = RecipeSerializer(recipes, many=True)
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"], serializer.data)
 
     def test_view_recipe_detail(self):
         """Test viewing a recipe detail"""
@@ -177,7 +206,7 @@ class RecipeImageUploadTests(TestCase):
         self.recipe = RecipeFactory.create(user=self.user)
 
     def tearDown(self):
-        shutil.rmtree(settings.TEST_MEDIA_ROOT)
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
 
     def test_upload_image_to_recipe(self):
         """Test uploading an image to recipe"""
@@ -200,6 +229,18 @@ class RecipeImageUploadTests(TestCase):
 
         self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
 
+    @override_settings(RECIPE_IMAGE_WORKERS=0)
+    def test_upload_without_image(self):
+        """Test a missing or empty image is rejected without scheduling renditions"""
+        url = image_upload_url(self.recipe.id)
+        for payload in ({}, {"image": ""}):
+            with self.subTest(payload=payload), self.captureOnCommitCallbacks(execute=True) as callbacks:
+                res = self.client.post(url, payload, format="multipart")
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn("image", res.data)
+            self.assertEqual(callbacks, [])
+
     def test_filter_recipes_by_tags(self):
         """Test returning recipes with specific tags"""
         recipe1 = RecipeFactory.create(user=self.user, title="Thai vegetable curry")
@@ -214,9 +255,9 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
 
     def test_filter_recipe_by_ingredients(self):
         """Test returning recipe with specific ingredients"""
@@ -233,6 +274,683 @@ class RecipeImageUploadTests(TestCase):
         serializer1 = RecipeSerializer(recipe1)
         serializer2 = RecipeSerializer(recipe2)
         serializer3 = RecipeSerializer(recipe3)
-        self.assertIn(serializer1.data, res.data)
-        self.assertIn(serializer2.data, res.data)
-        self.assertNotIn(serializer3.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertIn(serializer2.data, res.data["results"])
+        self.assertNotIn(serializer3.data, res.data["results"])
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class RecipeImageRenditionTests(TestCase):
+    """Test the renditions rendered for uploaded recipe images"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.recipe = RecipeFactory.create(user=self.user, image=None)
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def _upload(self, size=(1600, 1200)):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", size).save(ntf, format="JPEG")
+            ntf.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                res = self.client.post(image_upload_url(self.recipe.id), {"image": ntf}, format="multipart")
+        self.recipe.refresh_from_db()
+        return res
+
+    def test_upload_renders_configured_renditions(self):
+        """Test every configured rendition is stored, shrunk to fit its bounding box"""
+        self._upload()
+
+        self.assertEqual(set(self.recipe.image_renditions), set(settings.RECIPE_IMAGE_RENDITIONS))
+        storage = Recipe._meta.get_field("image").storage
+        for name, path in self.recipe.image_renditions.items():
+            spec = settings.RECIPE_IMAGE_RENDITIONS[name]
+            with storage.open(path) as file, Image.open(file) as image:
+                self.assertEqual(image.format, spec["format"])
+                self.assertLessEqual(image.width, spec["size"][0])
+                self.assertLessEqual(image.height, spec["size"][1])
+                self.assertEqual(image.width * 3, image.height * 4)
+
+    def test_renditions_are_exposed_once_ready(self):
+        """Test the recipe payload has rendition URLs once they are rendered, and null before"""
+        res = self.client.get(detail_url(self.recipe.id))
+        self.assertIsNone(res.data["image_renditions"])
+
+        self._upload()
+        res = self.client.get(detail_url(self.recipe.id))
+
+        self.assertEqual(set(res.data["image_renditions"]), set(settings.RECIPE_IMAGE_RENDITIONS))
+        self.assertTrue(res.data["image_renditions"]["thumbnail"].startswith("http://testserver/media/"))
+
+    def test_upload_is_answered_before_rendering(self):
+        """Test renditions are not rendered before the upload is committed"""
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (50, 50)).save(ntf, format="JPEG")
+            ntf.seek(0)
+            with self.captureOnCommitCallbacks() as callbacks:
+                res = self.client.post(image_upload_url(self.recipe.id), {"image": ntf}, format="multipart")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIsNone(res.data["image_renditions"])
+        self.assertEqual(len(callbacks), 1)
+
+    def test_stale_job_does_not_overwrite_newer_image(self):
+        """Test renditions of a replaced image are not recorded on the recipe"""
+        self._upload()
+        old_image = self.recipe.image.name
+        Recipe.objects.filter(pk=self.recipe.pk).update(image="uploads/recipe/newer.jpg", image_renditions=None)
+
+        self.assertIsNone(generate_renditions(self.recipe.id, old_image))
+        self.recipe.refresh_from_db()
+        self.assertIsNone(self.recipe.image_renditions)
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class SharedRecipeImageTests(TestCase):
+    """Test recipe images are stored once per content and collected once no recipe uses them"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.recipe1 = RecipeFactory.create(user=self.user, image=None)
+        self.recipe2 = RecipeFactory.create(user=self.user, image=None)
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def _upload(self, recipe, color):
+        with tempfile.NamedTemporaryFile(suffix=".jpg") as ntf:
+            Image.new("RGB", (20, 20), color=color).save(ntf, format="JPEG")
+            ntf.seek(0)
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.post(image_upload_url(recipe.id), {"image": ntf}, format="multipart")
+        recipe.refresh_from_db()
+        return recipe.image.name
+
+    def test_identical_images_are_stored_once(self):
+        """Test the same photo uploaded to two recipes is one file with one URL"""
+        name1 = self._upload(self.recipe1, "red")
+        name2 = self._upload(self.recipe2, "red")
+
+        self.assertEqual(name1, name2)
+        self.assertEqual(Recipe.objects.filter(image=name1).count(), 2)
+        self.assertEqual(len(os.listdir(os.path.dirname(self.recipe1.image.path))), 1)
+
+    def test_replaced_image_is_collected(self):
+        """Test an image no recipe uses anymore is kept until it is garbage collected"""
+        old = self._upload(self.recipe1, "red")
+        self._upload(self.recipe1, "blue")
+        self.assertTrue(self.recipe1.image.storage.exists(old))
+
+        call_command("gc_images", grace=0, stdout=StringIO())
+
+        self.assertFalse(self.recipe1.image.storage.exists(old))
+
+    def test_shared_image_outlives_one_recipe(self):
+        """Test collecting keeps an image another recipe uses, and removes it once the last one is deleted"""
+        name = self._upload(self.recipe1, "red")
+        self._upload(self.recipe2, "red")
+        storage = self.recipe1.image.storage
+
+        self.recipe1.delete()
+        call_command("gc_images", grace=0, stdout=StringIO())
+        self.assertTrue(storage.exists(name))
+
+        self.recipe2.delete()
+        call_command("gc_images", grace=0, stdout=StringIO())
+        self.assertFalse(storage.exists(name))
+
+    def test_reuploaded_image_survives_collection(self):
+        """Test uploading content that is stored already protects its file through the grace period"""
+        name = self._upload(self.recipe1, "red")
+        self.recipe1.delete()
+        path = self.recipe2.image.storage.path(name)
+        os.utime(path, (0, 0))
+
+        self._upload(self.recipe2, "red")
+        call_command("gc_images", stdout=StringIO())
+
+        self.assertTrue(os.path.exists(path))
+
+
+@override_settings(
+    MEDIA_ROOT=settings.TEST_MEDIA_ROOT,
+    RECIPE_IMAGE_UPLOAD_DIR=f"{settings.TEST_MEDIA_ROOT}/partial",
+    RECIPE_IMAGE_WORKERS=0,
+)
+class RecipeChunkedImageUploadTests(TestCase):
+    """Test resumable chunked recipe image uploads"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.recipe = RecipeFactory.create(user=self.user, image=None)
+        buffer = BytesIO()
+        Image.new("RGB", (300, 200), color="red").save(buffer, format="PNG")
+        self.image = buffer.getvalue()
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def _start(self, size=None, filename="photo.png"):
+        res = self.client.post(
+            image_uploads_url(self.recipe.id), {"filename": filename, "size": size or len(self.image)}
+        )
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        return res.data["id"]
+
+    def _put(self, upload_id, start, end, data=None):
+        return self.client.put(
+            chunked_upload_url(self.recipe.id, upload_id),
+            data=self.image[start:end] if data is None else data,
+            content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {start}-{end - 1}/{len(self.image)}",
+        )
+
+    def test_upload_in_chunks_and_finalize(self):
+        """Test an image sent in chunks is attached to the recipe when finalized"""
+        upload_id = self._start()
+        third = len(self.image) // 3
+        for start, end in ((0, third), (third, 2 * third), (2 * third, len(self.image))):
+            res = self._put(upload_id, start, end)
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.data["offset"], end)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            res = self.client.post(finalize_upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.recipe.refresh_from_db()
+        self.assertTrue(self.recipe.image.name.endswith(".png"))
+        with self.recipe.image.open("rb") as file:
+            self.assertEqual(file.read(), self.image)
+        self.assertIsNotNone(self.recipe.image_renditions)
+        self.assertFalse(RecipeImageUpload.objects.exists())
+        self.assertEqual(os.listdir(settings.RECIPE_IMAGE_UPLOAD_DIR), [])
+
+    def test_resume_from_reported_offset(self):
+        """Test the upload reports the offset received so far"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 100)
+
+        res = self.client.get(chunked_upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["offset"], 100)
+        self.assertEqual(res.data["size"], len(self.image))
+
+    def test_chunk_at_wrong_offset_conflicts(self):
+        """Test a chunk not starting at the current offset is rejected with that offset"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 100)
+
+        res = self._put(upload_id, 200, 300)
+
+        self.assertEqual(res.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(res.data["offset"], 100)
+
+    def test_non_image_upload_is_rejected_early(self):
+        """Test an upload is discarded as soon as its first bytes are not an image signature"""
+        upload_id = self._start()
+
+        res = self._put(upload_id, 0, 100, data=b"%PDF-1.4" + bytes(92))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(RecipeImageUpload.objects.filter(pk=upload_id).exists())
+
+    def test_finalize_incomplete_upload(self):
+        """Test an upload cannot be finalized before every byte is received"""
+        upload_id = self._start()
+        self._put(upload_id, 0, 100)
+
+        res = self.client.post(finalize_upload_url(self.recipe.id, upload_id))
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data["offset"], 100)
+        self.recipe.refresh_from_db()
+        self.assertFalse(self.recipe.image)
+
+    def test_body_is_received_before_locking(self):
+        """Test a chunk is read from the client before the upload row is locked"""
+        upload = RecipeImageUpload.objects.get(pk=self._start())
+        depths = []
+
+        class Stream(BytesIO):
+            def read(stream, size=-1):
+                depths.append(len(connection.savepoint_ids))
+                return super().read(size)
+
+        outside = len(connection.savepoint_ids)
+        upload = write_chunk(upload, f"bytes 0-99/{len(self.image)}", Stream(self.image[:100]))
+
+        self.assertEqual(upload.received, 100)
+        self.assertEqual(set(depths), {outside})
+        with open(upload.path, "rb") as file:
+            self.assertEqual(file.read(), self.image[:100])
+
+    def test_chunk_extends_expiry(self):
+        """Test each chunk postpones the expiry of the upload"""
+        upload_id = self._start()
+        RecipeImageUpload.objects.filter(pk=upload_id).update(expires_at=timezone.now() + timedelta(seconds=5))
+
+        self._put(upload_id, 0, 100)
+
+        expires_at = RecipeImageUpload.objects.get(pk=upload_id).expires_at
+        self.assertGreater(expires_at, timezone.now() + timedelta(seconds=settings.RECIPE_IMAGE_UPLOAD_EXPIRY - 60))
+
+    def test_expired_upload_is_gone(self):
+        """Test an expired upload can no longer be continued"""
+        upload_id = self._start()
+        RecipeImageUpload.objects.filter(pk=upload_id).update(expires_at=timezone.now())
+
+        self.assertEqual(self._put(upload_id, 0, 100).status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_upload_size_is_limited(self):
+        """Test uploads larger than the configured maximum are refused up front"""
+        res = self.client.post(
+            image_uploads_url(self.recipe.id),
+            {"filename": "photo.png", "size": settings.RECIPE_IMAGE_UPLOAD_MAX_SIZE + 1},
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_upload_to_other_users_recipe(self):
+        """Test uploads can only be started and continued on the user's own recipes"""
+        upload_id = self._start()
+        other = get_user_model().objects.create_user("other@test.com", "testpass123")
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self._put(upload_id, 0, 100).status_code, status.HTTP_404_NOT_FOUND)
+        res = self.client.post(image_uploads_url(self.recipe.id), {"filename": "photo.png", "size": 10})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecipeFilterTests(TestCase):
+    """Test filtering recipes by tags and ingredients"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tag1, self.tag2 = TagFactory.create_batch(2, user=self.user)
+        self.ingredient = IngredientFactory.create(user=self.user)
+        self.both = RecipeFactory.create(user=self.user, image=None, tags=[self.tag1, self.tag2])
+        self.one = RecipeFactory.create(user=self.user, image=None, tags=[self.tag1], ingredients=[self.ingredient])
+        self.none = RecipeFactory.create(user=self.user, image=None)
+
+    def _result_ids(self, params):
+        res = self.client.get(RECIPES_URL, params)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe["id"] for recipe in res.data["results"]]
+
+    def test_match_any_returns_no_duplicates(self):
+        """Test a recipe with several of the given tags is returned once"""
+        ids = self._result_ids({"tags": f"{self.tag1.id},{self.tag2.id}"})
+
+        self.assertEqual(ids, [self.one.id, self.both.id])
+
+    def test_match_all(self):
+        """Test match=all returns only recipes with every given tag"""
+        ids = self._result_ids({"tags": f"{self.tag1.id},{self.tag2.id}", "match": "all"})
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_match_all_ignores_repeated_ids(self):
+        """Test repeating an id does not make match=all impossible to satisfy"""
+        ids = self._result_ids({"tags": f"{self.tag2.id},{self.tag2.id}", "match": "all"})
+
+        self.assertEqual(ids, [self.both.id])
+
+    def test_tags_and_ingredients_combined(self):
+        """Test tag and ingredient filters are both applied"""
+        ids = self._result_ids({"tags": f"{self.tag1.id}", "ingredients": f"{self.ingredient.id}"})
+
+        self.assertEqual(ids, [self.one.id])
+
+    def test_invalid_ids_rejected(self):
+        """Test non-integer ids return a bad request instead of a server error"""
+        res = self.client.get(RECIPES_URL, {"tags": "1,abc"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("tags", res.data)
+
+    def test_out_of_range_ids_rejected(self):
+        """Test ids no primary key can hold return a bad request instead of a server error"""
+        for ids in ("0", "-1", str(2**63), f"{self.tag1.id},{2**64}"):
+            res = self.client.get(RECIPES_URL, {"tags": ids, "ingredients": ids})
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST, ids)
+            self.assertIn("tags", res.data)
+
+    def test_invalid_match_rejected(self):
+        """Test an unknown match mode is rejected"""
+        res = self.client.get(RECIPES_URL, {"tags": f"{self.tag1.id}", "match": "most"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class RecipeSparseFieldsTests(TestCase):
+    """Test limiting the returned recipe fields and expanding relations"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tag = TagFactory.create(user=self.user, name="Vegan")
+        self.ingredient = IngredientFactory.create(user=self.user, name="Tofu")
+        self.recipe = RecipeFactory.create(
+            user=self.user, image=None, price="5.00", tags=[self.tag], ingredients=[self.ingredient]
+        )
+
+    def test_fields_limit_output(self):
+        """Test only the requested fields are returned, in the usual order, by lists and details"""
+        res = self.client.get(RECIPES_URL, {"fields": "title,id,tags"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        expected = [{"id": self.recipe.id, "title": self.recipe.title, "tags": [self.tag.id]}]
+        self.assertEqual(res.json()["results"], expected)
+
+        res = self.client.get(detail_url(self.recipe.id), {"fields": "price,ingredients"})
+
+        self.assertEqual(res.json(), {"ingredients": [{"id": self.ingredient.id, "name": "Tofu"}], "price": "5.00"})
+
+    def test_fields_limit_columns_and_prefetches(self):
+        """Test columns and relations that were not requested are not read"""
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(RECIPES_URL, {"fields": "id,title"})
+
+        recipe_queries = [query["sql"] for query in queries if 'FROM "core_recipe"' in query["sql"]]
+        self.assertEqual(len(recipe_queries), 1)
+        self.assertNotIn("time_minutes", recipe_queries[0])
+        self.assertFalse([query for query in queries if "core_recipe_tags" in query["sql"]])
+
+    def test_unknown_field_rejected(self):
+        """Test unknown fields and relations are rejected"""
+        for params in ({"fields": "title,secret"}, {"expand": "user"}):
+            res = self.client.get(RECIPES_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(next(iter(params)), res.data)
+
+    def test_expand_relations(self):
+        """Test expanded relations are inlined as objects without extra queries"""
+        self.client.get(RECIPES_URL)
+        with CaptureQueriesContext(connection) as plain:
+            self.client.get(RECIPES_URL, {"page_size": 10})
+
+        with self.assertNumQueries(len(plain)):
+            res = self.client.get(RECIPES_URL, {"page_size": 10, "expand": "tags,ingredients"})
+
+        recipe = res.json()["results"][0]
+        self.assertEqual(recipe["tags"], [{"id": self.tag.id, "name": "Vegan"}])
+        self.assertEqual(recipe["ingredients"], [{"id": self.ingredient.id, "name": "Tofu"}])
+
+    def test_writes_ignore_fields(self):
+        """Test creating a recipe returns every field whatever the query string"""
+        payload = {"title": "Soup", "time_minutes": 5, "price": "2.00", "tags": [self.tag.id], "ingredients": []}
+
+        res = self.client.post(f"{RECIPES_URL}?fields=id&expand=tags", payload)
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["tags"], [self.tag.id])
+        self.assertIn("price", res.data)
+
+
+class RecipeSearchTests(TestCase):
+    """Test full-text search over recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+
+    def _search(self, terms, **params):
+        res = self.client.get(RECIPES_URL, {"search": terms, **params})
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        return [recipe["id"] for recipe in res.data["results"]]
+
+    def test_search_by_title(self):
+        """Test recipes are found by words in their title"""
+        curry = RecipeFactory.create(user=self.user, image=None, title="Thai green curry")
+        RecipeFactory.create(user=self.user, image=None, title="Fish and chips")
+
+        self.assertEqual(self._search("curry"), [curry.id])
+
+    def test_search_by_tag_and_ingredient_names(self):
+        """Test recipes are found by the names of their tags and ingredients"""
+        tag = TagFactory.create(user=self.user, name="Vegan")
+        ingredient = IngredientFactory.create(user=self.user, name="Tofu")
+        tagged = RecipeFactory.create(user=self.user, image=None, title="Salad", tags=[tag])
+        with_ingredient = RecipeFactory.create(user=self.user, image=None, title="Stir fry", ingredients=[ingredient])
+
+        self.assertEqual(self._search("vegan"), [tagged.id])
+        self.assertEqual(self._search("tofu"), [with_ingredient.id])
+
+    def test_search_index_follows_changes(self):
+        """Test renaming recipes and tags and unlinking tags updates search results"""
+        tag = TagFactory.create(user=self.user, name="Spicy")
+        recipe = RecipeFactory.create(user=self.user, image=None, title="Chili", tags=[tag])
+
+        tag.name = "Smoky"
+        tag.save()
+        self.assertEqual(self._search("smoky"), [recipe.id])
+
+        recipe.tags.clear()
+        recipe.title = "Bean stew"
+        recipe.save()
+        self.assertEqual(self._search("smoky"), [])
+        self.assertEqual(self._search("chili"), [])
+        self.assertEqual(self._search("stew"), [recipe.id])
+
+        recipe.delete()
+        self.assertEqual(self._search("stew"), [])
+
+    def test_search_ranks_title_matches_first(self):
+        """Test a title match ranks above an ingredient match"""
+        ingredient = IngredientFactory.create(user=self.user, name="Lemon")
+        by_ingredient = RecipeFactory.create(user=self.user, image=None, title="Fish", ingredients=[ingredient])
+        by_title = RecipeFactory.create(user=self.user, image=None, title="Lemon tart")
+
+        self.assertEqual(self._search("lemon"), [by_title.id, by_ingredient.id])
+
+    def test_search_paginates(self):
+        """Test ranked search results can be paged through"""
+        recipes = [RecipeFactory.create(user=self.user, image=None, title=f"Soup {n}") for n in range(5)]
+
+        res = self.client.get(RECIPES_URL, {"search": "soup", "page_size": 2})
+        ids = [r["id"] for r in res.data["results"]]
+        while res.data["next"]:
+            res = self.client.get(res.data["next"])
+            ids.extend(r["id"] for r in res.data["results"])
+
+        self.assertEqual(sorted(ids), sorted(r.id for r in recipes))
+
+    def test_search_limited_to_user(self):
+        """Test search only returns the authenticated user's recipes"""
+        other = get_user_model().objects.create_user("other@test.com", "testpass123")
+        RecipeFactory.create(user=other, image=None, title="Pancakes")
+
+        self.assertEqual(self._search("pancakes"), [])
+
+    def test_search_punctuation_only(self):
+        """Test a query without any words returns no recipes instead of an error"""
+        RecipeFactory.create(user=self.user, image=None, title="Pancakes")
+
+        self.assertEqual(self._search('"*'), [])
+
+    def test_search_composes_with_queryset_methods(self):
+        """Test search results can be filtered further, counted and read as values"""
+        quick = RecipeFactory.create(user=self.user, image=None, title="Quick soup", time_minutes=10)
+        RecipeFactory.create(user=self.user, image=None, title="Slow soup", time_minutes=240)
+        RecipeFactory.create(user=self.user, image=None, title="Quick salad", time_minutes=10)
+
+        results = search_recipes(Recipe.objects.filter(user=self.user), "soup").filter(time_minutes__lt=60)
+
+        self.assertEqual(results.count(), 1)
+        self.assertEqual(list(results.values_list("id", flat=True)), [quick.id])
+        self.assertEqual(list(results.values("title", "search_rank"))[0]["title"], "Quick soup")
+
+
+class RecipeBulkTests(TestCase):
+    """Test creating and updating recipes in bulk"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tag = TagFactory.create(user=self.user)
+        self.ingredient = IngredientFactory.create(user=self.user)
+
+    def test_bulk_create_recipes(self):
+        """Test creating several recipes with tags and ingredients in one request"""
+        payload = [
+            {"title": f"Recipe {n}", "time_minutes": 10, "price": "5.00", "tags": [self.tag.id]} for n in range(3)
+        ]
+        payload[0]["ingredients"] = [self.ingredient.id]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r["title"] for r in res.data], ["Recipe 0", "Recipe 1", "Recipe 2"])
+        recipes = Recipe.objects.filter(user=self.user)
+        self.assertEqual(recipes.count(), 3)
+        self.assertEqual(list(recipes.get(id=res.data[0]["id"]).ingredients.all()), [self.ingredient])
+        self.assertTrue(all(list(r.tags.all()) == [self.tag] for r in recipes))
+
+    def test_bulk_update_and_create(self):
+        """Test items with an id update that recipe and leave omitted fields alone"""
+        recipe = RecipeFactory.create(user=self.user, image=None, title="Old", tags=[self.tag])
+        payload = [
+            {"id": recipe.id, "title": "New", "tags": []},
+            {"title": "Created", "time_minutes": 5, "price": "1.50"},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "New")
+        self.assertEqual(recipe.tags.count(), 0)
+        self.assertEqual(res.data[0]["id"], recipe.id)
+        self.assertTrue(Recipe.objects.filter(user=self.user, title="Created").exists())
+
+    def test_bulk_reports_item_errors_and_saves_nothing(self):
+        """Test invalid items are reported by position and no recipe is saved"""
+        other_user = get_user_model().objects.create_user("other@test.com", "testpass123")
+        other_tag = TagFactory.create(user=other_user)
+        other_recipe = RecipeFactory.create(user=other_user, image=None)
+        payload = [
+            {"title": "Fine", "time_minutes": 10, "price": "5.00"},
+            {"title": "No price", "time_minutes": 10},
+            {"title": "Foreign tag", "time_minutes": 10, "price": "5.00", "tags": [other_tag.id]},
+            {"id": other_recipe.id, "title": "Hijack"},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("price", res.data[1])
+        self.assertIn("tags", res.data[2])
+        self.assertIn("id", res.data[3])
+        self.assertFalse(Recipe.objects.filter(user=self.user).exists())
+        other_recipe.refresh_from_db()
+        self.assertNotEqual(other_recipe.title, "Hijack")
+
+    def test_bulk_rejects_out_of_range_ids(self):
+        """Test ids no primary key can hold are reported per item instead of causing a server error"""
+        payload = [
+            {"id": 2**63, "title": "Huge"},
+            {"title": "Zero tag", "time_minutes": 10, "price": "5.00", "tags": [0]},
+            {"title": "Huge ingredient", "time_minutes": 10, "price": "5.00", "ingredients": [2**64]},
+        ]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("id", res.data[0])
+        self.assertIn("tags", res.data[1])
+        self.assertIn("ingredients", res.data[2])
+
+    def test_bulk_rejects_duplicate_ids(self):
+        """Test updating the same recipe twice in one request is reported on the repeated item"""
+        recipe = RecipeFactory.create(user=self.user, image=None, title="Old")
+        payload = [{"id": recipe.id, "title": "First"}, {"id": recipe.id, "title": "Second"}]
+
+        res = self.client.post(BULK_URL, payload, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.data[0], {})
+        self.assertIn("id", res.data[1])
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.title, "Old")
+
+    def test_bulk_requires_list(self):
+        """Test a payload that is not a list is rejected"""
+        res = self.client.post(BULK_URL, {"title": "Single"}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+@override_settings(MEDIA_ROOT=settings.TEST_MEDIA_ROOT)
+class RecipeExportTests(TestCase):
+    """Test streaming export of a user's recipes"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tag = TagFactory.create(user=self.user, name="Vegan")
+        self.ingredient = IngredientFactory.create(user=self.user, name="Tofu")
+
+    def tearDown(self):
+        shutil.rmtree(settings.TEST_MEDIA_ROOT, ignore_errors=True)
+
+    def test_export_ndjson(self):
+        """Test recipes are exported one JSON object per line with relations embedded"""
+        recipe = RecipeFactory.create(user=self.user, tags=[self.tag], ingredients=[self.ingredient])
+        RecipeFactory.create(user=get_user_model().objects.create_user("other@test.com", "testpass123"))
+
+        res = self.client.get(EXPORT_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).decode().splitlines()
+        self.assertEqual(len(lines), 1)
+        exported = json.loads(lines[0])
+        self.assertEqual(exported["id"], recipe.id)
+        self.assertEqual(exported["price"], str(recipe.price))
+        self.assertEqual(exported["tags"], [{"id": self.tag.id, "name": "Vegan"}])
+        self.assertEqual(exported["ingredients"], [{"id": self.ingredient.id, "name": "Tofu"}])
+        self.assertTrue(exported["image"].startswith("http://testserver/media/"))
+
+    def test_export_csv(self):
+        """Test recipes can be exported as CSV"""
+        RecipeFactory.create(user=self.user, image=None, title="Salad", tags=[self.tag])
+
+        res = self.client.get(EXPORT_URL, {"format": "csv"})
+
+        self.assertEqual(res["Content-Type"], "text/csv")
+        rows = list(csv.DictReader(b"".join(res.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]["title"], "Salad")
+        self.assertEqual(rows[0]["tags"], "Vegan")
+        self.assertEqual(rows[0]["image"], "")
+
+    def test_export_fetches_relations_per_chunk(self):
+        """Test relations are loaded with a fixed number of queries per chunk of recipes"""
+        for _ in range(5):
+            RecipeFactory.create(user=self.user, image=None, tags=[self.tag], ingredients=[self.ingredient])
+
+        with patch("recipe.exporters.EXPORT_CHUNK_SIZE", 2), self.assertNumQueries(1 + 3 * 2):
+            res = self.client.get(EXPORT_URL)
+            ids = [json.loads(line)["id"] for line in b"".join(res.streaming_content).decode().splitlines()]
+
+        self.assertEqual(ids, sorted(ids))
+        self.assertEqual(len(ids), 5)
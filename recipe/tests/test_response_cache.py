@@ -0,0 +1,156 @@
+import json
+from unittest.mock import patch
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.factories import IngredientFactory, RecipeFactory, TagFactory
+from core.response_cache import RESPONSE_CACHE, reset_response_cache, response_cache_stats
+
+
+RECIPES_URL = reverse("recipe:recipe-list")
+TAGS_URL = reverse("recipe:tag-list")
+INGREDIENTS_URL = reverse("recipe:ingredient-list")
+CACHE_STATS_URL = reverse("cache-stats")
+
+
+class ResponseCacheTests(TestCase):
+    """Test list responses are cached per user and data version"""
+
+    def setUp(self):
+        reset_response_cache()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(self.user)
+        self.tag = TagFactory.create(user=self.user)
+        self.recipe = RecipeFactory.create(user=self.user, image=None, tags=[self.tag])
+
+    def test_repeated_list_is_hit(self):
+        """Test a repeated list request is served from the cache with only the version lookup"""
+        for url in (RECIPES_URL, TAGS_URL, INGREDIENTS_URL):
+            first = self.client.get(url)
+
+            with self.assertNumQueries(1):
+                second = self.client.get(url)
+
+            self.assertEqual(first["X-Cache"], "MISS", msg=url)
+            self.assertEqual(second["X-Cache"], "HIT", msg=url)
+            self.assertEqual(second.status_code, status.HTTP_200_OK)
+            self.assertEqual(second.json(), first.json())
+
+    def test_query_order_shares_entry(self):
+        """Test the same query parameters in another order hit the same entry"""
+        self.client.get(f"{RECIPES_URL}?tags={self.tag.id}&page_size=5")
+
+        res = self.client.get(f"{RECIPES_URL}?page_size=5&tags={self.tag.id}")
+
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertEqual(self.client.get(RECIPES_URL, {"page_size": 6})["X-Cache"], "MISS")
+
+    def test_changes_invalidate_entries(self):
+        """Test saves, deletes and relinking of the user's objects miss the cache"""
+        changes = (
+            lambda: RecipeFactory.create(user=self.user, image=None),
+            lambda: IngredientFactory.create(user=self.user),
+            lambda: self.recipe.tags.remove(self.tag),
+            lambda: self.tag.delete(),
+        )
+        for change in changes:
+            self.client.get(RECIPES_URL)
+            change()
+            res = self.client.get(RECIPES_URL)
+            self.assertEqual(res["X-Cache"], "MISS")
+
+        self.assertEqual(len(res.json()["results"]), 2)
+
+    def test_entries_are_per_user(self):
+        """Test one user's cached list is never served to another user"""
+        self.client.get(RECIPES_URL)
+        other = get_user_model().objects.create_user("other@test.com", "testpass123")
+        self.client.force_authenticate(other)
+
+        res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.json()["results"], [])
+
+    def test_stats(self):
+        """Test hits and misses are counted"""
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+        self.client.get(RECIPES_URL)
+
+        stats = response_cache_stats()
+
+        self.assertEqual((stats["hits"], stats["misses"], stats["size"]), (2, 1, 1))
+        self.assertAlmostEqual(stats["hit_ratio"], 2 / 3)
+        self.assertGreater(stats["bytes"], 0)
+
+    def test_miss_is_encoded_once(self):
+        """Test a cached miss is sized by its rendered body instead of being encoded a second time"""
+        with patch("json.dumps", side_effect=json.dumps) as dumps:
+            res = self.client.get(RECIPES_URL)
+
+        self.assertEqual(dumps.call_count, 1)
+        self.assertEqual(response_cache_stats()["bytes"], len(res.content))
+
+    def test_large_response_is_not_cached(self):
+        """Test responses over the entry size limit are served but not kept"""
+        with patch.dict(RESPONSE_CACHE, MAX_ENTRY_BYTES=10):
+            self.client.get(RECIPES_URL)
+            res = self.client.get(RECIPES_URL)
+            stats = response_cache_stats()
+
+        self.assertEqual(res["X-Cache"], "MISS")
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual((stats["size"], stats["bytes"], stats["skipped"]), (0, 0, 2))
+
+    def test_disabled(self):
+        """Test the cache is bypassed when disabled"""
+        with patch.dict(RESPONSE_CACHE, ENABLED=False):
+            self.client.get(RECIPES_URL)
+            res = self.client.get(RECIPES_URL)
+
+        self.assertNotIn("X-Cache", res)
+        self.assertEqual(response_cache_stats()["misses"], 0)
+
+    def test_shared_cache_alias(self):
+        """Test entries can be kept in a configured Django cache"""
+        with patch.dict(RESPONSE_CACHE, CACHE_ALIAS="default"):
+            self.client.get(RECIPES_URL)
+            res = self.client.get(RECIPES_URL)
+            stats = response_cache_stats()
+
+        self.assertEqual(res["X-Cache"], "HIT")
+        self.assertNotIn("size", stats)
+
+
+class CacheStatsApiTests(TestCase):
+    """Test the cache statistics endpoint"""
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def test_requires_staff(self):
+        """Test regular users cannot read cache statistics"""
+        user = get_user_model().objects.create_user("user1@test.com", "testpass123")
+        self.client.force_authenticate(user)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_staff_reads_stats(self):
+        """Test staff users see response and token cache statistics"""
+        admin = get_user_model().objects.create_superuser("admin@test.com", "testpass123")
+        self.client.force_authenticate(admin)
+
+        res = self.client.get(CACHE_STATS_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertIn("hits", res.data["responses"])
+        self.assertIn("misses", res.data["tokens"])
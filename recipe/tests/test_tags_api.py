@@ -11,6 +11,7 @@ from recipe.serializers import TagSerializer
 
 
 TAGS_URL = reverse("recipe:tag-list")
+TAGS_IMPORT_URL = reverse("recipe:tag-import")
 
 
 class PublicTagsApiTests(TestCase):
@@ -46,7 +47,15 @@ class PrivateTagsApitests(TestCase):
         serializer = TagSerializer(tags, many=True)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(res.data, serializer.data)
+        self.assertEqual(res.data["results"], serializer.data)
+
+    def test_no_tag_detail_route(self):
+        """Test tags are only listed and created, never retrieved one by one"""
+        tag = TagFactory.create(user=self.user)
+
+        res = self.client.get(f"{TAGS_URL}{tag.id}/")
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_tags_limited_to_user(self):
         """Test that tags returned are for authenticated user"""
@@ -57,8 +66,8 @@ class PrivateTagsApitests(TestCase):
         res = self.client.get(TAGS_URL)
 
         self.assertEqual(res.status_code, status.HTTP_200_OK)
-        self.assertEqual(len(res.data), 1)
-        self.assertEqual(res.data[0]["name"], tag.name)
+        self.assertEqual(len(res.data["results"]), 1)
+        self.assertEqual(res.data["results"][0]["name"], tag.name)
 
     def test_create_tag_successful(self):
         """Test creating a new tag"""
@@ -87,5 +96,78 @@ class PrivateTagsApitests(TestCase):
         serializer1 = TagSerializer(tag1)
         serializer2 = TagSerializer(tag2)
 
-        self.assertIn(serializer1.data, res.data)
-        self.assertNotIn(serializer2.data, res.data)
+        self.assertIn(serializer1.data, res.data["results"])
+        self.assertNotIn(serializer2.data, res.data["results"])
+
+    def test_retrieve_tags_assigned_unique(self):
+        """Test filtering tags by assigned returns unique items"""
+        tag = TagFactory.create(user=self.user, name="Breakfast")
+        TagFactory.create(user=self.user, name="Lunch")
+        recipe1 = Recipe.objects.create(user=self.user, title="Pancakes", time_minutes=5, price=3.00)
+        recipe2 = Recipe.objects.create(user=self.user, title="Porridge", time_minutes=3, price=2.00)
+        recipe1.tags.add(tag)
+        recipe2.tags.add(tag)
+
+        res = self.client.get(TAGS_URL, {"assigned_only": 1})
+
+        self.assertEqual([t["id"] for t in res.data["results"]], [tag.id])
+
+    def test_retrieve_tags_with_counts(self):
+        """Test tags can be listed with the number of recipes using them"""
+        tag1 = TagFactory.create(user=self.user, name="Breakfast")
+        tag2 = TagFactory.create(user=self.user, name="Lunch")
+        recipe1 = Recipe.objects.create(user=self.user, title="Pancakes", time_minutes=5, price=3.00)
+        recipe2 = Recipe.objects.create(user=self.user, title="Porridge", time_minutes=3, price=2.00)
+        recipe1.tags.add(tag1, tag2)
+        recipe2.tags.add(tag1)
+
+        with self.assertNumQueries(2):
+            res = self.client.get(TAGS_URL, {"with_counts": 1})
+
+        self.assertEqual(
+            res.data["results"],
+            [
+                {"id": tag2.id, "name": "Lunch", "recipe_count": 1},
+                {"id": tag1.id, "name": "Breakfast", "recipe_count": 2},
+            ],
+        )
+
+    def test_import_tags_ndjson(self):
+        """Test importing tags from NDJSON skips names the user already has"""
+        TagFactory.create(user=self.user, name="Vegan")
+        body = '{"name": "vegan"}\n{"name": "Dessert"}\n\n"Breakfast"\n{"name": "DESSERT"}\n'
+
+        res = self.client.post(TAGS_IMPORT_URL, body, content_type="application/x-ndjson")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"created": 2, "existing": 2})
+        names = sorted(Tag.objects.filter(user=self.user).values_list("name", flat=True))
+        self.assertEqual(names, ["Breakfast", "Dessert", "Vegan"])
+
+    def test_import_tags_non_ascii_names(self):
+        """Test names differing only in the case of non-ASCII letters match, however the database lowercases"""
+        TagFactory.create(user=self.user, name="Crème brûlée")
+        body = '"CRÈME BRÛLÉE"\n"Straße"\n"STRASSE"\n"Étouffée"\n"étouffée"\n'
+
+        res = self.client.post(TAGS_IMPORT_URL, body.encode(), content_type="application/x-ndjson")
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data, {"created": 2, "existing": 3})
+        names = sorted(Tag.objects.filter(user=self.user).values_list("name", flat=True))
+        self.assertEqual(names, ["Crème brûlée", "Straße", "Étouffée"])
+
+    def test_import_tags_invalid_line(self):
+        """Test an invalid line rejects the whole import"""
+        body = '{"name": "Dessert"}\nnot json\n'
+
+        res = self.client.post(TAGS_IMPORT_URL, body, content_type="application/x-ndjson")
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Line 2", res.data["detail"])
+        self.assertFalse(Tag.objects.filter(user=self.user).exists())
+
+    def test_import_tags_unsupported_type(self):
+        """Test importing from an unsupported content type fails"""
+        res = self.client.post(TAGS_IMPORT_URL, {"name": "Dessert"}, format="json")
+
+        self.assertEqual(res.status_code, status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
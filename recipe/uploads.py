@@ -0,0 +1,148 @@
+import os
+import re
+import shutil
+import tempfile
+from contextlib import suppress
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from PIL import Image
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from core.models import RecipeImageUpload, upload_expiry
+from recipe.renditions import schedule_renditions
+
+
+COPY_BUFFER_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r"^bytes (\d+)-(\d+)/(\d+)$")
+# Bytes needed to recognise every accepted format from its signature
+SIGNATURE_LENGTH = 12
+
+
+class UploadIncomplete(APIException):
+    """Error telling the client the offset to resume the upload at"""
+
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = "Upload is incomplete."
+    default_code = "incomplete"
+
+    def __init__(self, offset, detail=None):
+        super().__init__(detail)
+        self.detail = {"detail": self.detail, "offset": offset}
+
+
+class UploadOffsetMismatch(UploadIncomplete):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = "Chunk does not start at the current upload offset."
+    default_code = "offset_mismatch"
+
+
+def is_image_signature(head):
+    """Return whether head starts like a JPEG, PNG, GIF or WebP file"""
+    return (
+        head.startswith((b"\xff\xd8\xff", b"\x89PNG\r\n\x1a\n", b"GIF87a", b"GIF89a"))
+        or (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+    )
+
+
+def parse_content_range(header, size):
+    """Return (start, length) of a `bytes start-end/size` Content-Range header for an upload of size bytes"""
+    match = CONTENT_RANGE.match(header or "")
+    if not match:
+        raise ValidationError({"detail": 'Expected a "Content-Range: bytes start-end/size" header.'})
+    start, end, total = (int(value) for value in match.groups())
+    if total != size or start > end or end >= size:
+        raise ValidationError({"detail": f"Content-Range does not fit an upload of {size} bytes."})
+    return start, end - start + 1
+
+
+def _remove_file(path):
+    with suppress(FileNotFoundError):
+        os.remove(path)
+
+
+def discard_upload(upload):
+    """Delete an upload, and its temporary file once that is committed"""
+    path = upload.path
+    upload.delete()
+    transaction.on_commit(lambda: _remove_file(path))
+
+
+def create_upload(recipe, filename, size):
+    """Start a chunked upload of size bytes for recipe's image"""
+    upload = RecipeImageUpload.objects.create(recipe=recipe, filename=filename, size=size)
+    os.makedirs(settings.RECIPE_IMAGE_UPLOAD_DIR, exist_ok=True)
+    open(upload.path, "wb").close()
+    return upload
+
+
+def receive_chunk(stream, length, file):
+    """Copy up to length bytes of stream to file in COPY_BUFFER_SIZE pieces, returning the number copied"""
+    written = 0
+    while written < length:
+        data = stream.read(min(COPY_BUFFER_SIZE, length - written))
+        if not data:
+            break
+        file.write(data)
+        written += len(data)
+    return written
+
+
+def write_chunk(upload, content_range, stream):
+    """Append the bytes of stream described by content_range to upload's temporary file
+
+    The body is received into a file of its own before the upload is locked, so a slow client only holds
+    the lock for the local append, and memory use does not depend on the chunk size. If the client
+    disconnects mid-chunk the bytes received so far are kept and the upload resumes there.
+    """
+    start, length = parse_content_range(content_range, upload.size)
+    if start != upload.received:
+        raise UploadOffsetMismatch(upload.received)
+
+    with tempfile.TemporaryFile(dir=settings.RECIPE_IMAGE_UPLOAD_DIR) as chunk:
+        written = receive_chunk(stream, length, chunk)
+        chunk.seek(0)
+        with transaction.atomic():
+            upload = RecipeImageUpload.objects.select_for_update().get(pk=upload.pk)
+            # Another request may have appended a chunk while this one was received
+            if start != upload.received:
+                raise UploadOffsetMismatch(upload.received)
+            with open(upload.path, "r+b") as file:
+                file.truncate(start)
+                file.seek(start)
+                shutil.copyfileobj(chunk, file, COPY_BUFFER_SIZE)
+            upload.received = start + written
+            upload.expires_at = upload_expiry()
+            upload.save(update_fields=["received", "expires_at"])
+
+    if start < SIGNATURE_LENGTH and (upload.received >= SIGNATURE_LENGTH or upload.received == upload.size):
+        with open(upload.path, "rb") as file:
+            if not is_image_signature(file.read(SIGNATURE_LENGTH)):
+                discard_upload(upload)
+                raise ValidationError({"detail": "Upload is not a JPEG, PNG, GIF or WebP image."})
+    if written < length:
+        raise UploadIncomplete(upload.received, "Chunk ended early.")
+    return upload
+
+
+def finalize_upload(upload):
+    """Verify a complete upload and attach it as its recipe's image, returning the recipe"""
+    if upload.received != upload.size:
+        raise UploadIncomplete(upload.received)
+    try:
+        with Image.open(upload.path) as image:
+            image.verify()
+    except Exception:
+        discard_upload(upload)
+        raise ValidationError({"detail": "Upload is not a valid image."})
+
+    recipe = upload.recipe
+    with transaction.atomic(), open(upload.path, "rb") as file:
+        recipe.image.save(upload.filename, File(file), save=False)
+        recipe.image_renditions = None
+        recipe.save(update_fields=["image", "image_renditions"])
+        discard_upload(upload)
+        schedule_renditions(recipe)
+    return recipe
@@ -1,10 +1,12 @@
+from django.conf import settings
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 
+from core.async_views import AsyncRouter
 from recipe.views import IngredientViewSet, RecipeViewSet, TagViewSet
 
 
-router = DefaultRouter()
+router = AsyncRouter() if settings.ASYNC_VIEWS else DefaultRouter()
 router.register("tags", TagViewSet)
 router.register("ingredients", IngredientViewSet)
 router.register("recipes", RecipeViewSet)
@@ -1,46 +1,121 @@
+from io import BytesIO
+
+from django.db.models import Count, Exists, OuterRef, Prefetch
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from django.utils.decorators import method_decorator
 from rest_framework import viewsets, mixins, status
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.decorators import action
+from rest_framework.exceptions import UnsupportedMediaType, ValidationError
 from rest_framework.response import Response
-from rest_framework.parsers import MultiPartParser
+from rest_framework.generics import get_object_or_404
+from rest_framework.parsers import FileUploadParser, MultiPartParser
 from rest_framework.permissions import IsAuthenticated
 from drf_yasg import openapi
-from drf_yasg.utils import swagger_auto_schema
+from drf_yasg.utils import no_body, swagger_auto_schema
 
-from core.models import Ingredient, Tag, Recipe
+from core.authentication import CachedTokenAuthentication
+from core.mixins import (
+    CachedListMixin,
+    FastReadDetailMixin,
+    FastReadMixin,
+    UserDataETagDetailMixin,
+    UserDataETagMixin,
+)
+from core.models import MAX_ID, Ingredient, Tag, Recipe, RecipeImageUpload
+from recipe.bulk import BULK_MAX_ITEMS, RecipeBulkItemSerializer, bulk_save_recipes
+from recipe.exporters import STREAMERS, CSVRenderer, NDJSONRenderer, iter_recipe_export
+from recipe.importers import PARSERS, import_names
+from recipe.readers import RECIPE_FIELDS, RELATION_FIELDS, recipe_rows, recipe_values
+from recipe.renditions import schedule_renditions
+from recipe.search import search_recipes
+from recipe.uploads import create_upload, discard_upload, finalize_upload, write_chunk
 from recipe.serializers import (
+    IngredientCountSerializer,
     IngredientSerializer,
     RecipeDetailSerializer,
     RecipeImageSerializer,
+    RecipeImageUploadSerializer,
     RecipeSerializer,
+    TagCountSerializer,
     TagSerializer,
 )
 
 
-class BaseRecipeAttrViewSet(viewsets.GenericViewSet, mixins.ListModelMixin, mixins.CreateModelMixin):
+class BaseRecipeAttrViewSet(
+    UserDataETagMixin,
+    CachedListMixin,
+    FastReadMixin,
+    viewsets.GenericViewSet,
+    mixins.ListModelMixin,
+    mixins.CreateModelMixin,
+):
     """Base viewset for user owned recipe attributes"""
 
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ("-name", "-id")
+
+    def _with_counts(self):
+        return self.action == "list" and bool(self.request.query_params.get("with_counts"))
 
     def get_queryset(self):
         """Return objects for the current authenticated user only"""
         assigned_only = bool(self.request.query_params.get("assigned_only"))
         queryset = self.queryset
         if assigned_only:
-            queryset = queryset.filter(recipe__isnull=False)
-        return queryset.filter(user=self.request.user).order_by("-name")
+            links = self.recipe_link.objects.filter(**{self.recipe_link_field: OuterRef("pk")})
+            queryset = queryset.filter(Exists(links))
+        if self._with_counts():
+            queryset = queryset.annotate(recipe_count=Count("recipe"))
+        return queryset.filter(user=self.request.user).order_by(*self.ordering)
+
+    def get_serializer_class(self):
+        """Return the serializer including recipe counts when they are requested"""
+        if self._with_counts():
+            return self.count_serializer_class
+
+        return self.serializer_class
+
+    def fast_read_values(self, queryset):
+        """Select the serializer's fields, which include the ordering fields"""
+        return queryset.values(*self.get_serializer_class().Meta.fields)
+
+    def fast_read_rows(self, rows):
+        return list(rows)
 
     def perform_create(self, serializer):
         """Create a new recipe object for the authenticated user"""
         serializer.save(user=self.request.user)
 
+    @swagger_auto_schema(
+        operation_description=(
+            "Import names from an NDJSON (application/x-ndjson) or CSV (text/csv, with a name column) body. "
+            "Names the user already has, compared case-insensitively, are skipped."
+        ),
+        request_body=no_body,
+        responses={200: "Created and existing counts", 400: "Invalid line, nothing was imported"},
+    )
+    @action(methods=["POST"], detail=False, url_path="import", url_name="import")
+    def bulk_import(self, request):
+        """Stream the request body into the user's objects without buffering it"""
+        content_type = request.content_type.split(";")[0].strip().lower()
+        parse = PARSERS.get(content_type)
+        if parse is None:
+            raise UnsupportedMediaType(content_type)
+
+        counts = import_names(self.queryset.model, request.user, parse(request.stream or ()))
+        return Response(counts, status=status.HTTP_200_OK)
+
 
 class TagViewSet(BaseRecipeAttrViewSet):
     """Manage tags in the database"""
 
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
+    count_serializer_class = TagCountSerializer
+    recipe_link = Recipe.tags.through
+    recipe_link_field = "tag"
 
 
 class IngredientViewSet(BaseRecipeAttrViewSet):
@@ -48,42 +123,185 @@ class IngredientViewSet(BaseRecipeAttrViewSet):
 
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
+    count_serializer_class = IngredientCountSerializer
+    recipe_link = Recipe.ingredients.through
+    recipe_link_field = "ingredient"
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+@method_decorator(
+    name="list",
+    decorator=swagger_auto_schema(
+        manual_parameters=[
+            openapi.Parameter(
+                name="tags", in_=openapi.IN_QUERY, type=openapi.TYPE_STRING, description="Comma separated tag ids"
+            ),
+            openapi.Parameter(
+                name="ingredients",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Comma separated ingredient ids",
+            ),
+            openapi.Parameter(
+                name="search",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Full-text search over titles, tag and ingredient names, ranked by relevance",
+            ),
+            openapi.Parameter(
+                name="match",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                enum=["any", "all"],
+                description="Return recipes with any (default) or all of the given tags and ingredients",
+            ),
+            openapi.Parameter(
+                name="fields",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Comma separated fields to return; only their columns are read",
+            ),
+            openapi.Parameter(
+                name="expand",
+                in_=openapi.IN_QUERY,
+                type=openapi.TYPE_STRING,
+                description="Comma separated relations (tags, ingredients) to inline as objects instead of ids",
+            ),
+        ]
+    ),
+)
+class RecipeViewSet(UserDataETagDetailMixin, CachedListMixin, FastReadDetailMixin, viewsets.ModelViewSet):
     """Manage recipes in the database"""
 
     queryset = Recipe.objects.all()
     serializer_class = RecipeSerializer
-    authentication_classes = (TokenAuthentication,)
+    authentication_classes = (CachedTokenAuthentication,)
     permission_classes = (IsAuthenticated,)
+    ordering = ("-id",)
+    # Read from the database while they are streamed, see core.async_views.AsyncRouter
+    streaming_actions = ("export",)
+
+    def _search_terms(self):
+        return self.request.query_params.get("search", "").strip()
+
+    def get_ordering(self):
+        """Order search results by relevance and everything else newest first"""
+        if self._search_terms():
+            return ("-search_rank", "-id")
+
+        return self.ordering
+
+    def _params_to_ints(self, param, qs):
+        """Convert a comma separated string of ids to a set of integers"""
+        try:
+            ids = {int(i) for i in qs.split(",")}
+        except ValueError:
+            ids = None
+        if not ids or not all(1 <= i <= MAX_ID for i in ids):
+            raise ValidationError({param: "Expected a comma separated list of integer ids."})
+        return ids
+
+    def _params_to_names(self, param, qs, allowed):
+        """Convert a comma separated string of names to those of allowed, in the order of allowed"""
+        names = {name.strip() for name in qs.split(",") if name.strip()}
+        unknown = names.difference(allowed)
+        if unknown:
+            raise ValidationError({param: f"Unknown {', '.join(sorted(unknown))}, expected {', '.join(allowed)}."})
+        return tuple(name for name in allowed if name in names)
+
+    def _requested_fields(self):
+        """Return the fields listed by ?fields= when reading recipes, or else all of them"""
+        qs = self.request.query_params.get("fields") if self.action in ("list", "retrieve") else None
+        if not qs:
+            return RecipeSerializer.Meta.fields
+        return self._params_to_names("fields", qs, RecipeSerializer.Meta.fields)
+
+    def _expanded_fields(self):
+        """Return the relations rendered as objects: all of them in detail, those in ?expand= in lists"""
+        if self.action == "retrieve":
+            return RELATION_FIELDS
+        qs = self.request.query_params.get("expand") if self.action == "list" else None
+        if not qs:
+            return ()
+        return self._params_to_names("expand", qs, RELATION_FIELDS)
+
+    def _filter_by_related(self, queryset, through, column, ids, match):
+        """Filter recipes linked to any or all of ids without joining, so no recipe is returned twice"""
+        links = through.objects.filter(**{f"{column}__in": ids})
+        if match == "all":
+            complete = links.values("recipe_id").annotate(matches=Count(column)).filter(matches=len(ids))
+            return queryset.filter(id__in=complete.values("recipe_id"))
 
-    def _params_to_ints(self, qs):
-        return [int(i) for i in qs.split(",")]
+        return queryset.filter(Exists(links.filter(recipe_id=OuterRef("pk"))))
 
     def get_queryset(self):
         """Retrieve the recipes for the authenticated user"""
         tags = self.request.query_params.get("tags")
         ingredients = self.request.query_params.get("ingredients")
+        match = self.request.query_params.get("match", "any")
+        if match not in ("any", "all"):
+            raise ValidationError({"match": 'Expected "any" or "all".'})
+
         queryset = self.queryset
+        if self._search_terms():
+            queryset = search_recipes(queryset, self._search_terms())
         if tags:
-            tag_ids = self._params_to_ints(tags)
-            queryset = queryset.filter(tags__id__in=tag_ids)
+            tag_ids = self._params_to_ints("tags", tags)
+            queryset = self._filter_by_related(queryset, Recipe.tags.through, "tag_id", tag_ids, match)
         if ingredients:
-            ingredient_ids = self._params_to_ints(ingredients)
-            queryset = queryset.filter(ingredients__id__in=ingredient_ids)
+            ingredient_ids = self._params_to_ints("ingredients", ingredients)
+            queryset = self._filter_by_related(
+                queryset, Recipe.ingredients.through, "ingredient_id", ingredient_ids, match
+            )
+
+        return self._prefetch_for_action(queryset.filter(user=self.request.user))
+
+    def _prefetch_for_action(self, queryset):
+        """Load exactly the columns and prefetch exactly the related objects the action's serializer renders"""
+        if self.action not in ("list", "retrieve", "bulk"):
+            return queryset
 
-        return queryset.filter(user=self.request.user)
+        fields = self._requested_fields()
+        expand = self._expanded_fields()
+        if fields != RecipeSerializer.Meta.fields:
+            queryset = queryset.only("id", *(field for field in fields if field in RECIPE_FIELDS))
+        related_models = {"tags": Tag, "ingredients": Ingredient}
+        for relation in RELATION_FIELDS:
+            if relation not in fields:
+                continue
+            related = related_models[relation].objects.order_by("id")
+            if relation not in expand:
+                related = related.only("id")
+            queryset = queryset.prefetch_related(Prefetch(relation, queryset=related))
+        return queryset
 
     def get_serializer_class(self):
         """Return appropriate serializer class"""
         if self.action == "retrieve":
             return RecipeDetailSerializer
-        elif self.action == "upload_image":
+        elif self.action in ("upload_image", "finalize_image_upload"):
             return RecipeImageSerializer
+        elif self.action in ("start_image_upload", "image_upload"):
+            return RecipeImageUploadSerializer
 
         return self.serializer_class
 
+    def get_serializer(self, *args, **kwargs):
+        """Return the serializer, limited to the requested fields and expanded relations when reading"""
+        if self.action in ("list", "retrieve"):
+            kwargs.setdefault("fields", self._requested_fields())
+            kwargs.setdefault("expand", self._expanded_fields())
+        return super().get_serializer(*args, **kwargs)
+
+    def fast_read_values(self, queryset):
+        """Select the requested recipe columns plus the fields the paginator orders by"""
+        ordering = [field.lstrip("-") for field in self.get_ordering() if field.lstrip("-") not in RECIPE_FIELDS]
+        fields = self._requested_fields()
+        related_ids = [field for field in fields if field in RELATION_FIELDS and field not in self._expanded_fields()]
+        return recipe_values(queryset, *ordering, fields=fields, related_ids=related_ids)
+
+    def fast_read_rows(self, rows):
+        return recipe_rows(rows, self.request, fields=self._requested_fields(), expand=self._expanded_fields())
+
     def perform_create(self, serializer):
         """Save a recipe for the authenticated user"""
         serializer.save(user=self.request.user)
@@ -103,7 +321,110 @@ class RecipeViewSet(viewsets.ModelViewSet):
         recipe = self.get_object()
         serializer = self.get_serializer(recipe, data=request.data)
         if serializer.is_valid():
-            serializer.save()
+            # Renditions of the previous image are dropped and rendered for the new one in the background
+            schedule_renditions(serializer.save(image_renditions=None))
             return Response(serializer.data, status=status.HTTP_200_OK)
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    def _get_image_upload(self, upload_id):
+        return get_object_or_404(
+            RecipeImageUpload, pk=upload_id, recipe=self.get_object(), expires_at__gt=timezone.now()
+        )
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Start a resumable image upload. Send the bytes with PUT and Content-Range to the returned upload, "
+            "then POST to its finalize URL."
+        ),
+        responses={201: RecipeImageUploadSerializer},
+    )
+    @action(methods=["POST"], detail=True, url_path="uploads", url_name="uploads")
+    def start_image_upload(self, request, pk=None):
+        """Start a chunked upload of a recipe image"""
+        recipe = self.get_object()
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        upload = create_upload(recipe, **serializer.validated_data)
+        return Response(self.get_serializer(upload).data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        method="put",
+        operation_description="Append a byte range of the image, starting at the current offset.",
+        manual_parameters=[
+            openapi.Parameter(
+                name="Content-Range",
+                in_=openapi.IN_HEADER,
+                type=openapi.TYPE_STRING,
+                required=True,
+                description="bytes start-end/size",
+            )
+        ],
+        request_body=no_body,
+        responses={200: RecipeImageUploadSerializer, 409: "Chunk does not start at the current offset"},
+    )
+    @action(
+        methods=["GET", "PUT", "DELETE"],
+        detail=True,
+        url_path=r"uploads/(?P<upload_id>[0-9a-f-]{36})",
+        url_name="upload",
+        parser_classes=(FileUploadParser,),
+    )
+    def image_upload(self, request, pk=None, upload_id=None):
+        """Show the offset to resume a chunked upload at, append a chunk to it, or abort it"""
+        upload = self._get_image_upload(upload_id)
+        if request.method == "DELETE":
+            discard_upload(upload)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        if request.method == "PUT":
+            # The body is read from the stream in small pieces and never parsed into request.data
+            upload = write_chunk(upload, request.META.get("HTTP_CONTENT_RANGE"), request.stream or BytesIO())
+        return Response(self.get_serializer(upload).data)
+
+    @swagger_auto_schema(request_body=no_body, responses={200: RecipeImageSerializer})
+    @action(methods=["POST"], detail=True, url_path=r"uploads/(?P<upload_id>[0-9a-f-]{36})/finalize")
+    def finalize_image_upload(self, request, pk=None, upload_id=None):
+        """Attach a completely received chunked upload as the recipe image"""
+        recipe = finalize_upload(self._get_image_upload(upload_id))
+        return Response(self.get_serializer(recipe).data)
+
+    @swagger_auto_schema(
+        operation_description=f"Create or update up to {BULK_MAX_ITEMS} recipes. Items with an id are updated.",
+        request_body=RecipeBulkItemSerializer(many=True),
+        responses={201: RecipeSerializer(many=True), 400: "Per-item errors, nothing was saved"},
+    )
+    @action(methods=["POST"], detail=False, url_path="bulk")
+    def bulk(self, request):
+        """Create or update many recipes in a single transaction"""
+        if not isinstance(request.data, list):
+            return Response({"detail": "Expected a list of recipes."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > BULK_MAX_ITEMS:
+            return Response(
+                {"detail": f"At most {BULK_MAX_ITEMS} recipes can be saved at once."},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        recipes, errors = bulk_save_recipes(request.user, request.data)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+        saved = self._prefetch_for_action(Recipe.objects.all()).in_bulk([recipe.pk for recipe in recipes])
+        serializer = RecipeSerializer([saved[recipe.pk] for recipe in recipes], many=True)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+    @swagger_auto_schema(
+        operation_description=(
+            "Stream every recipe of the user with embedded tags, ingredients and image URL, "
+            "as NDJSON (default) or CSV (?format=csv). Accepts the same filters as the list."
+        ),
+        responses={200: "Recipe library as NDJSON or CSV"},
+    )
+    @action(methods=["GET"], detail=False, url_path="export", renderer_classes=(NDJSONRenderer, CSVRenderer))
+    def export(self, request):
+        """Stream the user's full recipe library without paginating or holding it in memory"""
+        storage = Recipe._meta.get_field("image").storage
+        recipes = iter_recipe_export(self.get_queryset(), lambda name: request.build_absolute_uri(storage.url(name)))
+        renderer = request.accepted_renderer
+        response = StreamingHttpResponse(STREAMERS[renderer.format](recipes), content_type=renderer.media_type)
+        response["Content-Disposition"] = f'attachment; filename="recipes.{renderer.format}"'
+        return response
@@ -1,10 +1,15 @@
-from django.test import TestCase
+import threading
+
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import PBKDF2PasswordHasher
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
 
+from core.passwords import reset_pool, run_hashing
+
 CREATE_USER_URL = reverse("user:create")
 TOKEN_URL = reverse("user:token")
 ME_URL = reverse("user:me")
@@ -117,3 +122,78 @@ class PrivateUserApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(self.user.name, payload["name"])
         self.assertTrue(self.user.check_password(payload["password"]))
+
+
+class FastPBKDF2PasswordHasher(PBKDF2PasswordHasher):
+    iterations = 1000
+
+
+class PasswordHashingApiTests(TestCase):
+    """Test login and signup with the password hashing pool"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.payload = {"email": "test@test.com", "password": "password134"}
+        self.addCleanup(reset_pool)
+
+    def _saturate(self):
+        """Occupy every slot of the hashing pool until the returned event is set"""
+        release, started = threading.Event(), threading.Event()
+
+        def hold():
+            started.set()
+            release.wait(5)
+
+        thread = threading.Thread(target=run_hashing, args=(hold,))
+        thread.start()
+        started.wait(5)
+        self.addCleanup(thread.join)
+        self.addCleanup(release.set)
+
+    @override_settings(PASSWORD_HASHING={"WORKERS": 1, "MAX_PENDING": 1, "RETRY_AFTER": 3})
+    def test_login_busy(self):
+        """Test logins get a fast 503 with Retry-After while the hashing pool is full"""
+        create_user(**self.payload)
+        reset_pool()
+        self._saturate()
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(res["Retry-After"], "3")
+
+    @override_settings(PASSWORD_HASHING={"WORKERS": 1, "MAX_PENDING": 1, "RETRY_AFTER": 1})
+    def test_signup_busy(self):
+        """Test signups get a 503 and create nothing while the hashing pool is full"""
+        reset_pool()
+        self._saturate()
+
+        res = self.client.post(CREATE_USER_URL, {**self.payload, "name": "Test"})
+
+        self.assertEqual(res.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertFalse(get_user_model().objects.exists())
+
+    def test_rehash_on_login(self):
+        """Test logging in rehashes a password stored with other hasher settings"""
+        with override_settings(PASSWORD_HASHERS=["user.tests.test_user_api.FastPBKDF2PasswordHasher"]):
+            user = create_user(**self.payload)
+        self.assertEqual(user.password.split("$")[1], "1000")
+
+        res = self.client.post(TOKEN_URL, self.payload)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        user.refresh_from_db()
+        self.assertEqual(int(user.password.split("$")[1]), PBKDF2PasswordHasher.iterations)
+        self.assertTrue(user.check_password(self.payload["password"]))
+
+    def test_no_rehash_on_failed_login(self):
+        """Test a wrong password leaves an outdated hash alone"""
+        with override_settings(PASSWORD_HASHERS=["user.tests.test_user_api.FastPBKDF2PasswordHasher"]):
+            user = create_user(**self.payload)
+        encoded = user.password
+
+        res = self.client.post(TOKEN_URL, {**self.payload, "password": "wrong"})
+
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        user.refresh_from_db()
+        self.assertEqual(user.password, encoded)
@@ -1,12 +1,18 @@
+from django.conf import settings
 from django.urls import path
 
+from core.async_views import async_view
 from user import views
 
 
 app_name = "user"
 
+manage_user_view = views.ManageUserView.as_view()
+if settings.ASYNC_VIEWS:
+    manage_user_view = async_view(manage_user_view)
+
 urlpatterns = [
     path("create/", views.CreateUserView.as_view(), name="create"),
     path("token/", views.CreateTokentView.as_view(), name="token"),
-    path("me/", views.ManageUserView.as_view(), name="me"),
+    path("me/", manage_user_view, name="me"),
 ]